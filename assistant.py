@@ -0,0 +1,618 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import assistant_tools
+import database
+import mathtext
+from config_service import DEFAULT_CONTEXT_TOKENS, DEFAULT_MODEL, DEFAULT_TIMEOUT
+
+# GEMINI_MODEL value that answers locally with canned chunks instead of calling the API
+STUB_MODEL = "stub"
+MAX_TOOL_ROUNDS = 4 # Turns of tool calls before the model has to answer
+MAX_CALLS_PER_ROUND = 6
+
+# Answer cache limits: entries kept in memory, entries and bytes kept on disk, age in seconds
+CACHE_MEMORY_ENTRIES = 32
+CACHE_DISK_ENTRIES = 256
+CACHE_DISK_BYTES = 2 * 1024 * 1024
+CACHE_TTL = 7 * 24 * 3600
+
+# Prompt context tokens are estimated at about four characters each, close to
+# what Gemini counts for English text and numbers
+CHARS_PER_TOKEN = 4
+# (months listed one by one, quarters listed before them), tried in order until
+# the context fits the budget; everything older is listed by year
+COLLAPSE_STEPS = [(None, 0), (36, 8), (24, 8), (12, 8), (12, 4), (6, 4), (6, 0), (3, 0), (0, 0)]
+# Categories listed one by one (None for all); the rest are merged into "Other"
+CATEGORY_STEPS = [None, 10, 5, 3]
+
+STUB_CHUNKS = [
+    "**Stub answer** from the local test model.\n\n",
+    "It streams a fixed reply in small pieces so the assistant view ",
+    "can be exercised without an API key:\n\n",
+    "| Check | Result |\n|---|---|\n",
+    "| Streaming | ok |\n| Markdown | ok |\n\n",
+    "- Total spending is the sum of every category, ",
+    "$T = \\sum_i c_i$.\n",
+    "- Nothing here was computed from your data.\n",
+]
+
+
+class AssistantCancelled(Exception):
+    pass
+
+
+class AssistantTimeout(Exception):
+    pass
+
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+
+
+def _month_range(year, month):
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def plan_stub_calls(question):
+    """
+    The tool calls the stub model makes for a question: a date range from
+    "March 2025" or "2025", a category from a capitalized word after "on",
+    and largest_expenses or category_totals for "largest", "biggest" and "top" questions.
+    :return: list of (tool name, args); empty when nothing was recognized
+    """
+    args = {}
+    match = re.search(r"\b(" + "|".join(month[:3] for month in MONTHS) + r")[a-z]*\.? +(\d{4})\b", question, re.IGNORECASE)
+    if match:
+        args["start"], args["end"] = _month_range(int(match.group(2)), MONTHS.index(
+            next(month for month in MONTHS if month.startswith(match.group(1).lower()))) + 1)
+    else:
+        match = re.search(r"\b(\d{4})\b", question)
+        if match:
+            args["start"], args["end"] = f"{match.group(1)}-01-01", f"{int(match.group(1)) + 1}-01-01"
+    match = re.search(r"\bon ([A-Z][\w&]*(?: [A-Z][\w&]*)*)", question)
+    category = match.group(1) if match else None
+    match = re.search(r"\btop (\d+)|\b(\d+) (?:largest|biggest)", question, re.IGNORECASE)
+    limit = int(match.group(1) or match.group(2)) if match else None
+    lowered = question.lower()
+
+    if "categor" in lowered and ("top" in lowered or "most" in lowered):
+        return [("category_totals", dict(args, limit=limit or 5))]
+    if "largest" in lowered or "biggest" in lowered or limit:
+        if category:
+            args["category"] = category
+        return [("largest_expenses", dict(args, limit=limit or 5))]
+    if category or args:
+        if category:
+            args["category"] = category
+        return [("sum_expenses", args)]
+    return []
+
+
+def format_tool_results(results):
+    """The stub model's answer: the tool results, verbatim."""
+    lines = ["Here is what your ledger says:\n\n"]
+    for name, result in results:
+        lines.append(f"- `{name}`: `{json.dumps(result)}`\n")
+    return lines
+
+
+class StubModel:
+    """
+    Local stand-in for Gemini, selected with GEMINI_MODEL = "stub". Offered
+    tools, it asks for the calls plan_stub_calls finds in the question (or the
+    scripted `calls`) and then answers with their results. Otherwise, or when
+    nothing was recognized, it streams canned markdown chunks, `delay` seconds apart.
+    """
+    def __init__(self, chunks=None, delay=0.05, calls=None):
+        self.chunks = list(STUB_CHUNKS if chunks is None else chunks)
+        self.delay = delay
+        self.calls = calls
+        self.prompts = []
+        self.tool_results = []
+
+    def start_session(self, tools=None):
+        return StubSession(self, tools)
+
+
+class StubSession:
+    def __init__(self, model, tools):
+        self.model = model
+        self.tools = {tool["name"] for tool in tools or []}
+
+    def _stream(self, chunks):
+        for text in chunks:
+            if self.model.delay:
+                time.sleep(self.model.delay)
+            yield ("text", text)
+
+    def send(self, message, timeout):
+        if not isinstance(message, str):
+            self.model.tool_results.append(message)
+            yield from self._stream(format_tool_results(message))
+            return
+        self.model.prompts.append(message)
+        question = message.rsplit("My question is:", 1)[-1].strip()
+        if self.model.calls is not None:
+            calls = self.model.calls if self.tools else [] # Scripted, unknown names included
+        else:
+            calls = [(name, args) for name, args in plan_stub_calls(question) if name in self.tools]
+        if calls:
+            for name, args in calls:
+                yield ("call", name, args)
+            return
+        yield from self._stream(self.model.chunks)
+
+
+class GeminiModel:
+    """google.generativeai behind the same start_session/send interface as StubModel."""
+    def __init__(self, api_key, model_name):
+        import google.generativeai as genai # Slow to import; loaded with the first question
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.model_name = model_name
+
+    def start_session(self, tools=None):
+        model = self.genai.GenerativeModel(self.model_name,
+                                           tools=[{"function_declarations": tools}] if tools else None)
+        return GeminiSession(self.genai, model.start_chat())
+
+
+class GeminiSession:
+    def __init__(self, genai, chat):
+        self.genai = genai
+        self.chat = chat
+
+    def send(self, message, timeout):
+        """
+        Send the prompt, or the results of the calls the model asked for.
+        :param message: str, or list of (tool name, result dict)
+        :return: iterator of ("text", text) and ("call", tool name, args) events
+        """
+        if not isinstance(message, str):
+            protos = self.genai.protos
+            message = [protos.Part(function_response=protos.FunctionResponse(name=name, response=result))
+                       for name, result in message]
+        response = self.chat.send_message(message, stream=True, request_options={"timeout": timeout})
+        for chunk in response:
+            for part in chunk.parts:
+                if part.function_call.name:
+                    call = part.function_call
+                    yield ("call", call.name, type(call).to_dict(call).get("args") or {})
+                elif part.text:
+                    yield ("text", part.text)
+
+
+def create_model(api_key, model_name):
+    """The Gemini model to ask, or the local StubModel."""
+    if model_name == STUB_MODEL:
+        return StubModel()
+    return GeminiModel(api_key, model_name)
+
+
+def build_prompt(question, context, tools=False):
+    """
+    :param context: text describing the ledger, placed before the question
+    :param tools: whether the model can call the functions in assistant_tools
+    """
+    if tools:
+        scope = ("Call the provided functions for exact figures about specific dates, categories or expenses "
+                 "instead of estimating them from the summaries. If the question is not about these expenses, "
+                 "say that you can only answer questions about them.")
+    else:
+        scope = ("If the question is beyond the scope of these summaries, state that you can only answer "
+                 "questions based on the provided summaries.")
+    return f"""You are an expense assistant. Analyze the provided expense summaries to answer the user's question.
+{scope}
+
+{context}
+
+My question is: {question}"""
+
+
+class AssistantRequest(QObject):
+    """
+    One question to the model, answered on a daemon thread. The thread is a
+    plain daemon thread, like the voice and backup workers, because a stalled
+    HTTP read cannot be interrupted and must not keep the app from exiting.
+
+    Signals are queued to the GUI thread. After cancel() or a timeout the
+    request stops emitting, and the thread exits at its next chunk.
+    """
+    chunk_received = pyqtSignal(str) # Text of one streamed chunk
+    tool_called = pyqtSignal(str) # Description of a lookup the model asked for
+    finished = pyqtSignal(str) # The full answer
+    failed = pyqtSignal(str) # Error message; the chunks received so far stay valid
+
+    def __init__(self, model_factory, prompt_factory, timeout=DEFAULT_TIMEOUT, tool_runner=None, parent=None):
+        """
+        :param model_factory: callable returning a StubModel or GeminiModel
+        :param prompt_factory: callable returning the prompt; runs on the request thread
+        :param timeout: seconds the whole answer may take
+        :param tool_runner: callable(name, args) -> result dict running assistant_tools
+            on the request thread; None offers the model no tools
+        """
+        super().__init__(parent)
+        self.model_factory = model_factory
+        self.prompt_factory = prompt_factory
+        self.timeout = timeout
+        self.tool_runner = tool_runner
+        self.cancelled = threading.Event()
+        self.deadline = None
+
+    def start(self):
+        self.deadline = time.monotonic() + self.timeout
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def expire(self):
+        """Give up on the answer: called by the view's timer once the deadline has passed."""
+        if not self.cancelled.is_set():
+            self.cancelled.set()
+            self.failed.emit(f"No complete answer within {self.timeout:g} seconds.")
+
+    def run_tools(self, calls):
+        """Answer every call, so the model gets one result per call it made."""
+        results = []
+        for i, (name, args) in enumerate(calls):
+            self.check()
+            if i >= MAX_CALLS_PER_ROUND:
+                results.append((name, {"error": f"At most {MAX_CALLS_PER_ROUND} lookups per turn."}))
+                continue
+            self.tool_called.emit(assistant_tools.describe_call(name, args))
+            results.append((name, self.tool_runner(name, args)))
+        return results
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise AssistantCancelled()
+        if time.monotonic() > self.deadline:
+            raise AssistantTimeout(f"No complete answer within {self.timeout:g} seconds.")
+
+    def run(self):
+        parts = []
+        try:
+            prompt = self.prompt_factory()
+            self.check()
+            model = self.model_factory()
+            session = model.start_session(assistant_tools.DECLARATIONS if self.tool_runner else None)
+            message = prompt
+            for turn in range(MAX_TOOL_ROUNDS + 1):
+                calls = []
+                for event in session.send(message, max(1.0, self.deadline - time.monotonic())):
+                    self.check()
+                    if event[0] == "call":
+                        calls.append((event[1], event[2]))
+                    elif event[1]:
+                        parts.append(event[1])
+                        self.chunk_received.emit(event[1])
+                if not calls:
+                    break
+                if turn == MAX_TOOL_ROUNDS:
+                    raise RuntimeError("The model kept asking for more lookups; try a more specific question.")
+                message = self.run_tools(calls)
+            self.check()
+            self.finished.emit("".join(parts))
+        except AssistantCancelled:
+            pass
+        except Exception as e:
+            if not self.cancelled.is_set():
+                self.cancelled.set()
+                self.failed.emit(str(e))
+
+
+class IncrementalMarkdown:
+    """
+    Markdown to HTML for text that arrives in pieces. Every top-level block but
+    the last is complete: later text can only extend or reinterpret the last
+    one (a list's next item, a paragraph's next line). Complete blocks are
+    rendered once and kept, so each new chunk only re-renders the last block.
+    """
+    def __init__(self, render=None, local_math=False):
+        from markdown_it import MarkdownIt
+        self.parser = MarkdownIt("commonmark").enable("table")
+        if render is None:
+            render = self.parser.render
+        if local_math: # Formulas are drawn as HTML here instead of by MathJax in the page
+            render = mathtext.markdown_renderer(render)
+        self.render = render
+        self.reset()
+
+    def reset(self):
+        self.text = ""
+        self.stable_length = 0
+        self.stable_html = ""
+
+    def feed(self, chunk):
+        """Append a chunk and return the HTML of everything received so far."""
+        self.text += chunk
+        pending = self.text[self.stable_length:]
+        boundary = self._last_block_start(pending)
+        if boundary:
+            self.stable_html += self.render(pending[:boundary])
+            self.stable_length += boundary
+            pending = pending[boundary:]
+        return self.stable_html + (self.render(pending) if pending.strip() else "")
+
+    def finish(self):
+        """
+        The HTML of the whole answer, rendered in one go. Only a reference link
+        defined after its use renders differently from what feed() returned.
+        """
+        return self.render(self.text)
+
+    def _last_block_start(self, text):
+        """
+        Offset where the last top-level block of text starts, or 0 if there is
+        only one. A block whose first line is still arriving does not count: "2"
+        may yet become "2. item", continuing the list before it.
+        """
+        starts = [token.map[0] for token in self.parser.parse(text) if token.level == 0 and token.map]
+        lines = text.splitlines(True)
+        while len(starts) >= 2:
+            offset = sum(len(line) for line in lines[:starts.pop()])
+            if "\n" in text[offset:]:
+                return offset
+        return 0
+
+
+def normalize_question(question):
+    """Case, spacing and trailing punctuation do not make a different question."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def cache_path(db_file):
+    """The answer cache lives next to the database it describes."""
+    return db_file + ".answers.json"
+
+
+class ResponseCache:
+    """
+    Answers keyed by normalized question, model and ledger version (see
+    database.get_ledger_version), so a changed ledger never serves a stale
+    answer. A small LRU in memory sits in front of a larger JSON file on disk;
+    both drop entries older than `ttl` seconds. The file is read on first use
+    and rewritten atomically on every store.
+    """
+    def __init__(self, path, memory_entries=CACHE_MEMORY_ENTRIES, disk_entries=CACHE_DISK_ENTRIES,
+                 disk_bytes=CACHE_DISK_BYTES, ttl=CACHE_TTL, clock=time.time):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.disk_bytes = disk_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.memory = OrderedDict()
+        self.disk = None # key -> [stored at, answer], oldest first; loaded lazily
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def key(question, model_name, ledger_version):
+        text = json.dumps([normalize_question(question), model_name, ledger_version])
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _fresh(self, entry):
+        return self.clock() - entry[0] <= self.ttl
+
+    def _load(self):
+        if self.disk is not None:
+            return
+        self.disk = OrderedDict()
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in saved.get("entries", []):
+            self.disk[key] = entry
+
+    def _save(self):
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({"entries": list(self.disk.items())}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(e)
+
+    def get(self, question, model_name, ledger_version):
+        """:return: the cached answer, or None"""
+        key = self.key(question, model_name, ledger_version)
+        entry = self.memory.get(key)
+        if entry is not None and self._fresh(entry):
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return entry[1]
+        self._load()
+        entry = self.disk.get(key)
+        if entry is not None and self._fresh(entry):
+            self._remember(key, entry)
+            self.stats["disk_hits"] += 1
+            return entry[1]
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, question, model_name, ledger_version, answer):
+        key = self.key(question, model_name, ledger_version)
+        entry = [self.clock(), answer]
+        self._remember(key, entry)
+        self._load()
+        self.disk.pop(key, None)
+        self.disk[key] = entry
+        self._trim_disk()
+        self._save()
+        self.stats["stores"] += 1
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _trim_disk(self):
+        """Drop expired entries, then the oldest ones until both disk limits hold."""
+        for key in [key for key, entry in self.disk.items() if not self._fresh(entry)]:
+            del self.disk[key]
+            self.stats["evictions"] += 1
+        size = sum(len(entry[1]) for entry in self.disk.values())
+        while self.disk and (len(self.disk) > self.disk_entries or size > self.disk_bytes):
+            _, entry = self.disk.popitem(last=False)
+            size -= len(entry[1])
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        self.memory.clear()
+        self.disk = OrderedDict()
+        self._save()
+
+    def describe(self):
+        stats = self.stats
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        return (f"Answer cache: {hits} hits ({stats['disk_hits']} from disk), "
+                f"{stats['misses']} misses, {stats['evictions']} evicted")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _month_index(month):
+    return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+
+def collapse_periods(monthly, recent_months=None, recent_quarters=0):
+    """
+    Merge old months into coarser periods: the last `recent_months` months
+    stay months, the `recent_quarters` quarters before them become quarters
+    and everything earlier becomes years. Cut-offs are rounded down to whole
+    quarters and years so no period is split.
+    :param monthly: (YYYY-MM, total) rows in month order, as from get_monthly_summary
+    :param recent_months: None keeps every month
+    :return: list of (label, total): YYYY-MM, YYYY-Qn or YYYY
+    """
+    if recent_months is None or not monthly:
+        return list(monthly)
+    month_cut = (_month_index(monthly[-1][0]) - recent_months + 1) // 3 * 3
+    quarter_cut = (month_cut - 3 * recent_quarters) // 12 * 12
+    periods = OrderedDict()
+    for month, total in monthly:
+        index = _month_index(month)
+        if index >= month_cut:
+            label = month
+        elif index >= quarter_cut:
+            label = f"{month[:4]}-Q{index % 12 // 3 + 1}"
+        else:
+            label = month[:4]
+        periods[label] = periods.get(label, 0.0) + total
+    return list(periods.items())
+
+
+class AssistantContext:
+    """The ledger description given to the model, and what it was built from."""
+    def __init__(self, text, tokens, budget, detail, source):
+        self.text = text
+        self.tokens = tokens
+        self.budget = budget
+        self.detail = detail # How far the periods and categories were collapsed
+        self.source = source # (monthly, categories, yearly) summaries
+
+    def describe(self):
+        text = f"Prompt context: {self.tokens} of {self.budget} tokens, {self.detail}"
+        if self.tokens > self.budget:
+            text += f"; over budget by {self.tokens - self.budget} tokens with nothing left to cut"
+        return text
+
+
+class ContextBuilder:
+    """
+    Builds the prompt context from the rollup-backed summaries and fits it to a
+    token budget: the yearly list is dropped, months are merged into quarters
+    and years, oldest first, small categories into "Other", and at last the
+    oldest periods into a single line, until the estimate fits.
+    """
+    def __init__(self, budget=DEFAULT_CONTEXT_TOKENS):
+        self.budget = budget
+
+    def build(self, conn):
+        """
+        :param conn: Connection object; runs on a reader connection
+        :return: AssistantContext
+        """
+        source = (database.get_monthly_summary(conn), database.get_category_summary(conn),
+                  database.get_yearly_summary(conn))
+        return self.compose(source)
+
+    def fit(self, context):
+        """The context itself if it was built for the current budget, else a recomposed one."""
+        if context.budget == self.budget:
+            return context
+        return self.compose(context.source)
+
+    def compose(self, source):
+        """
+        The most detailed layout within the budget. The yearly list repeats the
+        period totals, so it goes first; then periods and categories are
+        collapsed step by step; then the oldest periods are summed into one
+        line. If even that is over budget the context says so in describe().
+        """
+        monthly, categories, yearly = source
+        text = self._text(monthly, self._category_lines(categories, None), yearly)
+        detail = self._describe(monthly, categories, None)
+        if estimate_tokens(text) <= self.budget:
+            return AssistantContext(text, estimate_tokens(text), self.budget, detail, source)
+        for category_limit in CATEGORY_STEPS:
+            category_lines = self._category_lines(categories, category_limit)
+            for recent_months, recent_quarters in COLLAPSE_STEPS:
+                periods = collapse_periods(monthly, recent_months, recent_quarters)
+                text = self._text(periods, category_lines)
+                detail = self._describe(periods, categories, category_limit)
+                if estimate_tokens(text) <= self.budget:
+                    return AssistantContext(text, estimate_tokens(text), self.budget, detail, source)
+        # Still over at the coarsest layout: sum the oldest periods into one line until it fits
+        for summed in range(2, len(periods) + 1):
+            kept = periods[summed:]
+            label = f"before {kept[0][0]}" if kept else "all periods"
+            text = self._text([(label, sum(total for _, total in periods[:summed]))] + kept, category_lines)
+            detail = self._describe(kept, categories, category_limit) + f", oldest {summed} periods summed"
+            if estimate_tokens(text) <= self.budget:
+                break
+        return AssistantContext(text, estimate_tokens(text), self.budget, detail, source)
+
+    @staticmethod
+    def _text(periods, category_lines, yearly=()):
+        lines = ["Expense summary by period (older periods are merged into quarters and years):"]
+        lines.extend(f"- {label}: ${total:.2f}" for label, total in periods)
+        lines.append("Expense summary by category:")
+        lines.extend(category_lines)
+        if yearly:
+            lines.append("Expense summary by year:")
+            lines.extend(f"- {year}: ${total:.2f}" for year, total in yearly)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _category_lines(categories, limit):
+        if limit is None or len(categories) <= limit:
+            return [f"- {category}: ${total:.2f}" for category, total in categories]
+        lines = [f"- {category}: ${total:.2f}" for category, total in categories[:limit - 1]]
+        lines.append(f"- Other ({len(categories) - limit + 1} categories): ${sum(total for _, total in categories[limit - 1:]):.2f}")
+        return lines
+
+    @staticmethod
+    def _describe(periods, categories, category_limit):
+        months = [label for label, _ in periods if len(label) == 7 and label[4] == "-" and label[5] != "Q"]
+        detail = f"monthly from {months[0]}" if months else "no monthly detail"
+        if category_limit is not None and len(categories) > category_limit:
+            detail += f", top {category_limit - 1} categories"
+        return detail
@@ -0,0 +1,162 @@
+import sqlite3
+import time
+from datetime import date
+
+import database
+
+MAX_TOOL_ROWS = 50 # Rows any one tool may return to the model
+TOOL_TIME_LIMIT = 2.0 # Seconds any one tool call may run
+PROGRESS_STEPS = 1000 # SQLite instructions between deadline checks
+
+_RANGE_PROPERTIES = {
+    "start": {"type": "string", "description": "First day included, YYYY-MM-DD. Omit for no lower bound."},
+    "end": {"type": "string", "description": "First day NOT included, YYYY-MM-DD. Omit for no upper bound."},
+}
+_CATEGORY_PROPERTY = {"type": "string", "description": "Category name exactly as listed by list_categories."}
+_LIMIT_PROPERTY = {"type": "integer", "description": f"Rows to return, 1 to {MAX_TOOL_ROWS}."}
+
+# Function declarations offered to the model, in the google.generativeai dict format
+DECLARATIONS = [
+    {
+        "name": "list_categories",
+        "description": "Names of all expense categories.",
+        "parameters": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "sum_expenses",
+        "description": "Total amount and number of expenses in a date range, optionally for one category.",
+        "parameters": {"type": "object", "properties": dict(_RANGE_PROPERTIES, category=_CATEGORY_PROPERTY)},
+    },
+    {
+        "name": "category_totals",
+        "description": "Categories ranked by total amount spent in a date range, largest first.",
+        "parameters": {"type": "object", "properties": dict(_RANGE_PROPERTIES, limit=_LIMIT_PROPERTY)},
+    },
+    {
+        "name": "period_totals",
+        "description": "Total amount spent per month or per year in a date range.",
+        "parameters": {"type": "object", "properties": dict(_RANGE_PROPERTIES, period={
+            "type": "string", "enum": ["month", "year"], "description": "Bucket size."})},
+    },
+    {
+        "name": "largest_expenses",
+        "description": "The most expensive single expenses in a date range, optionally for one category.",
+        "parameters": {"type": "object", "properties": dict(_RANGE_PROPERTIES, category=_CATEGORY_PROPERTY,
+                                                             limit=_LIMIT_PROPERTY)},
+    },
+]
+
+
+class ToolError(Exception):
+    """A tool call the model got wrong; the message is sent back to it."""
+    pass
+
+
+def _text_arg(args, name, default=None):
+    """A string argument; anything else the model sends is refused rather than bound into SQL."""
+    value = args.get(name)
+    if value is None or value == "":
+        return default
+    if not isinstance(value, str):
+        raise ToolError(f"{name} must be a string, got {value!r}")
+    return value
+
+
+def _date_arg(args, name):
+    value = _text_arg(args, name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ToolError(f"{name} must be a date in YYYY-MM-DD format, got {value!r}")
+
+
+def _limit_arg(args, default=10):
+    limit = args.get("limit")
+    if limit is None:
+        return default
+    if isinstance(limit, float) and limit.is_integer():
+        limit = int(limit) # JSON numbers can arrive as floats
+    if isinstance(limit, bool) or not isinstance(limit, int):
+        raise ToolError(f"limit must be an integer, got {limit!r}")
+    return max(1, min(MAX_TOOL_ROWS, limit))
+
+
+def _list_categories(conn, args):
+    names = database.get_categories(conn)
+    return {"categories": names[:MAX_TOOL_ROWS], "truncated": len(names) > MAX_TOOL_ROWS}
+
+
+def _sum_expenses(conn, args):
+    total, count = database.get_expense_total(conn, _date_arg(args, "start"), _date_arg(args, "end"),
+                                              _text_arg(args, "category"))
+    return {"total": round(total, 2), "count": count}
+
+
+def _category_totals(conn, args):
+    limit = _limit_arg(args)
+    rows = database.get_category_summary(conn, _date_arg(args, "start"), _date_arg(args, "end"))
+    return {"categories": [{"category": name, "total": round(total, 2)} for name, total in rows[:limit]],
+            "truncated": len(rows) > limit}
+
+
+def _period_totals(conn, args):
+    period = _text_arg(args, "period", "month")
+    if period not in ("month", "year"):
+        raise ToolError("period must be 'month' or 'year'")
+    summary = database.get_monthly_summary if period == "month" else database.get_yearly_summary
+    rows = summary(conn, _date_arg(args, "start"), _date_arg(args, "end"))
+    # Keep the most recent periods when there are too many
+    return {"periods": [{period: label, "total": round(total, 2)} for label, total in rows[-MAX_TOOL_ROWS:]],
+            "truncated": len(rows) > MAX_TOOL_ROWS}
+
+
+def _largest_expenses(conn, args):
+    rows = database.get_largest_expenses(conn, _date_arg(args, "start"), _date_arg(args, "end"),
+                                         _text_arg(args, "category"), _limit_arg(args))
+    return {"expenses": [{"date": row[1], "category": row[2], "amount": row[3], "description": row[4]}
+                         for row in rows]}
+
+
+# The only functions the model can reach; each takes a connection and the call's arguments
+TOOLS = {
+    "list_categories": _list_categories,
+    "sum_expenses": _sum_expenses,
+    "category_totals": _category_totals,
+    "period_totals": _period_totals,
+    "largest_expenses": _largest_expenses,
+}
+
+
+def call_tool(conn, name, args, time_limit=TOOL_TIME_LIMIT):
+    """
+    Run one whitelisted tool for the model. Queries past the time limit are
+    interrupted through SQLite's progress handler; use a read-only connection
+    so nothing the model asks for can write.
+    :param conn: Connection object, read-only
+    :param name: tool name from DECLARATIONS
+    :param args: dict of arguments from the model
+    :return: JSON-serializable dict; {"error": message} when the call failed
+    """
+    tool = TOOLS.get(name)
+    if tool is None:
+        return {"error": f"Unknown tool {name!r}. Available tools: {', '.join(TOOLS)}"}
+    deadline = time.monotonic() + time_limit
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+    try:
+        return tool(conn, dict(args or {}))
+    except ToolError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        if isinstance(e, sqlite3.OperationalError) and time.monotonic() > deadline:
+            return {"error": f"The query took longer than {time_limit} seconds; narrow the date range."}
+        return {"error": str(e)}
+    finally:
+        conn.set_progress_handler(None, PROGRESS_STEPS)
+
+
+def describe_call(name, args):
+    """Short human-readable form of a tool call, for the answer view."""
+    arguments = ", ".join(f"{key}={value}" for key, value in sorted((args or {}).items()))
+    return f"{name}({arguments})"
@@ -0,0 +1,11 @@
+"""
+Benchmarks for the expense manager.
+
+ledger builds synthetic ledgers into throwaway database files,
+bench_database times the public functions of database.py against them and
+bench_ui runs the real Dashboard offscreen to time its views:
+
+    python -m benchmarks.bench_database --rows 10000 100000 --output report.json
+    python -m benchmarks.bench_database --rows 100000 --compare report.json
+    python -m benchmarks.bench_ui --rows 10000 100000 --output ui_report.json
+"""
@@ -0,0 +1,222 @@
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+
+import database
+from benchmarks.ledger import build_ledger, remove_database
+
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_REPEATS = 7
+# A function is reported as regressed when its time grows by more than
+# REGRESSION_RATIO and by at least REGRESSION_MIN_MS (timer noise below that)
+REGRESSION_RATIO = 0.25
+REGRESSION_MIN_MS = 0.5
+# Benchmarks that load the whole table into Python lists are skipped above this size
+FULL_TABLE_BENCHMARKS = {"get_all_expenses", "get_expenses_for_graphing"}
+MAX_FULL_TABLE_ROWS = 2_000_000
+
+
+class BenchContext:
+    """Fixtures shared by the benchmarks of one ledger."""
+    def __init__(self, conn):
+        self.conn = conn
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM expenses ORDER BY random() LIMIT 1000")
+        self.sample_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT MIN(day), MAX(day) FROM expenses")
+        first, last = cur.fetchone()
+        self.first_day = database.from_day(first)
+        self.last_day = database.from_day(last)
+        self.middle_day = database.from_day((first + last) // 2)
+        # Mid-month bounds force the raw-table fallback of the summaries
+        self.partial_start = self.middle_day[:8] + "15"
+        self.partial_end = self.last_day
+        deep = database.get_expenses_page(conn, limit=1, after=(self.middle_day, 2 ** 62))
+        self.deep_cursor = (deep[0][1], deep[0][0]) if deep else None
+
+    def take_id(self):
+        return self.sample_ids.pop()
+
+
+def _first_pages(conn, pages):
+    loaded = []
+    for page in database.iter_expenses(conn, limit=200):
+        loaded.extend(page)
+        pages -= 1
+        if pages == 0:
+            break
+    return loaded
+
+
+# (name, fn(ctx), repeats or None for DEFAULT_REPEATS); destructive benchmarks last
+BENCHMARKS = [
+    ("add_expense", lambda ctx: database.add_expense(
+        ctx.conn, (date.today().isoformat(), "Food", 12.5, "Benchmark lunch", 0), commit=True), None),
+    ("get_expenses_page.first", lambda ctx: database.get_expenses_page(ctx.conn), None),
+    ("get_expenses_page.deep", lambda ctx: database.get_expenses_page(ctx.conn, after=ctx.deep_cursor), None),
+    ("get_expenses_page.category", lambda ctx: database.get_expenses_page(ctx.conn, filters={"category": "Rent"}), None),
+    ("iter_expenses.10_pages", lambda ctx: _first_pages(ctx.conn, 10), None),
+    ("search_expenses.prefix", lambda ctx: database.search_expenses(ctx.conn, "gro"), None),
+    ("search_expenses.two_terms", lambda ctx: database.search_expenses(ctx.conn, "coffee sh"), None),
+    ("get_monthly_summary", lambda ctx: database.get_monthly_summary(ctx.conn), None),
+    ("get_monthly_summary.partial_range", lambda ctx: database.get_monthly_summary(
+        ctx.conn, ctx.partial_start, ctx.partial_end), None),
+    ("get_category_summary", lambda ctx: database.get_category_summary(ctx.conn), None),
+    ("get_category_summary.partial_range", lambda ctx: database.get_category_summary(
+        ctx.conn, ctx.partial_start, ctx.partial_end), None),
+    ("get_yearly_summary", lambda ctx: database.get_yearly_summary(ctx.conn), None),
+    ("get_dashboard_stats", lambda ctx: database.get_dashboard_stats(ctx.conn), None),
+    ("get_starred_expenses", lambda ctx: database.get_starred_expenses(ctx.conn), None),
+    ("get_expenses_by_ids.100", lambda ctx: database.get_expenses_by_ids(ctx.conn, ctx.sample_ids[:100]), None),
+    ("update_expense_star", lambda ctx: database.update_expense_star(ctx.conn, ctx.take_id(), 1), None),
+    ("delete_expense", lambda ctx: database.delete_expense(ctx.conn, ctx.take_id()), None),
+    ("get_all_expenses", lambda ctx: database.get_all_expenses(ctx.conn), 1),
+    ("get_expenses_for_graphing", lambda ctx: database.get_expenses_for_graphing(ctx.conn), 1),
+    ("rebuild_rollups", lambda ctx: database.rebuild_rollups(ctx.conn), 1),
+    ("clear_all_expenses", lambda ctx: database.clear_all_expenses(ctx.conn), 1),
+]
+
+
+def summarize(timings):
+    """Report entry for a list of millisecond timings; the shape compare() reads."""
+    return {
+        "median_ms": round(statistics.median(timings), 4),
+        "min_ms": round(min(timings), 4),
+        "max_ms": round(max(timings), 4),
+        "repeats": len(timings),
+    }
+
+
+def time_call(fn, repeats):
+    """
+    Run fn() repeats times, after one untimed warm-up call when repeats > 1.
+    :return: dict of median/min/max milliseconds, repeats and the size of the last result
+    """
+    timings = []
+    result = None
+    if repeats > 1:
+        fn()
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    entry = summarize(timings)
+    if isinstance(result, (list, dict)):
+        entry["result_rows"] = len(result)
+    return entry
+
+
+def run_size(rows, seed=0, repeats=DEFAULT_REPEATS, only=None, keep=False):
+    """
+    Build a ledger of `rows` expenses and time every benchmark against it.
+    :param only: optional set of benchmark names to run
+    :param keep: leave the ledger file on disk
+    :return: dict of benchmark name -> timing entry
+    """
+    path, insert_seconds = build_ledger(rows, seed=seed)
+    results = {
+        "add_expenses_bulk": {
+            "median_ms": round(insert_seconds * 1000, 4),
+            "rows_per_second": round(rows / insert_seconds) if insert_seconds else None,
+            "repeats": 1,
+        },
+    }
+    conn = database.create_connection(path)
+    try:
+        ctx = BenchContext(conn)
+        for name, fn, bench_repeats in BENCHMARKS:
+            if only and name not in only:
+                continue
+            if name in FULL_TABLE_BENCHMARKS and rows > MAX_FULL_TABLE_ROWS:
+                continue
+            results[name] = time_call(lambda: fn(ctx), bench_repeats or repeats)
+    finally:
+        conn.close()
+        if not keep:
+            remove_database(path)
+        else:
+            print(f"Kept ledger at {path}", file=sys.stderr)
+    return results
+
+
+def environment():
+    """Describe the machine and commit a report was taken on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "taken_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(report, baseline, ratio=REGRESSION_RATIO, min_ms=REGRESSION_MIN_MS):
+    """
+    Compare two reports size by size. Repeated benchmarks are compared on
+    their fastest run, which is far less sensitive to a busy machine than the median.
+    :return: list of (rows, name, baseline_ms, current_ms) for the regressions
+    """
+    regressions = []
+    for rows, results in report["results"].items():
+        previous = baseline.get("results", {}).get(rows, {})
+        for name, entry in results.items():
+            if name not in previous:
+                continue
+            key = "min_ms" if entry["repeats"] > 1 and "min_ms" in previous[name] else "median_ms"
+            before = previous[name][key]
+            after = entry[key]
+            if after > before * (1 + ratio) and after - before >= min_ms:
+                regressions.append((rows, name, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time database.py against synthetic ledgers.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="ledger sizes to benchmark (10k to 10M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--only", nargs="+", help="benchmark names to run")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report; exit 1 on regressions")
+    parser.add_argument("--keep", action="store_true", help="keep the generated ledger files")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(), "seed": args.seed, "results": {}}
+    for rows in args.rows:
+        print(f"Benchmarking {rows} rows...", file=sys.stderr)
+        report["results"][str(rows)] = run_size(rows, args.seed, args.repeats, set(args.only or ()), args.keep)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline)
+        for rows, name, before, after in regressions:
+            print(f"REGRESSION {name} @ {rows} rows: {before:.3f} ms -> {after:.3f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
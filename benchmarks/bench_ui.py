@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Must be set before Qt is imported anywhere
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+import charts
+from benchmarks.bench_database import compare, environment, summarize
+from benchmarks.ledger import build_ledger, remove_database
+
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_FRAMES = 30
+DEFAULT_REPEATS = 5
+TIMEOUT_SECONDS = 60
+# Runs in a fresh interpreter for each cold start sample. It imports main first,
+# as `python main.py` does, so main.LAUNCHED_AT comes before every heavy import,
+# and prints StartupTimer's launch-to-first-paint time.
+COLD_START_SCRIPT = """
+import sys
+import main
+from PyQt5.QtCore import QEventLoop
+
+app = main.create_application(sys.argv[:1])
+window = main.Dashboard(db_file=sys.argv[1])
+window.show()
+while window.startup_timer.elapsed_ms is None:
+    app.processEvents(QEventLoop.AllEvents, 5)
+print(window.startup_timer.elapsed_ms)
+window.close()
+"""
+GRAPH_TYPES = ["Bar Chart (Category)", "Line Chart (Trend)", "Pie Chart (Category)",
+               "Stacked Area (Category by Month)", "Calendar Heatmap"]
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far, in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak # macOS reports bytes
+
+
+def wait_until(app, predicate, timeout=TIMEOUT_SECONDS):
+    """
+    Spin the Qt event loop until predicate() holds, so queued results from the
+    database threads are delivered exactly as they would be in the running app.
+    :return: milliseconds waited
+    """
+    started = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError("UI did not settle within the timeout")
+        app.processEvents(QEventLoop.AllEvents, 5)
+    return (time.perf_counter() - started) * 1000
+
+
+def settle(app, service):
+    """Wait for the database worker to drain its queue and deliver every callback."""
+    service.call(lambda conn: None)
+    app.processEvents()
+
+
+def time_frames(app, widget, frames):
+    """Time rendering `widget` (paintEvent of it and its children) `frames` times."""
+    timings = []
+    for _ in range(frames):
+        started = time.perf_counter()
+        widget.grab()
+        timings.append((time.perf_counter() - started) * 1000)
+    app.processEvents()
+    return summarize(timings)
+
+
+def bench_table(app, window, name, repeats, frames):
+    """Refresh latency (reset until the first page is on screen), scroll paging and paint time."""
+    window.show_view(name)
+    view = window.view(name)
+    model = view.model
+    table = view.expense_table
+
+    def first_page_loaded():
+        return model.rowCount() > 0 or (model.cursor is None and not model.fetching)
+
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        view.refresh()
+        wait_until(app, first_page_loaded)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # Scroll to the bottom repeatedly; each time the view asks the model for the next page
+    page_latencies = []
+    while len(page_latencies) < 10 and model.canFetchMore():
+        loaded = model.rowCount()
+        started = time.perf_counter()
+        table.scrollToBottom()
+        wait_until(app, lambda: model.rowCount() > loaded or model.cursor is None)
+        page_latencies.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "refresh": summarize(latencies),
+        "scroll_page": summarize(page_latencies) if page_latencies else None,
+        "paint_frame": time_frames(app, table.viewport(), frames),
+        "rows_loaded": model.rowCount(),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def time_pan_frames(app, view, frames):
+    """Time re-rendering the trend chart while panning across a zoomed-in window."""
+    view.window.reset()
+    view.window.zoom(0.25)
+    direction = 0.05
+    timings = []
+    for _ in range(frames):
+        if view.window.start <= view.window.extent[0] or view.window.end >= view.window.extent[1]:
+            direction = -direction # Bounce off either end of the data
+        view.window.pan(direction)
+        started = time.perf_counter()
+        view.grab()
+        timings.append((time.perf_counter() - started) * 1000)
+    view.window.reset()
+    app.processEvents()
+    return summarize(timings)
+
+
+def bench_graphs(app, window, repeats, frames):
+    """Data latency (query until the graph has data) and paint time per graph type."""
+    window.show_view("graphs")
+    view = window.view("graphs")
+    results = {}
+    for graph_type in GRAPH_TYPES:
+        view.graph_type_combo.setCurrentText(graph_type)
+        latencies = []
+        for _ in range(repeats):
+            view.data_for_painting = []
+            view.graph_title = ""
+            started = time.perf_counter()
+            view.update_graph()
+            wait_until(app, lambda: view.data_for_painting or view.graph_title.startswith("No data"))
+            latencies.append((time.perf_counter() - started) * 1000)
+        results[graph_type] = {
+            "update": summarize(latencies),
+            "paint_frame": time_frames(app, view, frames),
+            "peak_rss_kb": peak_rss_kb(),
+        }
+        if graph_type == "Line Chart (Trend)" and view.zoomable():
+            for resolution in charts.RESOLUTIONS:
+                view.resolution_combo.setCurrentText(resolution)
+                results[graph_type][resolution] = {"pan_frame": time_pan_frames(app, view, frames)}
+    return results
+
+
+def bench_dashboard_stats(app, window, repeats, frames):
+    window.show_view("dashboard")
+    view = window.view("dashboard")
+    latencies = []
+    for _ in range(repeats):
+        view.month_card.value_label.setText("")
+        started = time.perf_counter()
+        view.update_stats()
+        wait_until(app, lambda: view.month_card.value_label.text() != "")
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "update": summarize(latencies),
+        "paint_frame": time_frames(app, view, frames),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def bench_cold_start(path, repeats):
+    """
+    Launch the app in a new process `repeats` times and time each start.
+    :return: {"first_paint": launch to the first dashboard paint, as
+        StartupTimer measures it against STARTUP_TARGET_MS, "process": spawn
+        to exit, interpreter start-up and teardown included}
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    first_paint = []
+    process = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT, path], cwd=root, check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True, timeout=TIMEOUT_SECONDS).stdout
+        process.append((time.perf_counter() - started) * 1000)
+        first_paint.append(float(output.split()[-1]))
+    return {"first_paint": summarize(first_paint), "process": summarize(process)}
+
+
+def run_size(app, rows, seed=0, repeats=DEFAULT_REPEATS, frames=DEFAULT_FRAMES):
+    """Build a ledger, open the real Dashboard on it and measure every view."""
+    from main import Dashboard
+
+    path, _ = build_ledger(rows, seed=seed)
+    try:
+        # Same hook the app uses, from construction to the first painted dashboard;
+        # bench_cold_start adds the imports and a fresh process
+        window = Dashboard(db_file=path, launched_at=time.perf_counter())
+        window.show()
+        wait_until(app, lambda: window.startup_timer.elapsed_ms is not None)
+        settle(app, window.service)
+
+        results = {
+            "startup": summarize([window.startup_timer.elapsed_ms]),
+            "ViewExpensesView": bench_table(app, window, "expenses", repeats, frames),
+            "StarredView": bench_table(app, window, "starred", repeats, frames),
+            "GraphsView": bench_graphs(app, window, repeats, frames),
+            "DashboardView": bench_dashboard_stats(app, window, repeats, frames),
+        }
+        window.close() # Stops the database service
+        window.deleteLater()
+        app.processEvents()
+        results["cold_start"] = bench_cold_start(path, repeats)
+    finally:
+        remove_database(path)
+    return results
+
+
+def flatten(results, prefix=""):
+    """Flatten nested view results to the name -> timing entry shape compare() reads."""
+    flat = {}
+    for name, value in results.items():
+        key = f"{prefix}{name}"
+        if isinstance(value, dict) and "median_ms" in value:
+            flat[key] = value
+        elif isinstance(value, dict):
+            flat.update(flatten(value, key + "."))
+    return flat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the Dashboard views offscreen against synthetic ledgers.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="paints timed per view")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report; exit 1 on regressions")
+    args = parser.parse_args(argv)
+
+    from main import create_application
+
+    app = QApplication.instance() or create_application(sys.argv[:1])
+    report = {"environment": environment(), "seed": args.seed, "qt_platform": app.platformName(),
+              "views": {}, "results": {}}
+    for rows in args.rows:
+        print(f"Benchmarking UI with {rows} rows...", file=sys.stderr)
+        views = run_size(app, rows, args.seed, args.repeats, args.frames)
+        report["views"][str(rows)] = views
+        report["results"][str(rows)] = flatten(views)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline)
+        for rows, name, before, after in regressions:
+            print(f"REGRESSION {name} @ {rows} rows: {before:.3f} ms -> {after:.3f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
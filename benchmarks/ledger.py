@@ -0,0 +1,102 @@
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import database
+
+# (category, relative frequency, median amount) -- a few categories dominate
+# the ledger the way groceries and transport do in real spending
+CATEGORIES = [
+    ("Food", 34, 18.0),
+    ("Transport", 20, 9.0),
+    ("Shopping", 14, 42.0),
+    ("Entertainment", 10, 25.0),
+    ("Utilities", 8, 80.0),
+    ("Other", 7, 15.0),
+    ("Rent", 4, 950.0),
+    ("Salary", 3, 120.0),
+]
+
+MERCHANTS = {
+    "Food": ["Grocery store", "Bakery", "Coffee shop", "Pizza place", "Supermarket weekly shop", "Sushi bar"],
+    "Transport": ["Metro card top-up", "Taxi ride", "Fuel station", "Train ticket", "Parking"],
+    "Shopping": ["Online order", "Clothing store", "Hardware store", "Bookshop", "Electronics"],
+    "Entertainment": ["Cinema tickets", "Streaming subscription", "Concert", "Museum", "Video game"],
+    "Utilities": ["Electricity bill", "Water bill", "Internet", "Mobile phone plan", "Gas bill"],
+    "Other": ["Pharmacy", "Gift", "Donation", "Haircut", "Post office"],
+    "Rent": ["Monthly rent"],
+    "Salary": ["Payroll adjustment", "Team lunch refund"],
+}
+
+STARRED_RATE = 0.02
+
+
+def generate_expenses(count, seed=0, end=None, years=10):
+    """
+    Yield a reproducible synthetic ledger, oldest expense first.
+    Categories follow CATEGORIES' weights, amounts are log-normal around each
+    category's median, and dates lean towards the recent end of the range
+    (spending grows over time) with busier weekends.
+    :param count: number of expenses
+    :param seed: random seed; the same seed always yields the same ledger
+    :param end: last date of the ledger, default today
+    :param years: length of the date range
+    :return: generator of (date, category, amount, description, starred) tuples
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    span = years * 365
+    start = end - timedelta(days=span)
+    names = [name for name, _, _ in CATEGORIES]
+    weights = [weight for _, weight, _ in CATEGORIES]
+    medians = {name: median for name, _, median in CATEGORIES}
+
+    # Draw the day offsets up front so the ledger comes out in date order,
+    # like a real history appended to over the years
+    offsets = []
+    while len(offsets) < count:
+        offset = int(span * rng.betavariate(2.0, 1.2))
+        if (start + timedelta(days=offset)).weekday() >= 5 or rng.random() < 0.75:
+            offsets.append(offset)
+    offsets.sort()
+
+    day_cache = {}
+    for offset in offsets:
+        day = day_cache.get(offset)
+        if day is None:
+            day = day_cache[offset] = (start + timedelta(days=offset)).isoformat()
+        category = rng.choices(names, weights)[0]
+        amount = round(medians[category] * rng.lognormvariate(0.0, 0.6), 2) or 0.01
+        description = rng.choice(MERCHANTS[category])
+        starred = 1 if rng.random() < STARRED_RATE else 0
+        yield (day, category, amount, description, starred)
+
+
+def build_ledger(rows, path=None, seed=0, batch_size=5000):
+    """
+    Create a database file holding a synthetic ledger of `rows` expenses.
+    :param rows: number of expenses
+    :param path: database file to create (removed first), default a new temp file
+    :param seed: see generate_expenses
+    :return: (path, seconds spent in add_expenses_bulk)
+    """
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix=f"ledger-{rows}-", suffix=".db")
+        os.close(handle)
+    remove_database(path)
+    database.main(path)
+    conn = database.create_connection(path)
+    started = time.perf_counter()
+    database.add_expenses_bulk(conn, generate_expenses(rows, seed), batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return path, elapsed
+
+
+def remove_database(path):
+    """Delete a database file together with its WAL, shared-memory and snapshot files."""
+    for suffix in ("", "-wal", "-shm", ".snapshot.json"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
@@ -0,0 +1,375 @@
+import bisect
+from datetime import date
+
+from PyQt5.QtCore import QPointF, Qt
+from PyQt5.QtGui import QColor, QPainterPath, QPolygonF, QStaticText, QTransform
+
+import database
+
+# Resolutions of the spending trend; buckets are labelled by their first day
+RESOLUTIONS = ["Daily", "Weekly", "Monthly"]
+MIN_WINDOW_DAYS = 7 # Zooming in stops at a week on screen
+
+# Category colours in order of total spend; the last one is for the merged "Other" categories
+PALETTE = ["#3d3dff", "#ff6b6b", "#4ecdc4", "#ffd93d", "#a66cff", "#ff9f43", "#1dd1a1", "#54a0ff", "#888888"]
+# Calendar heatmap: no spending, then four quantile bands of the days with spending
+HEATMAP_COLORS = ["#1a1a1a", "#1a1052", "#2a2aa8", "#3d3dff", "#8a8aff"]
+CALENDAR_WEEKS = 53
+
+
+def _to_date(day):
+    return date.fromordinal(day + database.EPOCH_ORDINAL)
+
+
+def _from_date(value):
+    return value.toordinal() - database.EPOCH_ORDINAL
+
+
+def bucket_start(day, resolution):
+    """First day of the bucket holding `day`. Weeks start on Monday (day 0 was a Thursday)."""
+    if resolution == "Weekly":
+        return day - (day + 3) % 7
+    if resolution == "Monthly":
+        return day - (_to_date(day).day - 1)
+    return day
+
+
+def next_bucket(day, resolution):
+    """First day of the bucket after the one starting on `day`."""
+    if resolution == "Weekly":
+        return day + 7
+    if resolution == "Monthly":
+        value = _to_date(day)
+        if value.month == 12:
+            return _from_date(date(value.year + 1, 1, 1))
+        return _from_date(date(value.year, value.month + 1, 1))
+    return day + 1
+
+
+def bucket_series(series, resolution):
+    """
+    Sum a daily series into buckets of the given resolution. Buckets without
+    expenses are filled in with 0 so quiet periods show as dips, not as a
+    straight line to the next purchase.
+    :param series: (day number, amount) pairs sorted by day, as from get_daily_series
+    :return: list of (bucket start day, amount)
+    """
+    buckets = []
+    for day, amount in series:
+        start = bucket_start(day, resolution)
+        if buckets and buckets[-1][0] == start:
+            buckets[-1][1] += amount
+            continue
+        if buckets:
+            gap = next_bucket(buckets[-1][0], resolution)
+            while gap < start:
+                buckets.append([gap, 0.0])
+                gap = next_bucket(gap, resolution)
+        buckets.append([start, amount])
+    return [(start, amount) for start, amount in buckets]
+
+
+def label_for_day(day, resolution):
+    """Axis label of a bucket: the month for monthly series, else the date."""
+    text = database.from_day(int(day))
+    return text[:7] if resolution == "Monthly" else text
+
+
+class TimeSeries:
+    """A (day, amount) series split into parallel lists for bisecting by day."""
+    def __init__(self, points):
+        self.days = [point[0] for point in points]
+        self.amounts = [point[1] for point in points]
+
+    def __len__(self):
+        return len(self.days)
+
+    def extent(self):
+        """(first day, last day), or None for an empty series."""
+        if not self.days:
+            return None
+        return self.days[0], self.days[-1]
+
+    def visible(self, start, end):
+        """
+        Index range of the points between start and end, widened by one point
+        on each side so the line runs to the edges of the plot.
+        :return: (first index, end index) for slicing
+        """
+        first = max(0, bisect.bisect_left(self.days, start) - 1)
+        last = min(len(self.days), bisect.bisect_right(self.days, end) + 1)
+        return first, last
+
+    def downsample(self, start, end, columns):
+        """
+        Level-of-detail reduction of the visible points to what `columns`
+        pixel columns can show: every column keeps its lowest and highest point,
+        in day order, so spikes survive at any zoom level. Visible ranges that
+        already fit are returned as they are.
+        :return: list of (day, amount), at most about 2 * columns long
+        """
+        first, last = self.visible(start, end)
+        days = self.days[first:last]
+        amounts = self.amounts[first:last]
+        if len(days) <= 2 * columns or columns <= 0:
+            return list(zip(days, amounts))
+
+        scale = columns / ((end - start) or 1)
+        points = []
+        column = None
+        low = high = 0
+        for i, day in enumerate(days):
+            current = int((day - start) * scale)
+            if current != column:
+                if column is not None:
+                    points.extend(_column_points(days, amounts, low, high))
+                column = current
+                low = high = i
+            elif amounts[i] < amounts[low]:
+                low = i
+            elif amounts[i] > amounts[high]:
+                high = i
+        points.extend(_column_points(days, amounts, low, high))
+        return points
+
+
+def _column_points(days, amounts, low, high):
+    if low == high:
+        return [(days[low], amounts[low])]
+    first, second = sorted((low, high))
+    return [(days[first], amounts[first]), (days[second], amounts[second])]
+
+
+class TimeWindow:
+    """
+    The visible [start, end] range of a time axis in day numbers. Zooming and
+    panning keep it inside the extent of the data; a window that was showing
+    everything keeps showing everything when the data grows.
+    """
+    def __init__(self):
+        self.extent = None
+        self.start = None
+        self.end = None
+
+    def set_extent(self, extent):
+        """:param extent: (first day, last day) of the data, or None"""
+        zoomed = self.is_zoomed()
+        if extent is None:
+            self.extent = self.start = self.end = None
+            return
+        first, last = extent
+        self.extent = (first, max(last, first + 1))
+        if zoomed:
+            self._clamp(self.end - self.start)
+        else:
+            self.reset()
+
+    def is_zoomed(self):
+        return self.extent is not None and (self.start, self.end) != self.extent
+
+    def reset(self):
+        if self.extent is not None:
+            self.start, self.end = self.extent
+
+    def zoom(self, factor, anchor=0.5):
+        """
+        Scale the window by `factor` (< 1 zooms in), keeping the day at
+        `anchor` (0 = left edge, 1 = right edge) in place.
+        """
+        if self.extent is None:
+            return
+        span = self.end - self.start
+        full = self.extent[1] - self.extent[0]
+        new_span = min(full, max(min(MIN_WINDOW_DAYS, full), span * factor))
+        pivot = self.start + anchor * span
+        self.start = pivot - anchor * new_span
+        self._clamp(new_span)
+
+    def pan(self, fraction):
+        """Shift the window by `fraction` of its width (positive moves later in time)."""
+        if self.extent is None:
+            return
+        span = self.end - self.start
+        self.start += fraction * span
+        self._clamp(span)
+
+    def _clamp(self, span):
+        first, last = self.extent
+        span = min(span, last - first)
+        self.start = min(max(self.start, first), last - span)
+        self.end = self.start + span
+
+
+def _merge_other(names, limit):
+    """The first limit - 1 names, plus "Other" standing for the rest when there are too many."""
+    if len(names) <= limit:
+        return list(names)
+    return list(names[:limit - 1]) + ["Other"]
+
+
+def pie_slices(summary, limit=len(PALETTE)):
+    """
+    Angles of a pie of category totals, largest first and clockwise from
+    12 o'clock. Categories past limit - 1 are merged into one "Other" slice.
+    :param summary: (category, amount) rows, as from get_category_summary
+    :return: list of (category, amount, start angle, span angle) in degrees, Qt's convention
+    """
+    rows = sorted(((category, amount) for category, amount in summary if amount > 0), key=lambda row: -row[1])
+    names = _merge_other([category for category, _ in rows], limit)
+    if len(names) < len(rows):
+        rows = rows[:len(names) - 1] + [("Other", sum(amount for _, amount in rows[len(names) - 1:]))]
+    total = sum(amount for _, amount in rows)
+    slices = []
+    angle = 90.0
+    for category, amount in rows:
+        span = 360.0 * amount / total
+        slices.append((category, amount, angle, -span))
+        angle -= span
+    return slices
+
+
+def stack_layers(rows, limit=len(PALETTE)):
+    """
+    Cumulative layers of a stacked area chart, biggest category at the bottom.
+    Categories past limit - 1 are merged into "Other".
+    :param rows: (month, category, amount) rows in month order, as from get_category_monthly_summary
+    :return: (months, categories, layers) where layers[i][j] is the top edge of
+        category i in month j
+    """
+    totals = {}
+    months = []
+    for month, category, amount in rows:
+        totals[category] = totals.get(category, 0.0) + amount
+        if not months or months[-1] != month:
+            months.append(month)
+    categories = _merge_other(sorted(totals, key=lambda category: -totals[category]), limit)
+    index = {category: i for i, category in enumerate(categories)}
+    month_index = {month: i for i, month in enumerate(months)}
+    values = [[0.0] * len(months) for _ in categories]
+    for month, category, amount in rows:
+        values[index.get(category, len(categories) - 1)][month_index[month]] += amount
+    layers = []
+    running = [0.0] * len(months)
+    for row in values:
+        running = [below + amount for below, amount in zip(running, row)]
+        layers.append(running)
+    return months, categories, layers
+
+
+def calendar_start(today):
+    """First day (a Monday) of the CALENDAR_WEEKS-week grid that ends with the week of `today` (a day number)."""
+    return bucket_start(today, "Weekly") - 7 * (CALENDAR_WEEKS - 1)
+
+
+def calendar_cells(series, today):
+    """
+    One cell per day of the calendar grid, through today.
+    :param series: (day, amount) rows, as from get_daily_series starting at calendar_start(today)
+    :return: list of (week column, weekday row with Monday = 0, day number, amount)
+    """
+    first = calendar_start(today)
+    amounts = dict(series)
+    return [((day - first) // 7, (day - first) % 7, day, amounts.get(day, 0.0)) for day in range(first, today + 1)]
+
+
+def intensity_thresholds(amounts, levels=len(HEATMAP_COLORS)):
+    """Quantile boundaries splitting the days with spending into levels - 1 bands."""
+    spent = sorted(amount for amount in amounts if amount > 0)
+    if not spent:
+        return []
+    bands = levels - 1
+    return [spent[min(len(spent) - 1, len(spent) * i // bands)] for i in range(1, bands)]
+
+
+def intensity(amount, thresholds):
+    """Heatmap level of an amount: 0 for no spending, else 1 + the bands it reaches."""
+    if amount <= 0:
+        return 0
+    return 1 + bisect.bisect_right(thresholds, amount)
+
+
+class ChartBatch:
+    """
+    Collects the primitives of a chart and paints them grouped by colour: one
+    drawRects per fill colour, one fill per area or ring segment and a single
+    rotation for all rotated labels, instead of saving, transforming and
+    restoring the painter around every bar, cell and label. Text is drawn as
+    QStaticText, whose layouts are cached across renders.
+    """
+    TEXT_CACHE_SIZE = 2048
+    _texts = {}
+
+    def __init__(self):
+        self.rects = {}
+        self.polygons = []
+        self.paths = []
+        self.labels = []
+        self.rotated_labels = {}
+
+    def add_rect(self, color, rect):
+        self.rects.setdefault(color, []).append(rect)
+
+    def add_polygon(self, color, points):
+        self.polygons.append((color, QPolygonF(points)))
+
+    def add_ring_segment(self, color, outer, inner, start, span):
+        """A pie slice (inner is None) or donut segment between the two ellipses, angles in degrees."""
+        path = QPainterPath()
+        if inner is None:
+            path.moveTo(outer.center())
+            path.arcTo(outer, start, span)
+        else:
+            path.arcMoveTo(outer, start)
+            path.arcTo(outer, start, span)
+            path.arcTo(inner, start + span, -span)
+        path.closeSubpath()
+        self.paths.append((color, path))
+
+    def add_label(self, point, text):
+        """Text with its top-left corner at point."""
+        self.labels.append((point, text))
+
+    def add_rotated_label(self, anchor, text, angle=-45, offset=QPointF(-40, 0)):
+        """Text rotated by angle around anchor, its top-left corner at offset in the rotated frame."""
+        self.rotated_labels.setdefault(angle, []).append((anchor, offset, text))
+
+    @classmethod
+    def static_text(cls, text, font, angle=0):
+        """The laid-out text, prepared for the rotation it is drawn with so the layout is reused."""
+        key = (text, font.key(), angle)
+        static = cls._texts.get(key)
+        if static is None:
+            if len(cls._texts) >= cls.TEXT_CACHE_SIZE:
+                cls._texts.clear()
+            static = QStaticText(text)
+            static.setPerformanceHint(QStaticText.AggressiveCaching)
+            static.prepare(QTransform().rotate(angle), font)
+            cls._texts[key] = static
+        return static
+
+    def paint(self, painter):
+        painter.save()
+        text_pen = painter.pen()
+        painter.setPen(Qt.NoPen)
+        for color, rects in self.rects.items():
+            painter.setBrush(QColor(color))
+            painter.drawRects(rects)
+        for color, polygon in self.polygons:
+            painter.setBrush(QColor(color))
+            painter.drawPolygon(polygon)
+        for color, path in self.paths:
+            painter.fillPath(path, QColor(color))
+
+        painter.setPen(text_pen)
+        painter.setBrush(Qt.NoBrush)
+        font = painter.font()
+        for point, text in self.labels:
+            painter.drawStaticText(point, self.static_text(text, font))
+        for angle, labels in self.rotated_labels.items():
+            # Rotate once, and place every label at its anchor mapped into the rotated frame
+            to_rotated = QTransform().rotate(-angle)
+            painter.rotate(angle)
+            for anchor, offset, text in labels:
+                painter.drawStaticText(to_rotated.map(anchor) + offset, self.static_text(text, font, angle))
+            painter.rotate(-angle)
+        painter.restore()
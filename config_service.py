@@ -0,0 +1,127 @@
+import json
+import os
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, pyqtSignal
+
+# Next to main.py and the database, wherever the app is started from
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+# Assistant defaults; assistant.py takes them from here
+DEFAULT_MODEL = "gemini-flash-latest"
+DEFAULT_TIMEOUT = 60.0 # Seconds a whole answer may take before it is abandoned
+DEFAULT_CONTEXT_TOKENS = 1500 # Prompt context budget, see assistant.ContextBuilder
+
+# Every setting the app reads, with its default; the default's type is the setting's type
+DEFAULTS = {
+    "GEMINI_API_KEY": "",
+    "GEMINI_MODEL": DEFAULT_MODEL,
+    "GEMINI_TIMEOUT": DEFAULT_TIMEOUT,
+    "GEMINI_CONTEXT_TOKENS": DEFAULT_CONTEXT_TOKENS,
+    "GEMINI_WEB_ENGINE": False,
+    "FONT_SIZE": 12,
+    "LOGO_PATH": "",
+    "BACKUP_EMAIL": "",
+}
+
+# Smallest usable value of each numeric setting; smaller ones are raised to it
+MINIMUMS = {
+    "GEMINI_TIMEOUT": 1.0,
+    "GEMINI_CONTEXT_TOKENS": 100,
+    "FONT_SIZE": 6,
+}
+
+
+def coerce(key, value):
+    """
+    Convert a value read from config.json to the type of the setting's default.
+    A value that cannot be converted is replaced by the default; a number below
+    the setting's entry in MINIMUMS is raised to it.
+    """
+    default = DEFAULTS.get(key)
+    if default is None or value is None:
+        return value if default is None else default
+    try:
+        if isinstance(default, bool):
+            if isinstance(value, str):
+                return value.strip().lower() in ("1", "true", "yes", "on")
+            return bool(value)
+        value = type(default)(value)
+    except (TypeError, ValueError, OverflowError) as e:
+        print(f"Invalid {key} in config.json: {e}")
+        return default
+    minimum = MINIMUMS.get(key)
+    if minimum is not None and not value >= minimum: # Also catches NaN
+        print(f"{key} in config.json is below {minimum}; using {minimum}")
+        return minimum
+    return value
+
+
+class ConfigService(QObject):
+    """
+    Loads config.json once and hands out typed values from memory. Saves are
+    written atomically and the file is watched, so an edit from outside the app
+    is picked up too. `changed` is emitted with the set of keys whose values
+    changed, after either.
+    """
+    changed = pyqtSignal(object)
+
+    def __init__(self, path=CONFIG_FILE, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.values = self._read()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.reload)
+        self._watch()
+
+    def get(self, key):
+        """The setting's value, or its default when config.json does not set it."""
+        return self.values.get(key, DEFAULTS.get(key))
+
+    def update(self, values):
+        """
+        Change some settings and save them. Keys not given, including ones this
+        version of the app does not know, are kept as they are.
+        :param values: dict of key -> new value
+        """
+        saved = dict(self.values)
+        saved.update({key: coerce(key, value) for key, value in values.items()})
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(saved, f, indent=4)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(e)
+            return
+        self._apply(saved)
+        self._watch() # The replaced file is a new one to the watcher
+
+    def reload(self, path=None):
+        """Re-read the file after it changed on disk."""
+        self._watch()
+        self._apply(self._read())
+
+    def _apply(self, values):
+        keys = set(values) | set(self.values)
+        changed = {key for key in keys if values.get(key) != self.values.get(key)}
+        self.values = values
+        if changed:
+            self.changed.emit(changed)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(e) # Keep running on defaults rather than refuse to start
+            return dict(getattr(self, "values", {}))
+        if not isinstance(saved, dict):
+            return {}
+        return {key: coerce(key, value) for key, value in saved.items()}
+
+    def _watch(self):
+        # Editors and update() replace the file, which drops it from the watch list
+        if self.path not in self.watcher.files() and os.path.exists(self.path):
+            self.watcher.addPath(self.path)
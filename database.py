@@ -1,23 +1,330 @@
+import hashlib
+import os
+import re
 import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
 from sqlite3 import Error
-from datetime import datetime, timedelta
-import random
+from datetime import date
+from itertools import islice
 
-def create_connection(db_file):
+# Schema version stored in PRAGMA user_version; see migrate()
+SCHEMA_VERSION = 5
+
+# Applied to every connection by create_connection. WAL lets readers run
+# alongside the writer; synchronous=NORMAL is durable across app crashes in WAL
+# mode and only fsyncs at checkpoints. Negative cache_size is in KiB.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -16000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+# Dates are stored as day numbers: days since 1970-01-01 (Julian day 2440587.5)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+SQL_DAY_FROM_TEXT = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+SQL_TEXT_FROM_DAY = "date({} + 2440587.5)"
+SQL_MONTH_FROM_DAY = "strftime('%Y-%m', {} + 2440587.5)"
+
+# Amounts are stored as integer cents
+SQL_CENTS_FROM_AMOUNT = "CAST(round({} * 100) AS INTEGER)"
+
+SQL_CREATE_CATEGORIES = """ CREATE TABLE IF NOT EXISTS categories (
+                                id integer PRIMARY KEY,
+                                name text NOT NULL UNIQUE
+                            ); """
+
+SQL_CREATE_EXPENSES = """ CREATE TABLE IF NOT EXISTS {table} (
+                              id integer PRIMARY KEY,
+                              day integer NOT NULL,
+                              category_id integer NOT NULL REFERENCES categories(id),
+                              amount_cents integer NOT NULL,
+                              description text,
+                              starred integer NOT NULL DEFAULT 0
+                          ); """
+
+# Indexes backing the dashboard, summary, starred and paging queries.
+# idx_expenses_day also carries amount_cents so range sums never touch the table;
+# idx_expenses_recent, idx_expenses_category_day and idx_expenses_starred end in
+# the implicit rowid, so they deliver rows in (day, id) keyset order.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_expenses_day ON expenses(day, amount_cents)",
+    "CREATE INDEX IF NOT EXISTS idx_expenses_recent ON expenses(day)",
+    "CREATE INDEX IF NOT EXISTS idx_expenses_category_day ON expenses(category_id, day)",
+    "CREATE INDEX IF NOT EXISTS idx_expenses_starred ON expenses(day) WHERE starred = 1",
+]
+
+# Per (month, category) totals kept current by triggers on expenses, so the
+# summaries cost O(months x categories) instead of O(rows).
+SQL_CREATE_ROLLUPS = """ CREATE TABLE IF NOT EXISTS expense_rollups (
+                            month text NOT NULL,
+                            category_id integer NOT NULL,
+                            total_cents integer NOT NULL DEFAULT 0,
+                            count integer NOT NULL DEFAULT 0,
+                            PRIMARY KEY (month, category_id)
+                        ) WITHOUT ROWID; """
+
+ROLLUP_TRIGGERS = [
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_insert AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expense_rollups(month, category_id, total_cents, count)
+            VALUES (strftime('%Y-%m', NEW.day + 2440587.5), NEW.category_id, NEW.amount_cents, 1)
+            ON CONFLICT(month, category_id) DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+        END; """,
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_delete AFTER DELETE ON expenses
+        BEGIN
+            UPDATE expense_rollups SET total_cents = total_cents - OLD.amount_cents, count = count - 1
+            WHERE month = strftime('%Y-%m', OLD.day + 2440587.5) AND category_id = OLD.category_id;
+            DELETE FROM expense_rollups
+            WHERE month = strftime('%Y-%m', OLD.day + 2440587.5) AND category_id = OLD.category_id AND count <= 0;
+        END; """,
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_update AFTER UPDATE OF day, category_id, amount_cents ON expenses
+        BEGIN
+            UPDATE expense_rollups SET total_cents = total_cents - OLD.amount_cents, count = count - 1
+            WHERE month = strftime('%Y-%m', OLD.day + 2440587.5) AND category_id = OLD.category_id;
+            DELETE FROM expense_rollups
+            WHERE month = strftime('%Y-%m', OLD.day + 2440587.5) AND category_id = OLD.category_id AND count <= 0;
+            INSERT INTO expense_rollups(month, category_id, total_cents, count)
+            VALUES (strftime('%Y-%m', NEW.day + 2440587.5), NEW.category_id, NEW.amount_cents, 1)
+            ON CONFLICT(month, category_id) DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+        END; """,
+]
+
+# Full-text index over description and category name. It is contentless
+# (content='') so text is not stored twice; the triggers therefore pass the
+# old values when deleting, as FTS5 requires for contentless tables.
+SQL_CREATE_FTS = """ CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+                         description, category, content='', prefix='2 3',
+                         tokenize='unicode61 remove_diacritics 2'
+                     ); """
+
+FTS_TRIGGERS = [
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_insert AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expenses_fts(rowid, description, category)
+            VALUES (NEW.id, COALESCE(NEW.description, ''), (SELECT name FROM categories WHERE id = NEW.category_id));
+        END; """,
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_delete AFTER DELETE ON expenses
+        BEGIN
+            INSERT INTO expenses_fts(expenses_fts, rowid, description, category)
+            VALUES ('delete', OLD.id, COALESCE(OLD.description, ''), (SELECT name FROM categories WHERE id = OLD.category_id));
+        END; """,
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_update AFTER UPDATE OF description, category_id ON expenses
+        BEGIN
+            INSERT INTO expenses_fts(expenses_fts, rowid, description, category)
+            VALUES ('delete', OLD.id, COALESCE(OLD.description, ''), (SELECT name FROM categories WHERE id = OLD.category_id));
+            INSERT INTO expenses_fts(rowid, description, category)
+            VALUES (NEW.id, COALESCE(NEW.description, ''), (SELECT name FROM categories WHERE id = NEW.category_id));
+        END; """,
+]
+
+# Revision counter bumped by every insert, update and delete on expenses,
+# including star and description edits that leave the rollups alone.
+SQL_CREATE_REVISION = """ CREATE TABLE IF NOT EXISTS ledger_revision (
+                              id integer PRIMARY KEY CHECK (id = 0),
+                              revision integer NOT NULL
+                          ); """
+
+REVISION_TRIGGERS = [
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_revision_insert AFTER INSERT ON expenses
+        BEGIN
+            UPDATE ledger_revision SET revision = revision + 1;
+        END; """,
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_revision_delete AFTER DELETE ON expenses
+        BEGIN
+            UPDATE ledger_revision SET revision = revision + 1;
+        END; """,
+    """ CREATE TRIGGER IF NOT EXISTS trg_expenses_revision_update AFTER UPDATE ON expenses
+        BEGIN
+            UPDATE ledger_revision SET revision = revision + 1;
+        END; """,
+]
+SQL_BUMP_REVISION = "UPDATE ledger_revision SET revision = revision + 1"
+
+# Per-row insert triggers that add_expenses_bulk swaps for one set-based
+# statement per batch (FTS5 flushes its pending terms on every statement when
+# fed row by row from a trigger, which made bulk imports four times slower).
+BULK_DEFERRED_TRIGGERS = {
+    "trg_expenses_rollup_insert": ROLLUP_TRIGGERS[0],
+    "trg_expenses_fts_insert": FTS_TRIGGERS[0],
+    "trg_expenses_revision_insert": REVISION_TRIGGERS[0],
+}
+SQL_BULK_ROLLUP_INSERT = """ INSERT INTO expense_rollups(month, category_id, total_cents, count)
+                             SELECT strftime('%Y-%m', day + 2440587.5) AS month, category_id, SUM(amount_cents), COUNT(*)
+                             FROM expenses WHERE id > ? GROUP BY month, category_id
+                             ON CONFLICT(month, category_id) DO UPDATE SET total_cents = total_cents + excluded.total_cents,
+                                                                            count = count + excluded.count """
+SQL_BULK_FTS_INSERT = ("INSERT INTO expenses_fts(rowid, description, category) "
+                       "SELECT expenses.id, COALESCE(expenses.description, ''), categories.name "
+                       "FROM expenses JOIN categories ON categories.id = expenses.category_id WHERE expenses.id > ?")
+
+# Per-connection change log: temp triggers record which expense rows each write
+# touched so the UI can apply just those rows instead of reloading everything.
+# 'annotate' is an update that left day, category and amount alone (star, description).
+SQL_CREATE_CHANGE_LOG = "CREATE TEMP TABLE IF NOT EXISTS expense_changes (id INTEGER, op TEXT NOT NULL)"
+CHANGE_LOG_TRIGGERS = [
+    """ CREATE TEMP TRIGGER IF NOT EXISTS trg_expenses_log_insert AFTER INSERT ON main.expenses
+        BEGIN
+            INSERT INTO expense_changes(id, op) VALUES (NEW.id, 'insert');
+        END; """,
+    """ CREATE TEMP TRIGGER IF NOT EXISTS trg_expenses_log_delete AFTER DELETE ON main.expenses
+        BEGIN
+            INSERT INTO expense_changes(id, op) VALUES (OLD.id, 'delete');
+        END; """,
+    """ CREATE TEMP TRIGGER IF NOT EXISTS trg_expenses_log_update AFTER UPDATE ON main.expenses
+        BEGIN
+            INSERT INTO expense_changes(id, op)
+            VALUES (NEW.id, CASE WHEN OLD.day IS NEW.day AND OLD.category_id IS NEW.category_id
+                                      AND OLD.amount_cents IS NEW.amount_cents
+                                 THEN 'annotate' ELSE 'update' END);
+        END; """,
+]
+CHANGE_LOG_LIMIT = 1000 # More changed rows than this are reported as a reset
+
+# bm25 weights: a hit in the description counts twice a hit in the category
+SQL_FTS_RANK = "bm25(expenses_fts, 2.0, 1.0)"
+
+# Expense rows keep the (id, date, category, amount, description, starred) shape
+SQL_EXPENSE_COLUMNS = ("expenses.id, " + SQL_TEXT_FROM_DAY.format("expenses.day") + ", categories.name, "
+                       "expenses.amount_cents / 100.0, expenses.description, expenses.starred")
+SQL_EXPENSES_FROM = "FROM expenses JOIN categories ON categories.id = expenses.category_id"
+
+SQL_INSERT_CATEGORY = "INSERT OR IGNORE INTO categories(name) VALUES (?)"
+SQL_INSERT_EXPENSE = (" INSERT INTO expenses(day,category_id,amount_cents,description,starred) VALUES("
+                      + SQL_DAY_FROM_TEXT.format("?") + ", (SELECT id FROM categories WHERE name = ?), "
+                      + SQL_CENTS_FROM_AMOUNT.format("?") + ", ?, ?) ")
+
+SQL_RANGE_TOTAL = "SELECT SUM(amount_cents) FROM expenses WHERE day >= ? AND day < ?"
+SQL_TOP_CATEGORY = ("SELECT categories.name FROM expense_rollups JOIN categories ON categories.id = expense_rollups.category_id "
+                    "GROUP BY expense_rollups.category_id ORDER BY SUM(expense_rollups.total_cents) DESC LIMIT 1")
+SQL_STARRED = "SELECT " + SQL_EXPENSE_COLUMNS + " " + SQL_EXPENSES_FROM + " WHERE expenses.starred = 1"
+SQL_MONTHLY_SUMMARY = ("SELECT " + SQL_MONTH_FROM_DAY.format("day") + " as month, SUM(amount_cents) / 100.0 FROM expenses{where} "
+                       "GROUP BY month ORDER BY month")
+SQL_CATEGORY_SUMMARY = ("SELECT categories.name, SUM(expenses.amount_cents) / 100.0 " + SQL_EXPENSES_FROM + "{where} "
+                        "GROUP BY expenses.category_id ORDER BY SUM(expenses.amount_cents) DESC")
+SQL_YEARLY_SUMMARY = ("SELECT strftime('%Y', day + 2440587.5) as year, SUM(amount_cents) / 100.0 FROM expenses{where} "
+                      "GROUP BY year ORDER BY year")
+SQL_DAILY_SERIES = "SELECT day, SUM(amount_cents) / 100.0 FROM expenses{where} GROUP BY day ORDER BY day"
+SQL_ROLLUP_MONTHLY_SUMMARY = "SELECT month, SUM(total_cents) / 100.0 FROM expense_rollups{where} GROUP BY month ORDER BY month"
+SQL_ROLLUP_CATEGORY_SUMMARY = ("SELECT categories.name, SUM(expense_rollups.total_cents) / 100.0 FROM expense_rollups "
+                               "JOIN categories ON categories.id = expense_rollups.category_id{where} "
+                               "GROUP BY expense_rollups.category_id ORDER BY SUM(expense_rollups.total_cents) DESC")
+SQL_CATEGORY_MONTHLY_SUMMARY = ("SELECT " + SQL_MONTH_FROM_DAY.format("expenses.day") + " as month, categories.name, "
+                                "SUM(expenses.amount_cents) / 100.0 " + SQL_EXPENSES_FROM + "{where} "
+                                "GROUP BY month, expenses.category_id ORDER BY month")
+SQL_ROLLUP_CATEGORY_MONTHLY_SUMMARY = ("SELECT expense_rollups.month, categories.name, SUM(expense_rollups.total_cents) / 100.0 "
+                                       "FROM expense_rollups JOIN categories ON categories.id = expense_rollups.category_id{where} "
+                                       "GROUP BY expense_rollups.month, expense_rollups.category_id ORDER BY expense_rollups.month")
+SQL_ROLLUP_YEARLY_SUMMARY = "SELECT substr(month, 1, 4) as year, SUM(total_cents) / 100.0 FROM expense_rollups{where} GROUP BY year ORDER BY year"
+
+def to_day(value):
+    """
+    Convert an ISO date string (YYYY-MM-DD) or a date to a day number.
+    :param value: str or date
+    :return: days since 1970-01-01
+    """
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - EPOCH_ORDINAL
+
+def from_day(day):
+    """Convert a day number back to an ISO date string."""
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+def create_connection(db_file, read_only=False, pragmas=None):
     """ create a database connection to the SQLite database
         specified by db_file
     :param db_file: database file
+    :param read_only: open with mode=ro; such connections may be handed between
+        threads (one at a time), see ConnectionPool
+    :param pragmas: overrides for DEFAULT_PRAGMAS
     :return: Connection object or None
     """
     conn = None
+    settings = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
     try:
-        conn = sqlite3.connect(db_file)
+        if read_only:
+            uri = Path(os.path.abspath(db_file)).as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            settings.pop("journal_mode") # Persistent, and only the writer may set it
+        else:
+            conn = sqlite3.connect(db_file)
+        for name, value in settings.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.execute("PRAGMA foreign_keys = ON")
         return conn
     except Error as e:
         print(e)
 
     return conn
 
+class ConnectionPool:
+    """
+    One writer connection plus up to max_readers read-only connections for
+    analytic and backup threads. In WAL mode the readers each see the last
+    committed snapshot and never wait on the writer, nor it on them.
+    """
+    def __init__(self, db_file, max_readers=4, pragmas=None):
+        self.db_file = db_file
+        self.pragmas = pragmas
+        self.max_readers = max_readers
+        self.writer_conn = None
+        self.idle_readers = []
+        self.open_readers = []
+        self.reader_slots = threading.BoundedSemaphore(max_readers)
+        self.lock = threading.Lock()
+
+    def writer(self):
+        """
+        The single writer connection, opened on first use. It belongs to the
+        thread that opened it; everything that writes must go through that thread.
+        """
+        if self.writer_conn is None:
+            self.writer_conn = create_connection(self.db_file, pragmas=self.pragmas)
+        return self.writer_conn
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection, blocking while max_readers are in use."""
+        self.reader_slots.acquire()
+        conn = None
+        try:
+            with self.lock:
+                if self.idle_readers:
+                    conn = self.idle_readers.pop()
+            if conn is None:
+                conn = create_connection(self.db_file, read_only=True, pragmas=self.pragmas)
+                if conn is None:
+                    raise Error(f"cannot open a read-only connection to {self.db_file}")
+                with self.lock:
+                    self.open_readers.append(conn)
+            yield conn
+        finally:
+            if conn is not None:
+                if conn.in_transaction:
+                    conn.rollback() # Release the snapshot so checkpoints can progress
+                with self.lock:
+                    self.idle_readers.append(conn)
+            self.reader_slots.release()
+
+    def close_writer(self):
+        """Close the writer; call from the thread that opened it."""
+        if self.writer_conn is not None:
+            self.writer_conn.close()
+            self.writer_conn = None
+
+    def close_readers(self):
+        """Close every reader; none may be borrowed at the time."""
+        with self.lock:
+            for conn in self.open_readers:
+                conn.close()
+            self.open_readers = []
+            self.idle_readers = []
+
 def create_table(conn, create_table_sql):
     """ create a table from the create_table_sql statement
     :param conn: Connection object
@@ -30,22 +337,341 @@ def create_table(conn, create_table_sql):
     except Error as e:
         print(e)
 
+def create_indexes(conn):
+    """ create the indexes listed in INDEXES if they do not exist yet
+    :param conn: Connection object
+    :return:
+    """
+    c = conn.cursor()
+    for sql in INDEXES:
+        c.execute(sql)
+
+def create_rollups(conn):
+    """ create the expense_rollups table and the triggers that maintain it,
+    and fill it from expenses.
+    :param conn: Connection object
+    :return:
+    """
+    c = conn.cursor()
+    c.execute(SQL_CREATE_ROLLUPS)
+    for sql in ROLLUP_TRIGGERS:
+        c.execute(sql)
+    _fill_rollups(c)
+
+def _fill_rollups(cur):
+    cur.execute("DELETE FROM expense_rollups")
+    cur.execute(""" INSERT INTO expense_rollups(month, category_id, total_cents, count)
+                    SELECT strftime('%Y-%m', day + 2440587.5) AS month, category_id, SUM(amount_cents), COUNT(*)
+                    FROM expenses GROUP BY month, category_id """)
+
+def rebuild_rollups(conn):
+    """
+    Recompute expense_rollups from scratch. Use this to repair the rollups
+    if they were ever written to outside of the triggers.
+    :param conn: Connection object
+    """
+    _fill_rollups(conn.cursor())
+    conn.commit()
+
+# Legacy rows the v2 migration could not convert, kept as they were
+SQL_CREATE_REJECTED = """ CREATE TABLE IF NOT EXISTS expenses_rejected (
+                              id integer PRIMARY KEY,
+                              date text,
+                              category text,
+                              amount real,
+                              description text,
+                              starred integer,
+                              reason text NOT NULL
+                          ); """
+
+class MigrationError(Error):
+    """A migration step failed and was rolled back; the schema stays at `version`."""
+    def __init__(self, message, version):
+        super().__init__(message)
+        self.version = version
+
+def _migrate_v1(conn):
+    """v1: the original single-table layout with text dates, real amounts and category names."""
+    create_table(conn, """ CREATE TABLE IF NOT EXISTS expenses (
+                               id integer PRIMARY KEY,
+                               date text NOT NULL,
+                               category text NOT NULL,
+                               amount real NOT NULL,
+                               description text,
+                               starred integer NOT NULL DEFAULT 0
+                           ); """)
+
+def _migrate_v2(conn):
+    """
+    v2: integer day numbers, integer cents and a categories lookup table.
+    Rebuilds expenses in the new layout, then recreates indexes and rollups.
+    """
+    c = conn.cursor()
+    # Rows with a date SQLite cannot read would have no day number; set them aside instead
+    c.execute(SQL_CREATE_REJECTED)
+    c.execute("SELECT id, date FROM expenses WHERE julianday(date) IS NULL ORDER BY id")
+    for expense_id, text in c.fetchall():
+        print(f"Expense {expense_id} has an unreadable date {text!r}; moved to expenses_rejected")
+    c.execute("INSERT INTO expenses_rejected(id, date, category, amount, description, starred, reason) "
+              "SELECT id, date, category, amount, description, starred, 'unreadable date' "
+              "FROM expenses WHERE julianday(date) IS NULL")
+    c.execute(SQL_CREATE_CATEGORIES)
+    c.execute("INSERT OR IGNORE INTO categories(name) SELECT DISTINCT category FROM expenses "
+              "WHERE julianday(date) IS NOT NULL ORDER BY category")
+    c.execute(SQL_CREATE_EXPENSES.format(table="expenses_v2"))
+    c.execute("INSERT INTO expenses_v2(id, day, category_id, amount_cents, description, starred) "
+              "SELECT expenses.id, " + SQL_DAY_FROM_TEXT.format("expenses.date") + ", categories.id, "
+              + SQL_CENTS_FROM_AMOUNT.format("expenses.amount") + ", expenses.description, expenses.starred "
+              "FROM expenses JOIN categories ON categories.name = expenses.category "
+              "WHERE julianday(expenses.date) IS NOT NULL ORDER BY expenses.id")
+    # Dropping the old table also drops its indexes and rollup triggers
+    c.execute("DROP TABLE expenses")
+    c.execute("DROP TABLE IF EXISTS expense_rollups")
+    c.execute("ALTER TABLE expenses_v2 RENAME TO expenses")
+    create_indexes(conn)
+    create_rollups(conn)
+
+def _migrate_v3(conn):
+    """v3: indexes for keyset pagination in (day, id) order."""
+    conn.execute("DROP INDEX IF EXISTS idx_expenses_category_amount")
+    create_indexes(conn)
+
+def _migrate_v4(conn):
+    """v4: FTS5 index over description and category, kept in sync by triggers."""
+    c = conn.cursor()
+    c.execute(SQL_CREATE_FTS)
+    for sql in FTS_TRIGGERS:
+        c.execute(sql)
+    c.execute("INSERT INTO expenses_fts(rowid, description, category) "
+              "SELECT expenses.id, COALESCE(expenses.description, ''), categories.name " + SQL_EXPENSES_FROM)
+
+def _migrate_v5(conn):
+    """v5: ledger revision counter, kept current by triggers; see get_ledger_version."""
+    c = conn.cursor()
+    c.execute(SQL_CREATE_REVISION)
+    c.execute("INSERT OR IGNORE INTO ledger_revision(id, revision) VALUES (0, 0)")
+    for sql in REVISION_TRIGGERS:
+        c.execute(sql)
+
+# (version, step) pairs; each step upgrades the schema from version - 1
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+]
+
+def get_schema_version(conn):
+    """Returns the schema version recorded in PRAGMA user_version."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """
+    Bring the database up to SCHEMA_VERSION. Each step runs in its own
+    transaction together with the user_version bump, so an interrupted
+    migration leaves the previous version intact.
+    :param conn: Connection object
+    :return: the resulting schema version, always SCHEMA_VERSION
+    :raises MigrationError: if a step failed; nothing may run against the
+        half-migrated schema
+    """
+    version = get_schema_version(conn)
+    for target, step in MIGRATIONS:
+        if version >= target:
+            continue
+        try:
+            conn.execute("BEGIN")
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+            version = target
+        except Error as e:
+            conn.rollback()
+            raise MigrationError(f"Migration to schema v{target} failed: {e}", version) from e
+    # An import interrupted by a crash leaves its deferred insert triggers dropped
+    for sql in BULK_DEFERRED_TRIGGERS.values():
+        conn.execute(sql)
+    conn.commit()
+    return version
+
+def _ensure_categories(cur, names):
+    cur.executemany(SQL_INSERT_CATEGORY, [(name,) for name in set(names)])
+
 def add_expense(conn, expense, commit=False):
     """
     Add a new expense into the expenses table
     :param conn:
-    :param expense:
+    :param expense: (date, category, amount, description, starred)
     :param commit: whether to commit the transaction
     :return: expense id
     """
-    sql = ''' INSERT INTO expenses(date,category,amount,description,starred)
-              VALUES(?,?,?,?,?) '''
     cur = conn.cursor()
-    cur.execute(sql, expense)
+    _ensure_categories(cur, [expense[1]])
+    cur.execute(SQL_INSERT_EXPENSE, expense)
     if commit:
         conn.commit()
     return cur.lastrowid
 
+def _defer_insert_triggers(cur, logged):
+    """
+    Drop the triggers in BULK_DEFERRED_TRIGGERS (and the change log's insert
+    trigger) for the length of a bulk insert; _insert_batch does their work per
+    batch. Dropping a trigger changes the schema, which makes every other
+    connection re-prepare its statements, so this happens once per bulk insert.
+    :param logged: whether the change log is enabled, see _change_log_enabled
+    """
+    for name in BULK_DEFERRED_TRIGGERS:
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+    # A bulk insert is logged as a single reset rather than one entry per row
+    if logged:
+        cur.execute("DROP TRIGGER IF EXISTS temp.trg_expenses_log_insert")
+
+def _restore_insert_triggers(cur, logged, inserted):
+    for sql in BULK_DEFERRED_TRIGGERS.values():
+        cur.execute(sql)
+    if logged:
+        if inserted:
+            cur.execute("INSERT INTO expense_changes(id, op) VALUES (NULL, 'reset')")
+        cur.execute(CHANGE_LOG_TRIGGERS[0])
+
+def _insert_batch(cur, batch):
+    """
+    executemany one batch, then do the deferred triggers' work for it with one
+    set-based statement each. The triggers must already be dropped.
+    """
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM expenses")
+    last_id = cur.fetchone()[0]
+    cur.executemany(SQL_INSERT_EXPENSE, batch)
+    cur.execute(SQL_BULK_ROLLUP_INSERT, (last_id,))
+    cur.execute(SQL_BULK_FTS_INSERT, (last_id,))
+    cur.execute(SQL_BUMP_REVISION)
+
+def add_expenses_bulk(conn, expenses, batch_size=5000, progress=None):
+    """
+    Insert many expenses with executemany, one explicit transaction per batch.
+    The iterable is consumed lazily, so it can be a generator over a large file.
+    The per-row insert triggers are swapped for set-based statements for the
+    whole call. They are restored when it ends, however it ends, and by
+    migrate() should the process die in between; meanwhile nothing else may
+    insert through this database's writer.
+    :param conn: Connection object without an open transaction
+    :param expenses: iterable of (date, category, amount, description, starred) tuples
+    :param batch_size: rows per transaction
+    :param progress: optional callable(rows_inserted_so_far); returning False stops the import
+    :return: number of rows inserted
+    """
+    if conn.in_transaction:
+        # Each batch commits, which would commit the caller's own work with it
+        raise Error("add_expenses_bulk needs a connection without an open transaction")
+    cur = conn.cursor()
+    iterator = iter(expenses)
+    inserted = 0
+    cur.execute("BEGIN")
+    logged = _change_log_enabled(cur)
+    try:
+        _defer_insert_triggers(cur, logged)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            if not conn.in_transaction:
+                cur.execute("BEGIN")
+            _ensure_categories(cur, [expense[1] for expense in batch])
+            _insert_batch(cur, batch)
+            conn.commit()
+            inserted += len(batch)
+            if progress is not None and progress(inserted) is False:
+                break
+    except Exception:
+        conn.rollback() # Only the failed batch; earlier ones are committed
+        raise
+    finally:
+        if not conn.in_transaction:
+            cur.execute("BEGIN")
+        _restore_insert_triggers(cur, logged, inserted)
+        conn.commit()
+    return inserted
+
+def enable_change_log(conn):
+    """
+    Start recording changed expense ids on this connection, see take_changes.
+    The log lives in the temp schema, so other connections are unaffected.
+    :param conn: Connection object
+    """
+    try:
+        cur = conn.cursor()
+        cur.execute(SQL_CREATE_CHANGE_LOG)
+        for sql in CHANGE_LOG_TRIGGERS:
+            cur.execute(sql)
+        conn.commit()
+    except Error as e:
+        print(e)
+
+def _change_log_enabled(cur):
+    cur.execute("SELECT 1 FROM sqlite_temp_master WHERE type = 'trigger' AND name = 'trg_expenses_log_insert'")
+    return cur.fetchone() is not None
+
+def take_changes(conn):
+    """
+    Read and empty the change log filled since the last call.
+    :param conn: Connection object with enable_change_log applied
+    :return: None if nothing changed, else a dict with
+        'inserted' and 'updated': current expense rows,
+        'deleted': expense ids,
+        'reset': too many changes to list, reload everything,
+        'totals_changed': some day, category or amount changed
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT id, op FROM expense_changes ORDER BY rowid LIMIT ?", (CHANGE_LOG_LIMIT + 1,))
+    log = cur.fetchall()
+    if not log:
+        return None
+    cur.execute("DELETE FROM expense_changes")
+    conn.commit()
+
+    changes = {"inserted": [], "updated": [], "deleted": [], "reset": False, "totals_changed": False}
+    if len(log) > CHANGE_LOG_LIMIT or any(op == "reset" for _, op in log):
+        changes["reset"] = changes["totals_changed"] = True
+        return changes
+
+    # Collapse the log to one net operation per id
+    states = {}
+    for expense_id, op in log:
+        if op != "annotate":
+            changes["totals_changed"] = True
+        previous = states.get(expense_id)
+        if op == "delete":
+            if previous == "insert":
+                del states[expense_id]
+            else:
+                states[expense_id] = "delete"
+        elif op == "insert":
+            states[expense_id] = "update" if previous == "delete" else "insert"
+        elif previous != "insert":
+            states[expense_id] = "update"
+
+    changes["deleted"] = [expense_id for expense_id, state in states.items() if state == "delete"]
+    rows = get_expenses_by_ids(conn, [expense_id for expense_id, state in states.items() if state != "delete"])
+    for row in rows:
+        changes["inserted" if states[row[0]] == "insert" else "updated"].append(row)
+    return changes
+
+def get_expenses_by_ids(conn, expense_ids):
+    """
+    Query the expenses with the given ids
+    :param conn: the Connection object
+    :param expense_ids: list of expense ids
+    :return: list of (id, date, category, amount, description, starred)
+    """
+    if not expense_ids:
+        return []
+    placeholders = ", ".join("?" * len(expense_ids))
+    cur = conn.cursor()
+    cur.execute("SELECT " + SQL_EXPENSE_COLUMNS + " " + SQL_EXPENSES_FROM +
+                f" WHERE expenses.id IN ({placeholders})", list(expense_ids))
+    return cur.fetchall()
+
 def get_all_expenses(conn):
     """
     Query all rows in the expenses table
@@ -53,11 +679,137 @@ def get_all_expenses(conn):
     :return:
     """
     cur = conn.cursor()
-    cur.execute("SELECT * FROM expenses")
+    cur.execute("SELECT " + SQL_EXPENSE_COLUMNS + " " + SQL_EXPENSES_FROM + " ORDER BY expenses.id")
 
     rows = cur.fetchall()
     return rows
 
+def _expense_filter_clause(filters):
+    """
+    Build the WHERE conditions for the optional category/starred filters.
+    :param filters: dict with any of 'category' (name), 'starred' (bool), 'search' (text)
+    :return: (list of sql conditions, params)
+    """
+    clauses = []
+    params = []
+    filters = filters or {}
+    if filters.get("category"):
+        clauses.append("expenses.category_id = (SELECT id FROM categories WHERE name = ?)")
+        params.append(filters["category"])
+    if filters.get("starred"):
+        clauses.append("expenses.starred = 1")
+    return clauses, params
+
+def expense_matches(expense, filters):
+    """
+    Check one expense row against the filters in Python, so a changed row can
+    be placed in a view without querying again. Search text matches like
+    build_fts_query: every word is a prefix of some word in the description
+    or category (case-insensitive, without diacritic folding).
+    :param expense: (id, date, category, amount, description, starred)
+    :param filters: dict, see _expense_filter_clause
+    """
+    filters = filters or {}
+    if filters.get("category") and expense[2] != filters["category"]:
+        return False
+    if filters.get("starred") and not expense[5]:
+        return False
+    terms = re.findall(r"\w+", (filters.get("search") or "").lower())
+    if terms:
+        words = re.findall(r"\w+", f"{expense[4] or ''} {expense[2]}".lower())
+        return all(any(word.startswith(term) for word in words) for term in terms)
+    return True
+
+def build_fts_query(text):
+    """
+    Turn free text from the search box into an FTS5 query: every word must
+    match (implicit AND) and every word is a prefix, so 'gro sup' finds
+    'Grocery supplies'. Quoting each term keeps FTS5 syntax characters inert.
+    :return: query string, or None if the text has no searchable words
+    """
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def search_expenses(conn, text, limit=200, offset=0, filters=None):
+    """
+    Full-text search over description and category, best bm25 match first.
+    :param conn: the Connection object
+    :param text: free text, see build_fts_query
+    :param limit: maximum number of rows in the page
+    :param offset: number of ranked rows to skip
+    :param filters: optional category/starred filters, see _expense_filter_clause
+    :return: list of (id, date, category, amount, description, starred)
+    """
+    query = build_fts_query(text)
+    if query is None:
+        return []
+    clauses, params = _expense_filter_clause(filters)
+    clauses.insert(0, "expenses_fts MATCH ?")
+    params.insert(0, query)
+    cur = conn.cursor()
+    cur.execute("SELECT " + SQL_EXPENSE_COLUMNS + " FROM expenses_fts "
+                "JOIN expenses ON expenses.id = expenses_fts.rowid "
+                "JOIN categories ON categories.id = expenses.category_id"
+                " WHERE " + " AND ".join(clauses) +
+                " ORDER BY " + SQL_FTS_RANK + ", expenses.id DESC LIMIT ? OFFSET ?", params + [limit, offset])
+    return cur.fetchall()
+
+def get_expenses_page(conn, after=None, limit=200, filters=None):
+    """
+    Fetch one page of expenses, newest first, using keyset pagination on
+    (day, id) so every page is an index seek regardless of how deep it is.
+    :param conn: the Connection object
+    :param after: (date, id) of the last row of the previous page, or None for the first page
+    :param limit: maximum number of rows in the page
+    :param filters: optional dict, see _expense_filter_clause
+    :return: list of (id, date, category, amount, description, starred)
+    """
+    clauses, params = _expense_filter_clause(filters)
+    if after is not None:
+        clauses.insert(0, "(expenses.day, expenses.id) < (?, ?)")
+        params[:0] = [to_day(after[0]), after[1]]
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    cur = conn.cursor()
+    cur.execute("SELECT " + SQL_EXPENSE_COLUMNS + " " + SQL_EXPENSES_FROM + where +
+                " ORDER BY expenses.day DESC, expenses.id DESC LIMIT ?", params + [limit])
+    return cur.fetchall()
+
+def iter_expenses(conn, after=None, limit=200, filters=None):
+    """
+    Lazily yield pages of expenses, newest first. Each page is only queried
+    when the caller asks for it, so memory stays at one page per step.
+    :param conn: the Connection object
+    :param after: (date, id) cursor to start after, or None to start at the newest expense
+    :param limit: rows per page
+    :param filters: optional dict, see _expense_filter_clause. With a 'search'
+        text the pages come from search_expenses ranked by bm25 instead, and
+        after is ignored; ranking has to score every match anyway, so those
+        pages are addressed by offset.
+    :return: generator of lists of expense rows
+    """
+    search = (filters or {}).get("search")
+    if search and build_fts_query(search) is not None:
+        offset = 0
+        while True:
+            page = search_expenses(conn, search, limit, offset, filters)
+            if not page:
+                return
+            yield page
+            if len(page) < limit:
+                return
+            offset += len(page)
+    while True:
+        page = get_expenses_page(conn, after, limit, filters)
+        if not page:
+            return
+        yield page
+        if len(page) < limit:
+            return
+        last = page[-1]
+        after = (last[1], last[0])
+
 def print_all_expenses(conn):
     """
     Prints all expenses from the expenses table to the console.
@@ -79,7 +831,7 @@ def get_starred_expenses(conn):
     :return:
     """
     cur = conn.cursor()
-    cur.execute("SELECT * FROM expenses WHERE starred=1")
+    cur.execute(SQL_STARRED)
 
     rows = cur.fetchall()
     return rows
@@ -91,9 +843,10 @@ def get_expenses_for_graphing(conn):
     :return: List of dictionaries with 'date', 'category', 'amount'
     """
     cur = conn.cursor()
-    cur.execute("SELECT date, category, amount FROM expenses")
+    cur.execute("SELECT " + SQL_TEXT_FROM_DAY.format("expenses.day") + ", categories.name, expenses.amount_cents / 100.0 "
+                + SQL_EXPENSES_FROM)
     rows = cur.fetchall()
-    
+
     # Convert list of tuples to list of dictionaries
     expenses_list = []
     for row in rows:
@@ -104,59 +857,198 @@ def get_expenses_for_graphing(conn):
         })
     return expenses_list
 
-def get_monthly_summary(conn):
-    """Returns total expenses grouped by month (YYYY-MM)."""
+def _date_range_clause(start, end):
+    """
+    Build a half-open date range filter (start <= date < end) on the day
+    column that can use the day index. Either bound may be None.
+    :return: (sql fragment, params)
+    """
+    clauses = []
+    params = []
+    if start is not None:
+        clauses.append("expenses.day >= ?")
+        params.append(to_day(start))
+    if end is not None:
+        clauses.append("expenses.day < ?")
+        params.append(to_day(end))
+    if not clauses:
+        return "", params
+    return " WHERE " + " AND ".join(clauses), params
+
+def _month_range_clause(start, end):
+    """
+    Translate a [start, end) date range into a filter on the rollup month
+    column. Returns None if a bound does not fall on the first of a month,
+    in which case the rollups cannot answer the query.
+    :param start: ISO date string, date or None, as for _date_range_clause
+    :return: (sql fragment, params) or None
+    """
+    start, end = [None if bound is None else from_day(to_day(bound)) for bound in (start, end)]
+    for bound in (start, end):
+        if bound is not None and not bound.endswith("-01"):
+            return None
+    clauses = []
+    params = []
+    if start is not None:
+        clauses.append("month >= ?")
+        params.append(start[:7])
+    if end is not None:
+        clauses.append("month < ?")
+        params.append(end[:7])
+    if not clauses:
+        return "", params
+    return " WHERE " + " AND ".join(clauses), params
+
+def _summary(conn, rollup_sql, raw_sql, start, end):
+    """Run a summary from the rollups when the range allows it, else from expenses."""
     cur = conn.cursor()
-    cur.execute("SELECT strftime('%Y-%m', date) as month, SUM(amount) FROM expenses GROUP BY month ORDER BY month")
+    month_range = _month_range_clause(start, end)
+    if month_range is not None:
+        where, params = month_range
+        cur.execute(rollup_sql.format(where=where), params)
+    else:
+        where, params = _date_range_clause(start, end)
+        cur.execute(raw_sql.format(where=where), params)
     return cur.fetchall()
 
-def get_category_summary(conn):
-    """Returns total expenses grouped by category."""
+def get_monthly_summary(conn, start=None, end=None):
+    """Returns total expenses grouped by month (YYYY-MM), optionally limited to start <= date < end."""
+    return _summary(conn, SQL_ROLLUP_MONTHLY_SUMMARY, SQL_MONTHLY_SUMMARY, start, end)
+
+def get_category_summary(conn, start=None, end=None):
+    """Returns total expenses grouped by category, optionally limited to start <= date < end."""
+    return _summary(conn, SQL_ROLLUP_CATEGORY_SUMMARY, SQL_CATEGORY_SUMMARY, start, end)
+
+def get_category_monthly_summary(conn, start=None, end=None):
+    """Returns (month, category, total) rows in month order, optionally limited to start <= date < end."""
+    return _summary(conn, SQL_ROLLUP_CATEGORY_MONTHLY_SUMMARY, SQL_CATEGORY_MONTHLY_SUMMARY, start, end)
+
+def get_yearly_summary(conn, start=None, end=None):
+    """Returns total expenses grouped by year (YYYY), optionally limited to start <= date < end."""
+    return _summary(conn, SQL_ROLLUP_YEARLY_SUMMARY, SQL_YEARLY_SUMMARY, start, end)
+
+def get_daily_series(conn, start=None, end=None):
+    """
+    Returns total expenses per day as (day number, amount) pairs in day order,
+    optionally limited to start <= date < end. Days without expenses are absent.
+    Answered from idx_expenses_day alone, which holds both columns in day order.
+    """
     cur = conn.cursor()
-    cur.execute("SELECT category, SUM(amount) FROM expenses GROUP BY category ORDER BY SUM(amount) DESC")
+    where, params = _date_range_clause(start, end)
+    cur.execute(SQL_DAILY_SERIES.format(where=where), params)
     return cur.fetchall()
 
-def get_yearly_summary(conn):
-    """Returns total expenses grouped by year (YYYY)."""
+def _range_and_category(start, end, category):
+    """WHERE clause for an optional [start, end) date range and category name."""
+    where, params = _date_range_clause(start, end)
+    if category:
+        where += (" AND " if where else " WHERE ") + "expenses.category_id = (SELECT id FROM categories WHERE name = ?)"
+        params.append(category)
+    return where, params
+
+def get_categories(conn):
+    """Returns the names of all categories, alphabetically."""
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM categories ORDER BY name")
+    return [row[0] for row in cur.fetchall()]
+
+def get_expense_total(conn, start=None, end=None, category=None):
+    """
+    Total and number of expenses, optionally limited to start <= date < end
+    and to one category.
+    :return: (total amount, count)
+    """
+    cur = conn.cursor()
+    where, params = _range_and_category(start, end, category)
+    cur.execute("SELECT COALESCE(SUM(amount_cents), 0) / 100.0, COUNT(*) FROM expenses" + where, params)
+    return cur.fetchone()
+
+def get_largest_expenses(conn, start=None, end=None, category=None, limit=10):
+    """
+    The most expensive single expenses, optionally limited to start <= date < end
+    and to one category.
+    :return: list of expense rows, largest first
+    """
     cur = conn.cursor()
-    cur.execute("SELECT strftime('%Y', date) as year, SUM(amount) FROM expenses GROUP BY year ORDER BY year")
+    where, params = _range_and_category(start, end, category)
+    cur.execute("SELECT " + SQL_EXPENSE_COLUMNS + " " + SQL_EXPENSES_FROM + where +
+                " ORDER BY expenses.amount_cents DESC, expenses.id DESC LIMIT ?", params + [limit])
     return cur.fetchall()
 
-def update_expense_star(conn, expense_id, starred):
+def get_ledger_version(conn):
+    """
+    Digest of the revision counter and the rollups. The counter changes on
+    every write to expenses, stars and descriptions included; the rollups tell
+    apart two ledgers that happen to share a revision, such as a database
+    deleted and rebuilt. Costs O(months x categories), whatever the number of
+    expenses.
+    :param conn: Connection object
+    :return: hex string
+    """
+    cur = conn.cursor()
+    digest = hashlib.sha1()
+    cur.execute("SELECT revision FROM ledger_revision")
+    digest.update(repr(cur.fetchone()).encode())
+    cur.execute("SELECT month, category_id, total_cents, count FROM expense_rollups ORDER BY month, category_id")
+    for row in cur:
+        digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+def update_expense_star(conn, expense_id, starred, commit=True):
     """
     update starred status of an expense
     :param conn:
     :param expense_id:
     :param starred:
+    :param commit: whether to commit the transaction
     """
     sql = ''' UPDATE expenses
-              SET starred = ? 
+              SET starred = ?
               WHERE id = ?'''
     cur = conn.cursor()
     cur.execute(sql, (starred, expense_id))
-    conn.commit()
+    if commit:
+        conn.commit()
 
-def delete_expense(conn, expense_id):
+def delete_expense(conn, expense_id, commit=True):
     """
     Delete an expense by expense id
     :param conn:  Connection to the SQLite database
     :param expense_id: id of the expense
+    :param commit: whether to commit the transaction
     :return:
     """
     sql = 'DELETE FROM expenses WHERE id=?'
     cur = conn.cursor()
     cur.execute(sql, (expense_id,))
-    conn.commit()
+    if commit:
+        conn.commit()
 
-def clear_all_expenses(conn):
+def clear_all_expenses(conn, commit=True):
     """
     Delete all expenses from the database.
     :param conn: Connection object
+    :param commit: whether to commit the transaction
     """
     sql = 'DELETE FROM expenses'
     cur = conn.cursor()
     cur.execute(sql)
-    conn.commit()
+    if commit:
+        conn.commit()
+
+def _current_ranges(today=None):
+    """
+    Half-open [start, end) day-number bounds for today and the current month.
+    :return: ((day_start, day_end), (month_start, month_end))
+    """
+    today = today or date.today()
+    month_start = today.replace(day=1)
+    if month_start.month == 12:
+        next_month = month_start.replace(year=month_start.year + 1, month=1)
+    else:
+        next_month = month_start.replace(month=month_start.month + 1)
+    return ((to_day(today), to_day(today) + 1),
+            (to_day(month_start), to_day(next_month)))
 
 def get_dashboard_stats(conn):
     """Returns a dictionary of key stats for the dashboard."""
@@ -166,44 +1058,141 @@ def get_dashboard_stats(conn):
         "top_category": "None"
     }
     cur = conn.cursor()
-    
+    (day_start, day_end), (month_start, month_end) = _current_ranges()
+
     # Total this month
-    cur.execute("SELECT SUM(amount) FROM expenses WHERE strftime('%Y-%m', date) = strftime('%Y-%m', 'now')")
+    cur.execute(SQL_RANGE_TOTAL, (month_start, month_end))
     res = cur.fetchone()[0]
-    stats["total_month"] = res if res else 0.0
-    
+    stats["total_month"] = res / 100.0 if res else 0.0
+
     # Total today
-    cur.execute("SELECT SUM(amount) FROM expenses WHERE date = strftime('%Y-%m-%d', 'now')")
+    cur.execute(SQL_RANGE_TOTAL, (day_start, day_end))
     res = cur.fetchone()[0]
-    stats["total_today"] = res if res else 0.0
-    
+    stats["total_today"] = res / 100.0 if res else 0.0
+
     # Top Category
-    cur.execute("SELECT category FROM expenses GROUP BY category ORDER BY SUM(amount) DESC LIMIT 1")
+    cur.execute(SQL_TOP_CATEGORY)
     res = cur.fetchone()
     stats["top_category"] = res[0] if res else "None"
-    
+
     return stats
 
-def main(db_file="expense_manager.db"):
-    sql_create_expenses_table = """ CREATE TABLE IF NOT EXISTS expenses (
-                                        id integer PRIMARY KEY,
-                                        date text NOT NULL,
-                                        category text NOT NULL,
-                                        amount real NOT NULL,
-                                        description text,
-                                        starred integer NOT NULL DEFAULT 0
-                                    ); """
+def _planned_queries():
+    """The hot read queries with representative parameters, for plan checks."""
+    (day_start, day_end), (month_start, month_end) = _current_ranges()
+    where, params = _date_range_clause(from_day(month_start), from_day(day_end))
+    return {
+        "total_month": (SQL_RANGE_TOTAL, (month_start, month_end)),
+        "total_today": (SQL_RANGE_TOTAL, (day_start, day_end)),
+        "top_category": (SQL_TOP_CATEGORY, ()),
+        "starred": (SQL_STARRED, ()),
+        "monthly_summary": (SQL_ROLLUP_MONTHLY_SUMMARY.format(where=""), ()),
+        "category_summary": (SQL_ROLLUP_CATEGORY_SUMMARY.format(where=""), ()),
+        "yearly_summary": (SQL_ROLLUP_YEARLY_SUMMARY.format(where=""), ()),
+        "category_monthly_summary": (SQL_ROLLUP_CATEGORY_MONTHLY_SUMMARY.format(where=""), ()),
+        "daily_series": (SQL_DAILY_SERIES.format(where=""), ()),
+        "category_summary_partial_month": (SQL_CATEGORY_SUMMARY.format(where=where), params),
+        "expenses_page": ("SELECT " + SQL_EXPENSE_COLUMNS + " " + SQL_EXPENSES_FROM +
+                          " WHERE (expenses.day, expenses.id) < (?, ?) ORDER BY expenses.day DESC, expenses.id DESC LIMIT ?",
+                          (day_end, 0, 200)),
+        "expenses_page_category": ("SELECT " + SQL_EXPENSE_COLUMNS + " " + SQL_EXPENSES_FROM +
+                                   " WHERE expenses.category_id = (SELECT id FROM categories WHERE name = ?)"
+                                   " ORDER BY expenses.day DESC, expenses.id DESC LIMIT ?", ("Food", 200)),
+        "search": ("SELECT " + SQL_EXPENSE_COLUMNS + " FROM expenses_fts JOIN expenses ON expenses.id = expenses_fts.rowid "
+                   "JOIN categories ON categories.id = expenses.category_id WHERE expenses_fts MATCH ? "
+                   "ORDER BY " + SQL_FTS_RANK + ", expenses.id DESC LIMIT ?", (build_fts_query("coffee"), 200)),
+    }
+
+def explain_query_plans(conn):
+    """
+    Run EXPLAIN QUERY PLAN over the hot read queries.
+    :param conn: Connection object
+    :return: dict of query name -> list of plan detail strings
+    """
+    plans = {}
+    cur = conn.cursor()
+    for name, (sql, params) in _planned_queries().items():
+        cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+        plans[name] = [row[3] for row in cur.fetchall()]
+    return plans
+
+def check_query_plans(conn):
+    """
+    Fail if any hot read query falls back to a full scan of the expenses table
+    instead of using one of the indexes in INDEXES.
+    :param conn: Connection object
+    :return: the plans, if all of them are index-backed
+    """
+    plans = explain_query_plans(conn)
+    offenders = {}
+    for name, details in plans.items():
+        for detail in details:
+            words = detail.replace("TABLE ", "").split()
+            if words[:2] == ["SCAN", "expenses"] and "INDEX" not in words:
+                offenders[name] = details
+    if offenders:
+        raise RuntimeError(f"Queries fall back to a full table scan: {offenders}")
+    return plans
+
+def backup_database(conn, target_file):
+    """
+    Copy a consistent snapshot of the database, including pages still in the
+    WAL file, to target_file. Works from a read-only connection.
+    :param conn: Connection object
+    :param target_file: path of the backup database, overwritten
+    """
+    target = sqlite3.connect(target_file)
+    try:
+        conn.backup(target)
+        target.execute("PRAGMA journal_mode = DELETE") # Self-contained single file
+    finally:
+        target.close()
 
+def main(db_file="expense_manager.db"):
     # create a database connection
     conn = create_connection(db_file)
 
-    # create tables
+    # create or upgrade tables
     if conn is not None:
-        # create expenses table
-        create_table(conn, sql_create_expenses_table)
+        try:
+            migrate(conn)
+        except MigrationError as e:
+            print(e)
         conn.close()
     else:
         print("Error! cannot create the database connection.")
 
+def check_query_plans_on_copy(db_file):
+    """
+    Run check_query_plans against a migrated temporary copy of db_file, so the
+    database itself is neither migrated nor written. A missing file is checked
+    as an empty database.
+    :return: the plans, if all of them are index-backed
+    """
+    handle, copy_file = tempfile.mkstemp(prefix="plans-", suffix=".db")
+    os.close(handle)
+    try:
+        if os.path.exists(db_file):
+            source = create_connection(db_file, read_only=True)
+            backup_database(source, copy_file)
+            source.close()
+        conn = create_connection(copy_file)
+        try:
+            migrate(conn)
+            return check_query_plans(conn)
+        finally:
+            conn.close()
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(copy_file + suffix):
+                os.remove(copy_file + suffix)
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    import sys
+    if "--check-plans" in sys.argv:
+        # Checks a copy: python database.py --check-plans [path/to/expenses.db]
+        arguments = [arg for arg in sys.argv[1:] if arg != "--check-plans"]
+        for name, details in check_query_plans_on_copy(arguments[0] if arguments else "expense_manager.db").items():
+            print(f"{name}: {'; '.join(details)}")
+    else:
+        main()
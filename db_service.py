@@ -0,0 +1,268 @@
+import queue
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+import database
+
+_STOP = object() # Queue sentinel that shuts the worker down
+
+
+class _Request:
+    """One queued call of fn(conn, *args, **kwargs) on the worker connection."""
+    __slots__ = ("fn", "args", "kwargs", "coalesce", "callback", "errback", "future")
+
+    def __init__(self, fn, args, kwargs, coalesce, callback, errback):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.coalesce = coalesce # Write that may share a transaction with its neighbours
+        self.callback = callback
+        self.errback = errback
+        self.future = Future()
+
+    def finish(self, result, error, deliver):
+        """Resolve the future, then hand callbacks and unhandled errors to deliver()."""
+        if error is None:
+            self.future.set_result(result)
+        else:
+            self.future.set_exception(error)
+        if self.callback is not None or self.errback is not None or error is not None:
+            deliver(self, result, error)
+
+
+class DatabaseWorker(QThread):
+    """
+    Owns the pool's writer connection and runs queued requests in order.
+    Consecutive coalescable writes are committed together in one transaction.
+    """
+    MAX_COALESCED_WRITES = 500
+
+    def __init__(self, pool, requests, ready, finished, changed, failed, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.requests = requests
+        self.ready = ready # Set once the schema is migrated and readers may open
+        self.finished_request = finished # Callable(request, result, error), thread safe
+        self.changed = changed # Callable(changes) for database.take_changes results, thread safe
+        self.failed = failed # Callable(error) if the database cannot be opened or migrated, thread safe
+        self.error = None # That error; set before `ready`
+        self.pending = deque() # Requests taken off the queue but not run yet
+        self.seen_changes = 0 # conn.total_changes after the last change log read
+
+    def run(self):
+        try:
+            conn = self.pool.writer()
+            if conn is None:
+                self.error = sqlite3.Error(f"Cannot open the database {self.pool.db_file}")
+            else:
+                database.migrate(conn) # Ensure tables exist and are migrated to the current schema
+                database.enable_change_log(conn)
+        except database.MigrationError as e:
+            self.error = e
+        finally:
+            self.ready.set()
+        if self.error is not None:
+            self.failed(self.error)
+            self._refuse_requests()
+            return
+        self.seen_changes = conn.total_changes
+        while True:
+            request = self._next_request()
+            if request is _STOP:
+                break
+            if request.coalesce:
+                self._run_writes(conn, self._collect_writes(request))
+            else:
+                self._run(conn, request)
+            self._publish_changes(conn)
+        self.pool.close_writer()
+
+    def _refuse_requests(self):
+        """Fail every request until stopped; nothing runs against a half-migrated schema."""
+        self.pool.close_writer()
+        while True:
+            request = self._next_request()
+            if request is _STOP:
+                break
+            self._finish(request, None, self.error)
+
+    def _publish_changes(self, conn):
+        if conn.total_changes == self.seen_changes:
+            return # Nothing was written, skip reading the log
+        try:
+            changes = database.take_changes(conn)
+        except sqlite3.Error as e:
+            print(e)
+            changes = None
+        self.seen_changes = conn.total_changes
+        if changes is not None:
+            self.changed(changes)
+
+    def _next_request(self, block=True):
+        if self.pending:
+            return self.pending.popleft()
+        if block:
+            return self.requests.get()
+        try:
+            return self.requests.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _collect_writes(self, first):
+        """Take the run of writes queued right behind `first`, keeping request order."""
+        batch = [first]
+        while len(batch) < self.MAX_COALESCED_WRITES:
+            request = self._next_request(block=False)
+            if request is None:
+                break
+            if request is _STOP or not request.coalesce:
+                self.pending.appendleft(request)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self, conn, request):
+        try:
+            result = request.fn(conn, *request.args, **request.kwargs)
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self._finish(request, None, e)
+        else:
+            self._finish(request, result, None)
+
+    def _run_writes(self, conn, batch):
+        """
+        Run a batch of writes in one transaction. Each write gets a savepoint so a
+        failing request is rolled back on its own without losing the others.
+        """
+        outcomes = []
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute("BEGIN")
+            for request in batch:
+                conn.execute("SAVEPOINT coalesced_write")
+                try:
+                    result = request.fn(conn, *request.args, commit=False, **request.kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO coalesced_write")
+                    outcomes.append((request, None, e))
+                else:
+                    outcomes.append((request, result, None))
+                conn.execute("RELEASE coalesced_write")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(e)
+            if conn.in_transaction:
+                conn.rollback()
+            outcomes = [(request, None, e) for request in batch]
+        for request, result, error in outcomes:
+            self._finish(request, result, error)
+
+    def _finish(self, request, result, error):
+        request.finish(result, error, self.finished_request)
+
+
+class DatabaseService(QObject):
+    """
+    Runs all SQL off the GUI thread: writes and ordered reads on the DatabaseWorker,
+    analytic reads on a small thread pool of read-only connections. Every call
+    returns a Future; callbacks passed in are invoked on the thread that owns the
+    service (the GUI thread). After each write, data_changed carries the rows it
+    inserted, updated or deleted.
+    """
+    request_finished = pyqtSignal(object, object, object) # request, result, error
+    data_changed = pyqtSignal(object) # change dict from database.take_changes
+    failed = pyqtSignal(object) # Error that left the database unusable (cannot open, migration failed)
+
+    def __init__(self, db_file, max_readers=2, pragmas=None, parent=None):
+        super().__init__(parent)
+        self.db_file = db_file
+        self.pool = database.ConnectionPool(db_file, max_readers=max_readers, pragmas=pragmas)
+        self.requests = queue.Queue()
+        self.ready = threading.Event()
+        self.readers = ThreadPoolExecutor(max_workers=max_readers, thread_name_prefix="db-reader")
+        # Emitted from other threads, so the slot is queued onto this object's thread
+        self.request_finished.connect(self._deliver)
+        self.worker = DatabaseWorker(self.pool, self.requests, self.ready,
+                                     self.request_finished.emit, self.data_changed.emit, self.failed.emit)
+
+    def start(self):
+        self.worker.start()
+
+    def stop(self):
+        """Finish the queued requests, then close every connection."""
+        self.readers.shutdown(wait=True)
+        if self.worker.isRunning():
+            self.requests.put(_STOP)
+            self.worker.wait()
+        self.pool.close_readers()
+
+    def submit(self, fn, *args, callback=None, errback=None, **kwargs):
+        """
+        Queue fn(conn, *args, **kwargs) as its own request (reads, or writes that
+        manage their own transactions such as bulk imports).
+        :return: concurrent.futures.Future with the result
+        """
+        return self._enqueue(fn, args, kwargs, False, callback, errback)
+
+    def write(self, fn, *args, callback=None, errback=None, **kwargs):
+        """
+        Queue a write that may be batched with the writes next to it in the queue.
+        fn must accept a `commit` keyword argument and skip committing when it is False.
+        :return: concurrent.futures.Future with the result
+        """
+        return self._enqueue(fn, args, kwargs, True, callback, errback)
+
+    def read(self, fn, *args, callback=None, errback=None, **kwargs):
+        """
+        Run fn(conn, *args, **kwargs) on a read-only connection, concurrently with
+        the writer. It sees the last committed data, so use it for aggregates and
+        exports rather than for anything that must be ordered after queued writes.
+        :return: concurrent.futures.Future with the result
+        """
+        request = _Request(fn, args, kwargs, False, callback, errback)
+        self.readers.submit(self._run_read, request)
+        return request.future
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection on the calling (non-GUI) thread."""
+        self.ready.wait()
+        if self.worker.error is not None:
+            raise self.worker.error
+        with self.pool.reader() as conn:
+            yield conn
+
+    def _run_read(self, request):
+        try:
+            with self.reader() as conn:
+                result = request.fn(conn, *request.args, **request.kwargs)
+        except Exception as e:
+            request.finish(None, e, self.request_finished.emit)
+        else:
+            request.finish(result, None, self.request_finished.emit)
+
+    def call(self, fn, *args, timeout=None, **kwargs):
+        """Run fn on the worker and wait for its result. Never call this from the worker."""
+        return self.submit(fn, *args, **kwargs).result(timeout)
+
+    def _enqueue(self, fn, args, kwargs, coalesce, callback, errback):
+        request = _Request(fn, args, kwargs, coalesce, callback, errback)
+        self.requests.put(request)
+        return request.future
+
+    def _deliver(self, request, result, error):
+        if error is None:
+            if request.callback is not None:
+                request.callback(result)
+        elif request.errback is not None:
+            request.errback(error)
+        else:
+            print(f"Database request {getattr(request.fn, '__name__', request.fn)} failed: {error}")
@@ -0,0 +1,237 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+from itertools import chain, islice
+
+import database
+
+DEFAULT_CATEGORY = "Other"
+
+# Header names (lower-cased) accepted for each expense field in CSV files
+CSV_COLUMNS = {
+    "date": ("date", "posted", "posting date", "transaction date", "booking date"),
+    "category": ("category", "type"),
+    "amount": ("amount", "value", "debit"),
+    "description": ("description", "memo", "name", "payee", "details"),
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%Y/%m/%d", "%d.%m.%Y", "%Y%m%d")
+
+# CSV rows read before deciding whether the amount column is signed; see iter_csv_expenses
+SIGN_LOOKAHEAD = 1000
+
+
+def parse_date(text):
+    """
+    Normalize a date string to ISO YYYY-MM-DD.
+    :param text: date in one of DATE_FORMATS (OFX timestamps are cut to the day)
+    :return: ISO date string or None if it cannot be parsed
+    """
+    text = text.strip()
+    # Fast path: already ISO, which is what most exports and our own backups use
+    if len(text) >= 10 and text[4] == "-" and text[7] == "-":
+        try:
+            return date.fromisoformat(text[:10]).isoformat()
+        except ValueError:
+            return None
+    if len(text) > 8 and text[:8].isdigit():
+        text = text[:8]  # OFX: YYYYMMDDHHMMSS[.XXX][TZ]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(text):
+    """
+    Parse an amount, keeping its sign; see iter_csv_expenses for what it means.
+    :return: float or None if it cannot be parsed
+    """
+    text = text.strip().replace(",", "").replace("$", "")
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def iter_csv_expenses(stream, default_category=DEFAULT_CATEGORY):
+    """
+    Stream expense tuples out of a CSV text stream with a header row.
+    Rows with an unparseable date or a zero/missing amount are skipped.
+
+    Sign convention: a "debit" column holds spending only, whatever its sign.
+    Otherwise the amount column is taken as signed, the way bank exports write
+    it, if any of the first SIGN_LOOKAHEAD rows is negative: negatives are
+    expenses and positives are credits (salary, refunds), which are skipped
+    like OFX credits. With no negative amount there, every amount is an
+    expense, as in a plain list of spending.
+    :param stream: text file object opened with newline=''
+    :return: generator of (date, category, amount, description, starred) tuples
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip().lower() for name in header]
+    columns = {}
+    for field, names in CSV_COLUMNS.items():
+        for name in names:
+            if name in header:
+                columns[field] = header.index(name)
+                break
+    if "date" not in columns or "amount" not in columns:
+        raise ValueError("CSV needs at least a 'date' and an 'amount' column.")
+
+    date_col = columns["date"]
+    amount_col = columns["amount"]
+    category_col = columns.get("category")
+    description_col = columns.get("description")
+    width = max(columns.values()) + 1
+
+    debit_column = header[amount_col] == "debit"
+    rows = (row for row in reader if len(row) >= width)
+    parsed = ((parse_date(row[date_col]), parse_amount(row[amount_col]), row) for row in rows)
+    head = list(islice(parsed, SIGN_LOOKAHEAD))
+    signed = not debit_column and any(amount is not None and amount < 0 for _, amount, _ in head)
+
+    for day, amount, row in chain(head, parsed):
+        if day is None or not amount or (signed and amount > 0):
+            continue
+        category = row[category_col].strip() if category_col is not None else ""
+        description = row[description_col].strip() if description_col is not None else ""
+        yield (day, category or default_category, abs(amount), description, 0)
+
+
+def _iter_sgml_tokens(stream, chunk_size=65536):
+    """
+    Split an OFX stream into (tag, text) pairs without reading it all at once.
+    Works for both SGML OFX 1.x (unclosed leaf tags) and XML OFX 2.x.
+    """
+    pending = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        pieces = pending.split("<")
+        pending = pieces.pop()  # may be an incomplete tag, keep for next chunk
+        for piece in pieces:
+            if ">" in piece:
+                tag, _, text = piece.partition(">")
+                yield tag.strip().upper(), text.strip()
+    if ">" in pending:
+        tag, _, text = pending.partition(">")
+        yield tag.strip().upper(), text.strip()
+
+
+def iter_ofx_expenses(stream, default_category=DEFAULT_CATEGORY):
+    """
+    Stream expense tuples out of the <STMTTRN> blocks of an OFX text stream.
+    Only debits are imported; credits (deposits, refunds) are skipped.
+    :param stream: text file object
+    :return: generator of (date, category, amount, description, starred) tuples
+    """
+    transaction = None
+    for tag, text in _iter_sgml_tokens(stream):
+        if tag == "STMTTRN":
+            transaction = {}
+        elif tag == "/STMTTRN":
+            if transaction is not None:
+                expense = _ofx_transaction_to_expense(transaction, default_category)
+                if expense is not None:
+                    yield expense
+            transaction = None
+        elif transaction is not None and not tag.startswith("/"):
+            transaction[tag] = text
+
+
+def _ofx_transaction_to_expense(transaction, default_category):
+    day = parse_date(transaction.get("DTPOSTED", ""))
+    amount = parse_amount(transaction.get("TRNAMT", ""))
+    if day is None or amount is None or amount >= 0: # Credits are positive
+        return None
+    description = transaction.get("NAME", "")
+    memo = transaction.get("MEMO", "")
+    if memo and memo != description:
+        description = f"{description} - {memo}" if description else memo
+    return (day, default_category, -amount, description, 0)
+
+
+def _parser_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return iter_csv_expenses
+    if extension in (".ofx", ".qfx"):
+        return iter_ofx_expenses
+    raise ValueError(f"Unsupported file type: {extension or path}")
+
+
+def import_file(conn, path, progress=None, batch_size=5000):
+    """
+    Stream a CSV or OFX file into the expenses table via database.add_expenses_bulk.
+    The whole file is one call, so nothing else can use `conn` meanwhile; see
+    FileImport to interleave other work.
+    :param conn: Connection object
+    :param path: path to a .csv, .ofx or .qfx file
+    :param progress: optional callable(bytes_read, bytes_total); returning False cancels
+    :param batch_size: rows per transaction
+    :return: number of expenses imported
+    """
+    parser = _parser_for(path)
+    total = os.path.getsize(path)
+    with open(path, "rb") as raw:
+        stream = io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+
+        def report(_rows):
+            if progress is not None:
+                return progress(raw.tell(), total)
+
+        imported = database.add_expenses_bulk(conn, parser(stream), batch_size=batch_size, progress=report)
+        if progress is not None:
+            progress(total, total)
+        return imported
+
+
+class FileImport:
+    """
+    A CSV or OFX import that runs one batch per call of import_batch, so a
+    single database thread can serve other requests between batches. Only one
+    thread may use it at a time.
+    """
+    def __init__(self, path, batch_size=5000):
+        parser = _parser_for(path)
+        self.path = path
+        self.batch_size = batch_size
+        self.total = os.path.getsize(path)
+        self.raw = open(path, "rb")
+        self.expenses = parser(io.TextIOWrapper(self.raw, encoding="utf-8-sig", errors="replace", newline=""))
+        self.imported = 0
+        self.done = False
+
+    def progress(self):
+        """Share of the file read so far, 0.0 to 1.0."""
+        if self.done or not self.total:
+            return 1.0
+        return self.raw.tell() / self.total
+
+    def import_batch(self, conn):
+        """
+        Insert the next batch in its own transaction; closes the file after the last one.
+        :param conn: Connection object
+        :return: number of expenses imported so far
+        """
+        batch = list(islice(self.expenses, self.batch_size))
+        if batch:
+            self.imported += database.add_expenses_bulk(conn, batch, batch_size=len(batch))
+        if len(batch) < self.batch_size:
+            self.close()
+        return self.imported
+
+    def close(self):
+        self.done = True
+        self.raw.close()
@@ -0,0 +1,209 @@
+import functools
+import inspect
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# Set to 1 to time every database.* call and trace the SQL it runs
+ENV_FLAG = "EXPENSE_MANAGER_INSTRUMENT"
+SAMPLES_PER_FUNCTION = 4096 # Latency samples kept per function for the percentiles
+MAX_SQL_LENGTH = 160
+
+
+def enabled():
+    """Whether instrumentation was requested through the environment."""
+    return os.environ.get(ENV_FLAG, "").lower() in ("1", "true", "yes", "on")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def normalize_sql(sql):
+    """Collapse whitespace so the same statement groups under one key."""
+    sql = re.sub(r"\s+", " ", sql).strip()
+    return sql if len(sql) <= MAX_SQL_LENGTH else sql[:MAX_SQL_LENGTH - 3] + "..."
+
+
+class FunctionStats:
+    __slots__ = ("count", "errors", "total", "rows", "statements", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.rows = 0
+        self.statements = 0
+        self.samples = deque(maxlen=SAMPLES_PER_FUNCTION)
+
+
+class Recorder:
+    """
+    Thread-safe store of call latencies, rows returned and SQL statements
+    executed, keyed by database function. Statements are attributed to the
+    innermost instrumented call running on the same thread.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+        self.functions = {}
+        self.statements = {}
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.functions = {}
+            self.statements = {}
+
+    def record(self, name, seconds, rows=None, error=False):
+        with self.lock:
+            stats = self.functions.get(name)
+            if stats is None:
+                stats = self.functions[name] = FunctionStats()
+            stats.count += 1
+            stats.total += seconds
+            stats.samples.append(seconds)
+            if rows is not None:
+                stats.rows += rows
+            if error:
+                stats.errors += 1
+
+    def trace(self, sql):
+        """sqlite3 trace callback: count the statement for the active call."""
+        stack = getattr(self.local, "stack", None)
+        owner = stack[-1] if stack else None
+        key = normalize_sql(sql)
+        with self.lock:
+            self.statements[key] = self.statements.get(key, 0) + 1
+            if owner is not None:
+                stats = self.functions.get(owner)
+                if stats is None:
+                    stats = self.functions[owner] = FunctionStats()
+                stats.statements += 1
+
+    def enter(self, name):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(name)
+
+    def leave(self):
+        self.local.stack.pop()
+
+    def snapshot(self):
+        """
+        :return: dict with 'functions' (name -> count, errors, total/p50/p95/p99/max
+            milliseconds, rows and statements per call) slowest total first, and
+            'statements' (normalized SQL -> executions) most frequent first
+        """
+        with self.lock:
+            functions = {name: (stats.count, stats.errors, stats.total, stats.rows,
+                                stats.statements, sorted(stats.samples))
+                         for name, stats in self.functions.items()}
+            statements = dict(self.statements)
+            started = self.started
+        report = {}
+        for name, (count, errors, total, rows, statements_run, samples) in functions.items():
+            report[name] = {
+                "count": count,
+                "errors": errors,
+                "total_ms": round(total * 1000, 3),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+                "max_ms": round(samples[-1] * 1000, 3) if samples else 0.0,
+                "rows": rows,
+                "rows_per_call": round(rows / count, 1) if count else 0.0,
+                "statements_per_call": round(statements_run / count, 1) if count else 0.0,
+            }
+        return {
+            "since": started,
+            "functions": dict(sorted(report.items(), key=lambda item: -item[1]["total_ms"])),
+            "statements": dict(sorted(statements.items(), key=lambda item: -item[1])),
+        }
+
+    def dump_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+RECORDER = Recorder()
+_originals = {}
+
+
+def _count_rows(result):
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+    return None
+
+
+def _wrap(name, fn, recorder):
+    if inspect.isgeneratorfunction(fn):
+        # Time each step of the generator, which is where the queries run
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            iterator = fn(*args, **kwargs)
+            while True:
+                recorder.enter(name)
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    recorder.record(name, time.perf_counter() - started, 0)
+                    return
+                except Exception:
+                    recorder.record(name, time.perf_counter() - started, error=True)
+                    raise
+                finally:
+                    recorder.leave()
+                recorder.record(name, time.perf_counter() - started, _count_rows(item))
+                yield item
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        recorder.enter(name)
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            recorder.record(name, time.perf_counter() - started, error=True)
+            raise
+        finally:
+            recorder.leave()
+        recorder.record(name, time.perf_counter() - started, _count_rows(result))
+        if name == "create_connection" and result is not None:
+            result.set_trace_callback(recorder.trace)
+        return result
+    return wrapper
+
+
+def instrument(module, recorder=RECORDER):
+    """
+    Replace every public function of `module` with a timing wrapper, and trace
+    the SQL of every connection its create_connection opens afterwards. Callers
+    that look functions up on the module at call time (database.x(...)) are
+    covered; names imported with `from module import x` before this are not.
+    """
+    for name, fn in inspect.getmembers(module, inspect.isfunction):
+        if name.startswith("_") or fn.__module__ != module.__name__ or (module, name) in _originals:
+            continue
+        _originals[(module, name)] = fn
+        setattr(module, name, _wrap(name, fn, recorder))
+
+
+def uninstrument(module):
+    """Put back the original functions of `module`."""
+    for (owner, name), fn in list(_originals.items()):
+        if owner is module:
+            setattr(module, name, fn)
+            del _originals[(owner, name)]
@@ -1,26 +1,52 @@
 import sys
+import time
+LAUNCHED_AT = time.perf_counter() # Start of the startup clock, before the heavy imports below
+
 import database
+import importer
+import instrumentation
+import snapshot
+import charts
+import assistant
+import assistant_tools
+import config_service
+from db_service import DatabaseService
 import sqlite3
 from PyQt5.QtWidgets import (
                              QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QFrame, QStackedWidget,
                              QLineEdit, QDateEdit, QTextEdit, QComboBox, QFormLayout, QMessageBox,
-                             QTableWidget, QTableWidgetItem, QHeaderView, QTextBrowser, QSpinBox, QFileDialog)
-from PyQt5.QtCore import Qt, QSize, QDate, pyqtSignal, QPointF, QRect
-from PyQt5.QtWebEngineWidgets import QWebEngineView
+                             QTableView, QHeaderView, QTextBrowser, QSpinBox, QFileDialog,
+                             QProgressDialog, QStyledItemDelegate, QTableWidget, QTableWidgetItem, QCheckBox)
+from PyQt5.QtCore import (Qt, QSize, QDate, pyqtSignal, QPointF, QRect, QRectF, QAbstractTableModel, QModelIndex, QEvent, QTimer,
+                          QObject)
 import qtawesome as qta
-from PyQt5.QtGui import QDoubleValidator, QFont, QPixmap, QPainter, QPainterPath, QColor
-import google.generativeai as genai
+from PyQt5.QtGui import QDoubleValidator, QFont, QPixmap, QPainter, QPainterPath, QColor, QPolygonF
 import json
-from markdown_it import MarkdownIt
 from datetime import datetime
 from collections import defaultdict
-import speech_recognition as sr
 import subprocess
 import threading
 import os
 import tempfile
 import json
+from html import escape
+
+# Cold start budget from launch to the first painted dashboard; see StartupTimer.
+# google.generativeai, speech_recognition and markdown_it are only imported by the
+# views that need them, and views are built on first navigation. QtWebEngine is
+# only imported when it is enabled in Settings (GEMINI_WEB_ENGINE).
+STARTUP_TARGET_MS = 1000
+
+def create_application(argv):
+    """Create the QApplication. Sharing GL contexts lets QtWebEngine be imported later, on demand."""
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    return QApplication(argv)
+
+def _speech_recognition():
+    """Import speech_recognition on first use of voice input; it is slow to import."""
+    import speech_recognition
+    return speech_recognition
 
 class NavButton(QPushButton):
     """Custom button for qtawesome icons with hover and active states"""
@@ -74,11 +100,9 @@ class AddExpenseView(QWidget):
         super().__init__(parent)
         self.setStyleSheet("color: white; background-color: #000;")
         self.is_recording = False
-        self.recognizer = sr.Recognizer()
-        try:
-            self.microphone = sr.Microphone()
-        except Exception:
-            self.microphone = None
+        self.recognizer = None # Created with the microphone probe on first voice input
+        self.microphone = None
+        self.speech_ready = False
         self.stop_listening = None # For background listening
         self.temp_audio_file = os.path.join(tempfile.gettempdir(), "expense_voice.wav")
         self.init_ui()
@@ -172,8 +196,21 @@ class AddExpenseView(QWidget):
         else:
             self.stop_recording()
 
+    def ensure_speech(self):
+        """Import speech_recognition and probe the microphone, once."""
+        if self.speech_ready:
+            return
+        sr = _speech_recognition()
+        self.recognizer = sr.Recognizer()
+        try:
+            self.microphone = sr.Microphone()
+        except Exception:
+            self.microphone = None
+        self.speech_ready = True
+
     def start_recording(self):
         try:
+            self.ensure_speech()
             self.is_recording = True
             self.voice_price_btn.setStyleSheet("background-color: #ff3d3d; border-radius: 15px; border: 1px solid white;")
             self.voice_price_btn.setToolTip("Listening... Click to Stop")
@@ -226,6 +263,7 @@ class AddExpenseView(QWidget):
             if not os.path.exists(self.temp_audio_file):
                 return
 
+            sr = _speech_recognition()
             with sr.AudioFile(self.temp_audio_file) as source:
                 audio = self.recognizer.record(source)
             self.process_audio_data(audio)
@@ -241,6 +279,7 @@ class AddExpenseView(QWidget):
         self.voice_price_btn.setToolTip("Dictate Price")
 
     def process_audio_data(self, audio):
+        sr = _speech_recognition()
         try:
             # Transcribe using Google (free)
             text = self.recognizer.recognize_google(audio)
@@ -297,14 +336,257 @@ class AddExpenseView(QWidget):
         self.amount_input.clear()
         self.description_input.clear()
 
+class ExpensePageCursor:
+    """Pages through database.iter_expenses; only ever advanced on the database worker."""
+    def __init__(self, limit, filters):
+        self.limit = limit
+        self.filters = filters
+        self.pages = None
+
+    def next_page(self, conn):
+        if self.pages is None:
+            self.pages = database.iter_expenses(conn, limit=self.limit, filters=self.filters)
+        return next(self.pages, None)
+
+class ExpenseTableModel(QAbstractTableModel):
+    """Table model that pages expenses in from the database worker as the view scrolls."""
+    HEADERS = ["Date", "Category", "Amount", "Description", "Star", "Delete"]
+    STAR_COLUMN = 4
+    DELETE_COLUMN = 5
+    PAGE_SIZE = 200 # Rows fetched per fetchMore()
+
+    def __init__(self, service, with_actions=True, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.with_actions = with_actions # Show the Star and Delete columns
+        self.filters = {}
+        self.rows = [] # Pages fetched so far, newest first
+        self.positions = None # Lazy {expense id: row}; None when stale
+        self.loaded_until = None # (date, id) of the last row of the last page received
+        self.cursor = None # Page cursor; None once exhausted
+        self.fetching = False # A page request is in flight
+        service.data_changed.connect(self.apply_changes)
+
+    def refresh(self, filters=None):
+        """Drop the loaded rows and restart paging; the view fetches the first page."""
+        if filters is not None:
+            self.filters = filters
+        self.beginResetModel()
+        self.rows = []
+        self.positions = None
+        self.loaded_until = None
+        self.cursor = ExpensePageCursor(self.PAGE_SIZE, self.filters)
+        self.fetching = False # A page still in flight belongs to the old cursor and is dropped
+        self.endResetModel()
+
+    def expense_at(self, row):
+        return self.rows[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS) if self.with_actions else self.STAR_COLUMN
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        # expense structure: (id, date, category, amount, description, starred)
+        expense = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return expense[1]
+            if column == 1:
+                return expense[2]
+            if column == 2:
+                return f"{expense[3]:.2f}"
+            if column == 3:
+                return expense[4]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.cursor is not None and not self.fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.cursor is None or self.fetching:
+            return
+        self.fetching = True
+        cursor = self.cursor
+        self.service.submit(cursor.next_page, callback=lambda page: self._page_loaded(cursor, page))
+
+    def _page_loaded(self, cursor, page):
+        if cursor is not self.cursor:
+            return # Filters changed while the page was loading
+        self.fetching = False
+        if not page:
+            self.cursor = None # Reached the oldest matching expense
+            return
+        first_row = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(page) - 1)
+        self.rows.extend(page)
+        self.positions = None
+        self.endInsertRows()
+        self.loaded_until = self._sort_key(page[-1])
+        if len(page) < self.PAGE_SIZE:
+            self.cursor = None
+
+    @staticmethod
+    def _sort_key(expense):
+        return (expense[1], expense[0]) # Rows are ordered by (date, id), newest first
+
+    def _row_of(self, expense_id):
+        if self.positions is None:
+            self.positions = {expense[0]: row for row, expense in enumerate(self.rows)}
+        return self.positions.get(expense_id)
+
+    def apply_changes(self, changes):
+        """
+        Apply a change set from the database worker to the loaded rows, touching
+        only the rows it names. Unloaded rows are left for the page cursor.
+        """
+        if changes["reset"]:
+            self.refresh()
+            return
+        if self.filters.get("search"):
+            self._apply_search_changes(changes)
+            return
+        for expense_id in changes["deleted"]:
+            self._remove(expense_id)
+        for expense in changes["updated"] + changes["inserted"]:
+            row = self._row_of(expense[0])
+            matches = database.expense_matches(expense, self.filters)
+            if row is not None and matches and self._sort_key(self.rows[row]) == self._sort_key(expense):
+                self.rows[row] = expense
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+                continue
+            if row is not None:
+                self._remove(expense[0])
+            if matches:
+                self._place(expense)
+
+    def _apply_search_changes(self, changes):
+        # Search pages are ranked and addressed by offset, so any change to the
+        # result set restarts paging; edits that keep a row matching stay in place
+        for expense_id in changes["deleted"]:
+            if self._row_of(expense_id) is not None:
+                self.refresh()
+                return
+        for expense in changes["updated"] + changes["inserted"]:
+            row = self._row_of(expense[0])
+            if database.expense_matches(expense, self.filters) != (row is not None):
+                self.refresh()
+                return
+        for expense in changes["updated"]:
+            row = self._row_of(expense[0])
+            if row is not None:
+                self.rows[row] = expense
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def _remove(self, expense_id):
+        row = self._row_of(expense_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.positions = None
+        self.endRemoveRows()
+
+    def _place(self, expense):
+        key = self._sort_key(expense)
+        if self.cursor is not None and (self.loaded_until is None or key < self.loaded_until):
+            return # Past the loaded pages; the cursor will fetch it
+        low, high = 0, len(self.rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self._sort_key(self.rows[middle]) > key:
+                low = middle + 1
+            else:
+                high = middle
+        self.beginInsertRows(QModelIndex(), low, low)
+        self.rows.insert(low, expense)
+        self.positions = None
+        self.endInsertRows()
+
+class GlyphCache:
+    """Renders each qtawesome glyph to a pixmap once and shares it app-wide."""
+    _pixmaps = {}
+
+    @classmethod
+    def pixmap(cls, name, color, size):
+        key = (name, color, size)
+        if key not in cls._pixmaps:
+            cls._pixmaps[key] = qta.icon(name, color=color).pixmap(size, size)
+        return cls._pixmaps[key]
+
+class ActionGlyphDelegate(QStyledItemDelegate):
+    """Paints a cached glyph in the middle of a cell and reports clicks on it,
+    so action columns need no per-row widgets."""
+    clicked = pyqtSignal(QModelIndex)
+    GLYPH_SIZE = 16
+
+    def __init__(self, glyph_for_index, parent=None):
+        super().__init__(parent)
+        self.glyph_for_index = glyph_for_index # index -> (qtawesome name, color)
+
+    def _glyph_rect(self, cell_rect):
+        rect = QRect(0, 0, self.GLYPH_SIZE, self.GLYPH_SIZE)
+        rect.moveCenter(cell_rect.center())
+        return rect
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index) # Background and selection only; the cell has no text
+        name, color = self.glyph_for_index(index)
+        painter.drawPixmap(self._glyph_rect(option.rect), GlyphCache.pixmap(name, color, self.GLYPH_SIZE))
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton
+                and self._glyph_rect(option.rect).contains(event.pos())):
+            self.clicked.emit(index)
+            return True
+        return super().editorEvent(event, model, option, index)
+
+def create_expense_table(model):
+    """A QTableView styled like the rest of the app, with fixed-height rows for cheap scrolling."""
+    table = QTableView()
+    table.setModel(model)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+    table.verticalHeader().setVisible(False)
+    table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    table.setSelectionBehavior(QTableView.SelectRows)
+    table.setStyleSheet("""
+        QTableView {
+            background-color: #1a1a1a;
+            color: white;
+            border: 1px solid #3d3dff;
+            selection-background-color: #3d3dff;
+        }
+        QHeaderView::section {
+            background-color: #080808;
+            color: white;
+            padding: 5px;
+            border: 1px solid #1a1a1a;
+        }
+    """)
+    return table
+
 class ViewExpensesView(QWidget):
     star_toggled = pyqtSignal(int, int)
     expense_deleted = pyqtSignal(int) # New signal for deleting an expense
+    SEARCH_DEBOUNCE_MS = 200 # Wait for a pause in typing before querying
 
-    def __init__(self, parent=None):
+    def __init__(self, service, parent=None):
         super().__init__(parent)
+        self.service = service
         self.setStyleSheet("color: white; background-color: #000;")
-        self.all_expenses = [] # Cache for filtering
+        self.model = ExpenseTableModel(service, with_actions=True, parent=self)
         self.init_ui()
 
     def init_ui(self):
@@ -321,9 +603,14 @@ class ViewExpensesView(QWidget):
         # Search and Filter
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Search description...")
+        self.search_input.setToolTip("Words match as prefixes; all words must match.")
         self.search_input.setFixedWidth(200)
         self.search_input.setStyleSheet("background-color: #1a1a1a; border: 1px solid #3d3dff; padding: 5px; border-radius: 5px;")
-        self.search_input.textChanged.connect(self.on_filter_changed)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.on_filter_changed)
+        self.search_input.textChanged.connect(self.search_timer.start)
         header_layout.addWidget(self.search_input)
         
         self.cat_filter = QComboBox()
@@ -335,42 +622,37 @@ class ViewExpensesView(QWidget):
         layout.addLayout(header_layout)
         layout.addSpacing(10)
 
-        self.expense_table = QTableWidget()
-        self.expense_table.setColumnCount(6) # Increased to 6
-        self.expense_table.setHorizontalHeaderLabels(["Date", "Category", "Amount", "Description", "Star", "Delete"])
-        self.expense_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.expense_table.verticalHeader().setVisible(False)
-        self.expense_table.setStyleSheet("""
-            QTableWidget {
-                background-color: #1a1a1a;
-                color: white;
-                border: 1px solid #3d3dff;
-                selection-background-color: #3d3dff;
-            }
-            QHeaderView::section {
-                background-color: #080808;
-                color: white;
-                padding: 5px;
-                border: 1px solid #1a1a1a;
-            }
-        """)
+        self.expense_table = create_expense_table(self.model)
+        self.star_delegate = ActionGlyphDelegate(self._star_glyph, self.expense_table)
+        self.star_delegate.clicked.connect(lambda index: self._handle_star_toggle(*self._id_and_star(index)))
+        self.expense_table.setItemDelegateForColumn(ExpenseTableModel.STAR_COLUMN, self.star_delegate)
+        self.delete_delegate = ActionGlyphDelegate(lambda index: ("fa5s.trash-alt", '#ff4d4d'), self.expense_table)
+        self.delete_delegate.clicked.connect(lambda index: self._handle_delete(self._id_and_star(index)[0]))
+        self.expense_table.setItemDelegateForColumn(ExpenseTableModel.DELETE_COLUMN, self.delete_delegate)
         layout.addWidget(self.expense_table)
-        self.update_expense_list([]) # Initialize with empty list
 
     def on_filter_changed(self):
-        search_text = self.search_input.text().lower()
+        self.search_timer.stop()
+        self.refresh()
+
+    def current_filters(self):
         cat_text = self.cat_filter.currentText()
-        
-        filtered = []
-        for exp in self.all_expenses:
-            # exp structure: (id, date, category, amount, description, starred)
-            match_search = search_text in exp[4].lower() or search_text in exp[2].lower()
-            match_cat = cat_text == "All Categories" or cat_text == exp[2]
-            
-            if match_search and match_cat:
-                filtered.append(exp)
-        
-        self._display_expenses(filtered)
+        return {
+            "search": self.search_input.text().strip(),
+            "category": None if cat_text == "All Categories" else cat_text,
+        }
+
+    def refresh(self):
+        """Restart paging from the newest expense matching the current filters."""
+        self.model.refresh(self.current_filters())
+
+    def _id_and_star(self, index):
+        expense = self.model.expense_at(index.row())
+        return expense[0], expense[5]
+
+    def _star_glyph(self, index):
+        starred = self.model.expense_at(index.row())[5]
+        return ("fa5s.star" if starred else "fa5.star", 'yellow')
 
     def _handle_star_toggle(self, expense_id, starred):
         self.star_toggled.emit(expense_id, starred)
@@ -382,38 +664,6 @@ class ViewExpensesView(QWidget):
         if reply == QMessageBox.Yes:
             self.expense_deleted.emit(expense_id)
 
-    def update_expense_list(self, expenses):
-        self.all_expenses = expenses
-        self.on_filter_changed()
-
-    def _display_expenses(self, expenses):
-        self.expense_table.setRowCount(len(expenses))
-        for row, expense in enumerate(expenses):
-            self.expense_table.setItem(row, 0, QTableWidgetItem(expense[1]))
-            self.expense_table.setItem(row, 1, QTableWidgetItem(expense[2]))
-            self.expense_table.setItem(row, 2, QTableWidgetItem(str(f"{expense[3]:.2f}")))
-            self.expense_table.setItem(row, 3, QTableWidgetItem(expense[4]))
-
-            # Star Button
-            star_button = QPushButton()
-            starred = expense[5]
-            star_icon = "fa5s.star" if starred else "fa5.star"
-            star_button.setIcon(qta.icon(star_icon, color='yellow'))
-            star_button.setCursor(Qt.PointingHandCursor)
-            star_button.setStyleSheet("background-color: transparent; border: none;")
-            star_button.clicked.connect(lambda _, r=row: self._handle_star_toggle(expenses[r][0], expenses[r][5]))
-            self.expense_table.setCellWidget(row, 4, star_button)
-
-            # Delete Button
-            delete_button = QPushButton()
-            delete_button.setIcon(qta.icon("fa5s.trash-alt", color='#ff4d4d'))
-            delete_button.setCursor(Qt.PointingHandCursor)
-            delete_button.setStyleSheet("background-color: transparent; border: none;")
-            delete_button.clicked.connect(lambda _, r=row: self._handle_delete(expenses[r][0]))
-            self.expense_table.setCellWidget(row, 5, delete_button)
-            
-        self.expense_table.sortItems(0, Qt.DescendingOrder) # Sort by date
-
 class CardsView(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -424,9 +674,11 @@ class CardsView(QWidget):
         layout.addWidget(label)
 
 class StarredView(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, service, parent=None):
         super().__init__(parent)
+        self.service = service
         self.setStyleSheet("color: white; background-color: #000;")
+        self.model = ExpenseTableModel(service, with_actions=False, parent=self)
         self.init_ui()
 
     def init_ui(self):
@@ -437,45 +689,42 @@ class StarredView(QWidget):
         title.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 20px;")
         layout.addWidget(title)
 
-        self.expense_table = QTableWidget()
-        self.expense_table.setColumnCount(4)
-        self.expense_table.setHorizontalHeaderLabels(["Date", "Category", "Amount", "Description"])
-        self.expense_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.expense_table.verticalHeader().setVisible(False)
-        self.expense_table.setStyleSheet("""
-            QTableWidget {
-                background-color: #1a1a1a;
-                color: white;
-                border: 1px solid #3d3dff;
-                selection-background-color: #3d3dff;
-            }
-            QHeaderView::section {
-                background-color: #080808;
-                color: white;
-                padding: 5px;
-                border: 1px solid #1a1a1a;
-            }
-        """)
+        self.expense_table = create_expense_table(self.model)
         layout.addWidget(self.expense_table)
-        self.update_starred_list([]) # Initialize with empty list
 
-    def update_starred_list(self, expenses):
-        self.expense_table.setRowCount(len(expenses))
-        for row, expense in enumerate(expenses):
-            self.expense_table.setItem(row, 0, QTableWidgetItem(expense[1]))
-            self.expense_table.setItem(row, 1, QTableWidgetItem(expense[2]))
-            self.expense_table.setItem(row, 2, QTableWidgetItem(str(f"{expense[3]:.2f}")))
-            self.expense_table.setItem(row, 3, QTableWidgetItem(expense[4]))
-        self.expense_table.sortItems(0, Qt.DescendingOrder) # Sort by date
+    def refresh(self):
+        """Restart paging from the newest starred expense."""
+        self.model.refresh({"starred": True})
 
 class GraphsView(QWidget):
-    def __init__(self, conn, parent=None):
+    # Margins to leave space for axis labels and title
+    LEFT_MARGIN = 60
+    RIGHT_MARGIN = 20
+    TOP_MARGIN = 40 # Increased space for title
+    BOTTOM_MARGIN = 80 # Increased space for X-axis labels
+    TICK_SPACING = 90 # Pixels between date labels on the trend chart
+    ZOOM_STEP = 0.8 # Window scale per wheel notch
+
+    def __init__(self, service, parent=None, snapshot_data=None):
         super().__init__(parent)
-        self.conn = conn
+        self.service = service
+        self.snapshot = snapshot_data if snapshot_data is not None else snapshot.empty_snapshot()
+        self.stale = False # Totals changed while the view was hidden
+        self.service.data_changed.connect(self.apply_changes)
         self.setStyleSheet("color: white; background-color: #000;")
         self.data_for_painting = []
         self.graph_title = ""
         self.graph_type = ""
+        # The chart is rendered once into a pixmap and blitted on every other repaint;
+        # it is redrawn only when the data, the size or the graph type changes
+        self.data_version = 0
+        self.chart_cache = None
+        self.chart_cache_key = None
+        # Trend chart: daily totals bucketed to the chosen resolution, and the zoomed/panned window on them
+        self.resolution = "Monthly"
+        self.series = charts.TimeSeries([])
+        self.window = charts.TimeWindow()
+        self.drag_x = None
         self.init_ui()
 
     def init_ui(self):
@@ -492,83 +741,217 @@ class GraphsView(QWidget):
         control_panel_layout.addWidget(title)
         
         self.graph_type_combo = QComboBox()
-        self.graph_type_combo.addItems(["Bar Chart (Category)", "Line Chart (Monthly)", "Pie Chart (Not Implemented)"])
+        self.graph_type_combo.addItems(["Bar Chart (Category)", "Line Chart (Trend)", "Pie Chart (Category)",
+                                        "Stacked Area (Category by Month)", "Calendar Heatmap"])
         self.graph_type_combo.setStyleSheet("background-color: #1a1a1a; color: white; border: 1px solid #3d3dff; padding: 5px; border-radius: 5px;")
         control_panel_layout.addWidget(self.graph_type_combo)
+
+        self.resolution_combo = QComboBox()
+        self.resolution_combo.addItems(charts.RESOLUTIONS)
+        self.resolution_combo.setCurrentText(self.resolution)
+        self.resolution_combo.setStyleSheet("background-color: #1a1a1a; color: white; border: 1px solid #3d3dff; padding: 5px; border-radius: 5px;")
+        control_panel_layout.addWidget(self.resolution_combo)
+
+        self.zoom_hint = QLabel("Scroll to zoom, drag to pan, double-click to reset")
+        self.zoom_hint.setStyleSheet("color: #888; font-size: 11px;")
+        control_panel_layout.addWidget(self.zoom_hint)
         control_panel_layout.addStretch() # Push combo box to left if desired
 
         main_layout.addLayout(control_panel_layout)
         main_layout.addStretch() # This stretch will be the area for paintEvent
 
         self.graph_type_combo.currentIndexChanged.connect(self.update_graph)
+        self.resolution_combo.currentTextChanged.connect(self.set_resolution)
         self.update_graph() # Initial graph display
 
-    def update_graph(self):
-        self.data_for_painting = []
-        self.graph_title = ""
-        self.graph_type = self.graph_type_combo.currentText()
+    def apply_changes(self, changes):
+        if not changes["totals_changed"]:
+            return
+        if self.isVisible():
+            self.update_graph()
+        else:
+            self.stale = True
 
-        if self.graph_type == "Bar Chart (Category)":
-            summary = database.get_category_summary(self.conn)
-            if not summary:
-                self.graph_title = "No data available to display graphs."
-            else:
-                self.data_for_painting = summary
-                self.graph_title = 'Total Expenses by Category'
-            
-        elif self.graph_type == "Line Chart (Monthly)":
-            summary = database.get_monthly_summary(self.conn)
-            if not summary:
-                self.graph_title = "No data available to display graphs."
-            else:
-                for month, total in summary:
-                    self.data_for_painting.append({'month': month, 'amount': total})
-                self.graph_title = 'Monthly Expenses Trend'
-            
-        elif self.graph_type == "Pie Chart (Not Implemented)":
-            self.graph_title = "Pie Chart not implemented with QPainter."
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.stale:
+            self.update_graph()
 
+    def update_graph(self):
+        self.stale = False
+        graph_type = self.graph_type_combo.currentText()
+        is_trend = graph_type == "Line Chart (Trend)"
+        self.resolution_combo.setVisible(is_trend)
+        self.zoom_hint.setVisible(is_trend)
+        cached = self.snapshot["graphs"].get(graph_type)
+        if cached is not None and graph_type != self.graph_type:
+            self.show_graph(graph_type, cached) # Last known data now; the query below reconciles it
+        # Every chart gets its own aggregate, already reduced to what it draws
+        if graph_type in ("Bar Chart (Category)", "Pie Chart (Category)"):
+            self.service.read(database.get_category_summary, callback=lambda summary: self.show_graph(graph_type, summary))
+        elif graph_type == "Line Chart (Trend)":
+            # One row per day; weeks and months are bucketed from it without another query
+            self.service.read(database.get_daily_series, callback=lambda summary: self.show_graph(graph_type, summary))
+        elif graph_type == "Stacked Area (Category by Month)":
+            self.service.read(database.get_category_monthly_summary, callback=lambda summary: self.show_graph(graph_type, summary))
+        elif graph_type == "Calendar Heatmap":
+            start = database.from_day(charts.calendar_start(self.today()))
+            self.service.read(database.get_daily_series, start, callback=lambda summary: self.show_graph(graph_type, summary))
+        else:
+            self.show_graph(graph_type, None)
+
+    def today(self):
+        return database.to_day(datetime.now().date())
+
+    def show_graph(self, graph_type, summary):
+        if graph_type != self.graph_type_combo.currentText():
+            return # The user switched graphs while the summary was loading
+        if summary is not None:
+            self.snapshot["graphs"][graph_type] = summary
+        data_for_painting = []
+        graph_title = ""
+
+        titles = {
+            "Bar Chart (Category)": 'Total Expenses by Category',
+            "Line Chart (Trend)": 'Expenses Trend',
+            "Pie Chart (Category)": 'Share of Expenses by Category',
+            "Stacked Area (Category by Month)": 'Monthly Expenses by Category',
+            "Calendar Heatmap": 'Daily Expenses, Last 12 Months',
+        }
+        if not summary:
+            graph_title = "No data available to display graphs."
+        else:
+            data_for_painting = [tuple(item) for item in summary]
+            graph_title = titles[graph_type]
+
+        if (graph_type, graph_title, data_for_painting) == (self.graph_type, self.graph_title, self.data_for_painting):
+            return # Reconciled to the data already on screen; keep the cached chart
+        self.data_for_painting = data_for_painting
+        self.graph_title = graph_title
+        self.graph_type = graph_type
+        self.data_version += 1
+        if graph_type == "Line Chart (Trend)":
+            self.rebuild_series()
         self.update() # Triggers paintEvent
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+    def set_resolution(self, resolution):
+        self.resolution = resolution
+        self.rebuild_series()
+        self.update()
+
+    def rebuild_series(self):
+        self.series = charts.TimeSeries(charts.bucket_series(self.data_for_painting, self.resolution))
+        self.window.set_extent(self.series.extent())
+
+    def plot_rect(self, widget_rect):
+        return QRect(self.LEFT_MARGIN, self.TOP_MARGIN,
+                     widget_rect.width() - self.LEFT_MARGIN - self.RIGHT_MARGIN,
+                     widget_rect.height() - self.TOP_MARGIN - self.BOTTOM_MARGIN)
 
+    def zoomable(self):
+        return self.graph_type == "Line Chart (Trend)" and len(self.series) > 1
+
+    def wheelEvent(self, event):
+        if not self.zoomable():
+            super().wheelEvent(event)
+            return
+        plot_rect = self.plot_rect(self.rect())
+        anchor = (event.pos().x() - plot_rect.left()) / max(1, plot_rect.width())
+        self.window.zoom(self.ZOOM_STEP ** (event.angleDelta().y() / 120), min(1.0, max(0.0, anchor)))
+        self.update()
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if self.zoomable() and event.button() == Qt.LeftButton:
+            self.drag_x = event.pos().x()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self.drag_x is not None:
+            plot_width = max(1, self.plot_rect(self.rect()).width())
+            self.window.pan((self.drag_x - event.pos().x()) / plot_width)
+            self.drag_x = event.pos().x()
+            self.update()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        self.drag_x = None
+        super().mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        if self.zoomable():
+            self.window.reset()
+            self.update()
+        super().mouseDoubleClickEvent(event)
+
+    def paintEvent(self, event):
         widget_rect = self.rect()
         if widget_rect.width() <= 0 or widget_rect.height() <= 0:
-            return    
-
-        
-        # Margins to leave space for axis labels and title
-        left_margin = 60
-        right_margin = 20
-        top_margin = 40  # Increased space for title
-        bottom_margin = 80 # Increased space for X-axis labels
+            return
+        ratio = self.devicePixelRatioF()
+        key = (self.data_version, widget_rect.size(), self.graph_type, ratio,
+               self.resolution, self.window.start, self.window.end)
+        if key != self.chart_cache_key:
+            self.chart_cache = self.render_chart(widget_rect, ratio)
+            self.chart_cache_key = key
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.chart_cache)
+
+    def render_chart(self, widget_rect, ratio):
+        """Render the current chart into a transparent pixmap the size of the widget."""
+        pixmap = QPixmap(widget_rect.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        # A pixmap painter does not inherit the widget's pen and font like QPainter(self) does
+        painter.setPen(self.palette().color(self.foregroundRole()))
+        painter.setFont(self.font())
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.draw_chart(painter, widget_rect)
+        painter.end()
+        return pixmap
 
-        plot_area_width = widget_rect.width() - left_margin - right_margin
-        plot_area_height = widget_rect.height() - top_margin - bottom_margin
+    def draw_chart(self, painter, widget_rect):
+        top_margin = self.TOP_MARGIN
+        plot_rect = self.plot_rect(widget_rect)
 
         # Ensure plot_area dimensions are not negative
-        if plot_area_width <= 0 or plot_area_height <= 0:
+        if plot_rect.width() <= 0 or plot_rect.height() <= 0:
             painter.drawText(widget_rect, Qt.AlignCenter, "Graph area too small.")
             return
 
-        plot_rect = QRect(left_margin, top_margin, plot_area_width, plot_area_height)
-
         # Draw main title
+        graph_title = self.graph_title
+        if self.graph_type == "Line Chart (Trend)" and self.data_for_painting:
+            graph_title = f"{self.resolution} {graph_title}"
         painter.setFont(QFont("Arial", 12, QFont.Bold))
         title_rect = QRect(0, 0, widget_rect.width(), top_margin) # Adjusted title area
-        painter.drawText(title_rect, Qt.AlignCenter, self.graph_title)
+        painter.drawText(title_rect, Qt.AlignCenter, graph_title)
         painter.setFont(QFont("Arial", 8)) # Reset font for other labels
-        
-        if not self.data_for_painting and (self.graph_title == "No data available to display graphs." or self.graph_type == "Pie Chart (Not Implemented)"):
+
+        if not self.data_for_painting:
             painter.drawText(plot_rect, Qt.AlignCenter, self.graph_title)
             return
 
+        # Fills and labels are collected per chart and painted in batches
+        batch = charts.ChartBatch()
+        if self.graph_type == "Bar Chart (Category)":
+            self.draw_bar_chart(painter, batch, plot_rect)
+        elif self.graph_type == "Line Chart (Trend)":
+            self.draw_trend_chart(painter, batch, plot_rect)
+        elif self.graph_type == "Pie Chart (Category)":
+            self.draw_pie_chart(painter, batch, plot_rect)
+        elif self.graph_type == "Stacked Area (Category by Month)":
+            self.draw_stacked_area(painter, batch, plot_rect)
+        elif self.graph_type == "Calendar Heatmap":
+            self.draw_calendar_heatmap(painter, batch, plot_rect)
+
+    def draw_axes(self, painter, plot_rect, min_amount, max_amount):
+        left_margin = self.LEFT_MARGIN
         # Draw X and Y axis lines
         painter.drawLine(plot_rect.bottomLeft(), plot_rect.bottomRight()) # X-axis
         painter.drawLine(plot_rect.bottomLeft(), plot_rect.topLeft()) # Y-axis
-        
+
         # Y-axis label text
         painter.save()
         painter.translate(10, plot_rect.center().y()) # Position it to the left of the plot area
@@ -577,122 +960,253 @@ class GraphsView(QWidget):
         painter.drawText(QRect(int(-plot_rect.height()/2), int(-50/2), int(plot_rect.height()), int(50)), Qt.AlignCenter, "Amount")
         painter.restore()
 
+        # Align right for Y-axis labels, centered vertically within their small rect
+        painter.drawText(QRect(0, plot_rect.bottom() - 10, left_margin - 5, 20), Qt.AlignRight | Qt.AlignVCenter, str(round(min_amount, 2)))
+        painter.drawText(QRect(0, plot_rect.top() - 10, left_margin - 5, 20), Qt.AlignRight | Qt.AlignVCenter, str(round(max_amount, 2)))
+
+    def add_time_labels(self, batch, plot_rect, start, end, resolution):
+        """Rotated date labels every TICK_SPACING pixels rather than one per point."""
+        ticks = max(1, plot_rect.width() // self.TICK_SPACING)
+        for i in range(ticks + 1):
+            x_pos = plot_rect.left() + i * plot_rect.width() / ticks
+            day = start + (end - start) * i / ticks
+            batch.add_rotated_label(QPointF(x_pos, plot_rect.bottom() + 5), charts.label_for_day(round(day), resolution))
+
+    def add_legend(self, batch, plot_rect, names):
+        """One swatch and name per colour, stacked down the right edge of the plot."""
+        for i, name in enumerate(names):
+            top = plot_rect.top() + i * 18
+            batch.add_rect(charts.PALETTE[i], QRectF(plot_rect.right() - 110, top + 2, 10, 10))
+            batch.add_label(QPointF(plot_rect.right() - 95, top), name)
+
+    def draw_bar_chart(self, painter, batch, plot_rect):
+        amounts = [item[1] for item in self.data_for_painting]
+        max_amount = max(amounts) or 1.0
+        self.draw_axes(painter, plot_rect, 0, max_amount)
+
+        bar_width_ratio = 0.7
+        bar_total_width = plot_rect.width() / len(amounts)
+        actual_bar_width = bar_total_width * bar_width_ratio
+
+        # Bars and X-axis labels (rotated to avoid overlap)
+        for i, (category, amount) in enumerate(self.data_for_painting):
+            x = plot_rect.left() + i * bar_total_width + (bar_total_width - actual_bar_width) / 2
+            bar_height = (amount / max_amount) * plot_rect.height()
+            y = plot_rect.bottom() - bar_height
+            batch.add_rect("#3d3dff", QRectF(int(x), int(y), int(actual_bar_width), int(bar_height)))
+            batch.add_rotated_label(QPointF(int(x + actual_bar_width / 2), plot_rect.bottom() + 5), category)
+        batch.paint(painter)
+
+    def draw_trend_chart(self, painter, batch, plot_rect):
+        # At most two points per pixel column, however many days are in the window
+        start, end = self.window.start, self.window.end
+        points = self.series.downsample(start, end, plot_rect.width())
+        amounts = [amount for _, amount in points]
+        max_amount = max(amounts)
+        min_amount = min(amounts)
+        self.draw_axes(painter, plot_rect, min_amount, max_amount)
+
+        # Scale for both axes (handle case where max == min)
+        y_range = max_amount - min_amount
+        y_scale = plot_rect.height() / (y_range if y_range > 0 else 1.0)
+        x_scale = plot_rect.width() / ((end - start) or 1)
+
+        self.add_time_labels(batch, plot_rect, start, end, self.resolution)
+        batch.paint(painter)
+
+        # Draw the whole line in one call; the points just outside the window are clipped
+        painter.setPen(QColor("#3d3dff"))
+        painter.setClipRect(plot_rect)
+        polygon = QPolygonF([QPointF(plot_rect.left() + (day - start) * x_scale,
+                                     plot_rect.bottom() - (amount - min_amount) * y_scale)
+                             for day, amount in points])
+        if len(points) > 1:
+            painter.drawPolyline(polygon)
+        else:
+            painter.drawEllipse(polygon[0], 3, 3) # Draw a point if only one data point
 
-        if self.graph_type == "Bar Chart (Category)":
-            if not self.data_for_painting:
-                painter.drawText(plot_rect, Qt.AlignCenter, "No data for Bar Chart.")
-                return
-
-            categories = [item[0] for item in self.data_for_painting]
-            amounts = [item[1] for item in self.data_for_painting]
-
-            if not amounts:
-                painter.drawText(plot_rect, Qt.AlignCenter, "No data for Bar Chart.")
-                return
-
-            max_amount = max(amounts) if amounts else 1.0
-            
-            bar_width_ratio = 0.7
-            num_bars = len(categories)
-            
-            if num_bars == 0:
-                painter.drawText(plot_rect, Qt.AlignCenter, "No data for Bar Chart.")
-                return
-
-            bar_total_width = plot_rect.width() / num_bars
-            actual_bar_width = bar_total_width * bar_width_ratio
-
-            # Draw bars and X-axis labels
-            for i, (category, amount) in enumerate(self.data_for_painting):
-                x = plot_rect.left() + i * bar_total_width + (bar_total_width - actual_bar_width) / 2
-                bar_height = (amount / max_amount) * plot_rect.height()
-                y = plot_rect.bottom() - bar_height
+    def draw_pie_chart(self, painter, batch, plot_rect):
+        slices = charts.pie_slices(self.data_for_painting)
+        if not slices:
+            painter.drawText(plot_rect, Qt.AlignCenter, "No spending to share out.")
+            return
+        # Donut centred in the space left of the legend
+        chart_rect = plot_rect.adjusted(0, 0, -130, 0)
+        radius = max(10, min(chart_rect.width(), chart_rect.height()) / 2)
+        center = QPointF(chart_rect.center())
+        outer = QRectF(center.x() - radius, center.y() - radius, 2 * radius, 2 * radius)
+        inner = QRectF(center.x() - radius / 2, center.y() - radius / 2, radius, radius)
+        for i, (category, amount, start, span) in enumerate(slices):
+            batch.add_ring_segment(charts.PALETTE[i], outer, inner, start, span)
+        total = sum(amount for _, amount, _, _ in slices)
+        self.add_legend(batch, plot_rect, [f"{category} {amount / total:.0%}" for category, amount, _, _ in slices])
+        batch.paint(painter)
+        painter.drawText(inner, Qt.AlignCenter, f"Total\n{total:,.2f}")
+
+    def draw_stacked_area(self, painter, batch, plot_rect):
+        months, categories, layers = charts.stack_layers(self.data_for_painting)
+        max_amount = max(layers[-1]) or 1.0
+        self.draw_axes(painter, plot_rect, 0, max_amount)
+
+        y_scale = plot_rect.height() / max_amount
+        x_step = plot_rect.width() / (len(months) - 1 if len(months) > 1 else 1)
+        xs = [plot_rect.left() + i * x_step for i in range(len(months))]
+        if len(months) == 1:
+            xs = [plot_rect.left(), plot_rect.right()] # A single month fills the width
+            layers = [layer * 2 for layer in layers]
+
+        # Each layer is one polygon: its top edge left to right, then the layer below right to left
+        below = [plot_rect.bottom()] * len(xs)
+        for i, layer in enumerate(layers):
+            top = [plot_rect.bottom() - amount * y_scale for amount in layer]
+            outline = [QPointF(x, y) for x, y in zip(xs, top)] + [QPointF(x, y) for x, y in zip(reversed(xs), reversed(below))]
+            batch.add_polygon(charts.PALETTE[i], outline)
+            below = top
+
+        ticks = max(1, min(len(months) - 1, plot_rect.width() // self.TICK_SPACING))
+        for i in range(ticks + 1):
+            index = round(i * (len(months) - 1) / ticks)
+            batch.add_rotated_label(QPointF(plot_rect.left() + index * x_step, plot_rect.bottom() + 5), months[index])
+        self.add_legend(batch, plot_rect, categories)
+        batch.paint(painter)
+
+    def draw_calendar_heatmap(self, painter, batch, plot_rect):
+        today = self.today()
+        cells = charts.calendar_cells(self.data_for_painting, today)
+        thresholds = charts.intensity_thresholds([amount for _, _, _, amount in cells])
+
+        # Square cells sized to fit 53 weeks across and 7 days down, with a 2px gap
+        size = max(4.0, min(plot_rect.width() / charts.CALENDAR_WEEKS, plot_rect.height() / 9))
+        left = plot_rect.left() + (plot_rect.width() - size * charts.CALENDAR_WEEKS) / 2
+        top = plot_rect.top() + size
+        for week, weekday, day, amount in cells:
+            level = charts.intensity(amount, thresholds)
+            batch.add_rect(charts.HEATMAP_COLORS[level], QRectF(left + week * size, top + weekday * size, size - 2, size - 2))
+
+        # Month names above the first week that starts in each month
+        previous = None
+        for week, weekday, day, amount in cells:
+            month = database.from_day(day)[:7]
+            if weekday == 0 and month != previous:
+                batch.add_label(QPointF(left + week * size, top - size), datetime.strptime(month, "%Y-%m").strftime("%b"))
+                previous = month
+        for weekday, name in ((0, "Mon"), (2, "Wed"), (4, "Fri")):
+            batch.add_label(QPointF(left - 30, top + weekday * size), name)
+
+        # Less-to-more legend under the grid
+        legend_top = top + 7 * size + 10
+        legend_left = left + size * charts.CALENDAR_WEEKS - (len(charts.HEATMAP_COLORS) * size + 70)
+        batch.add_label(QPointF(legend_left, legend_top), "Less")
+        for level, color in enumerate(charts.HEATMAP_COLORS):
+            batch.add_rect(color, QRectF(legend_left + 30 + level * size, legend_top, size - 2, size - 2))
+        batch.add_label(QPointF(legend_left + 35 + len(charts.HEATMAP_COLORS) * size, legend_top), "More")
+        batch.paint(painter)
+
+class DiagnosticsView(QWidget):
+    """Live per-function database timings collected by instrumentation.RECORDER."""
+    COLUMNS = [("Function", None), ("Calls", "count"), ("p50 ms", "p50_ms"), ("p95 ms", "p95_ms"),
+               ("p99 ms", "p99_ms"), ("Max ms", "max_ms"), ("Total ms", "total_ms"),
+               ("Rows/call", "rows_per_call"), ("SQL/call", "statements_per_call"), ("Errors", "errors")]
+    REFRESH_MS = 1000
+    TOP_STATEMENTS = 15
 
-                painter.setBrush(QColor("#3d3dff"))
-                painter.drawRect(int(x), int(y), int(actual_bar_width), int(bar_height))
-                
-                # Draw category label (rotated to avoid overlap)
-                painter.save()
-                painter.translate(int(x + actual_bar_width / 2), plot_rect.bottom() + 5)
-                painter.rotate(-45)
-                # Ensure text rectangle is appropriately sized for rotation
-                text_width = 80 # Max width for rotated text
-                text_height = 20
-                painter.drawText(QRect(-text_width // 2, 0, text_width, text_height), Qt.AlignLeft, category)
-                painter.restore()
-
-            # Draw Y-axis labels (min and max)
-            painter.setBrush(Qt.NoBrush)
-            painter.setPen(QColor(Qt.white))
-            # Align right for Y-axis labels, centered vertically within their small rect
-            painter.drawText(QRect(0, plot_rect.bottom() - 10, left_margin - 5, 20), Qt.AlignRight | Qt.AlignVCenter, "0")
-            painter.drawText(QRect(0, plot_rect.top() - 10, left_margin - 5, 20), Qt.AlignRight | Qt.AlignVCenter, str(round(max_amount, 2)))
-            
-        elif self.graph_type == "Line Chart (Monthly)":
-            if not self.data_for_painting:
-                painter.drawText(plot_rect, Qt.AlignCenter, "No data for Line Chart.")
-                return
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setStyleSheet("color: white; background-color: #000;")
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.init_ui()
 
-            months = [item['month'] for item in self.data_for_painting]
-            amounts = [item['amount'] for item in self.data_for_painting]
-            
-            if not amounts:
-                painter.drawText(plot_rect, Qt.AlignCenter, "No data for Line Chart.")
-                return
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
 
-            max_amount = max(amounts) if amounts else 1.0
-            min_amount = min(amounts) if amounts else 0.0
+        header_layout = QHBoxLayout()
+        title = QLabel("Diagnostics")
+        title.setStyleSheet("font-size: 24px; font-weight: bold;")
+        header_layout.addWidget(title)
+        header_layout.addStretch()
+        button_style = "background-color: #1a1a1a; border: 1px solid #3d3dff; padding: 5px 12px; border-radius: 5px;"
+        for label, slot in (("Reset", self.on_reset), ("Save JSON", self.on_save)):
+            button = QPushButton(label)
+            button.setStyleSheet(button_style)
+            button.clicked.connect(slot)
+            header_layout.addWidget(button)
+        layout.addLayout(header_layout)
 
-            # Scale for Y axis (handle case where max == min)
-            y_range = max_amount - min_amount
-            y_scale = plot_rect.height() / (y_range if y_range > 0 else 1.0)
-            
-            # Draw X-axis labels (rotated)
-            num_months = len(months)
-            if num_months > 0:
-                x_step = plot_rect.width() / (num_months - 1 if num_months > 1 else 1)
-                for i, month in enumerate(months):
-                    x_pos = plot_rect.left() + i * x_step
-                    painter.save()
-                    painter.translate(int(x_pos), plot_rect.bottom() + 5)
-                    painter.rotate(-45)
-                    text_width = 80
-                    text_height = 20
-                    painter.drawText(QRect(-text_width // 2, 0, text_width, text_height), Qt.AlignLeft, month)
-                    painter.restore()
-            
-            # Draw Y-axis labels
-            painter.drawText(QRect(0, plot_rect.bottom() - 10, left_margin - 5, 20), Qt.AlignRight | Qt.AlignVCenter, str(round(min_amount, 2)))
-            painter.drawText(QRect(0, plot_rect.top() - 10, left_margin - 5, 20), Qt.AlignRight | Qt.AlignVCenter, str(round(max_amount, 2)))
-
-            # Draw lines and points
-            painter.setPen(QColor("#3d3dff"))
-            points = []
-            if num_months > 0:
-                for i, amount in enumerate(amounts):
-                    x_pos = plot_rect.left() + i * x_step
-                    y_pos = plot_rect.bottom() - ((amount - min_amount) * y_scale)
-                    points.append(QPointF(x_pos, y_pos))
-
-                if len(points) > 1:
-                    for i in range(len(points) - 1):
-                        painter.drawLine(points[i], points[i+1])
-                elif len(points) == 1:
-                    painter.drawEllipse(points[0], 3, 3) # Draw a point if only one data point
-
-        else: # Pie Chart (Not Implemented)
-            painter.drawText(plot_rect, Qt.AlignCenter, self.graph_title)
+        table_style = "QTableWidget { background-color: #0a0a0a; gridline-color: #1a1a1a; border: none; }"
+        self.functions_table = QTableWidget(0, len(self.COLUMNS))
+        self.functions_table.setHorizontalHeaderLabels([label for label, _ in self.COLUMNS])
+        self.functions_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.functions_table.verticalHeader().setVisible(False)
+        self.functions_table.setStyleSheet(table_style)
+        layout.addWidget(self.functions_table, 3)
+
+        statements_title = QLabel("Most frequent SQL statements")
+        statements_title.setStyleSheet("font-size: 16px; font-weight: bold; margin-top: 10px;")
+        layout.addWidget(statements_title)
+        self.statements_table = QTableWidget(0, 2)
+        self.statements_table.setHorizontalHeaderLabels(["Statement", "Executions"])
+        self.statements_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.statements_table.verticalHeader().setVisible(False)
+        self.statements_table.setStyleSheet(table_style)
+        layout.addWidget(self.statements_table, 2)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        snapshot = instrumentation.RECORDER.snapshot()
+        functions = snapshot["functions"]
+        self.functions_table.setRowCount(len(functions))
+        for row, (name, stats) in enumerate(functions.items()):
+            for column, (_, key) in enumerate(self.COLUMNS):
+                item = QTableWidgetItem(name if key is None else str(stats[key]))
+                if key is not None:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.functions_table.setItem(row, column, item)
+
+        statements = list(snapshot["statements"].items())[:self.TOP_STATEMENTS]
+        self.statements_table.setRowCount(len(statements))
+        for row, (sql, count) in enumerate(statements):
+            self.statements_table.setItem(row, 0, QTableWidgetItem(sql))
+            count_item = QTableWidgetItem(str(count))
+            count_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            self.statements_table.setItem(row, 1, count_item)
+
+    def on_reset(self):
+        instrumentation.RECORDER.reset()
+        self.refresh()
+
+    def on_save(self):
+        default_name = f"diagnostics-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Diagnostics", default_name, "JSON Files (*.json)")
+        if file_path:
+            try:
+                instrumentation.RECORDER.dump_json(file_path)
+            except OSError as e:
+                QMessageBox.critical(self, "Save Failed", f"Could not write {file_path}: {e}")
 
 class SettingsView(QWidget):
     settings_changed = pyqtSignal()
     clear_all_requested = pyqtSignal() 
     backup_requested = pyqtSignal(str, str) # New signal: (email, password)
+    import_requested = pyqtSignal(str) # Path of a CSV/OFX bank export
 
-    def __init__(self, parent=None):
+    def __init__(self, config, parent=None):
         super().__init__(parent)
+        self.config = config
         self.setStyleSheet("color: white; background-color: #000;")
         self.init_ui()
         self.load_settings()
+        self.config.changed.connect(lambda keys: self.load_settings()) # Edited outside the app
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -712,9 +1226,12 @@ class SettingsView(QWidget):
         form_layout.addRow(QLabel("Gemini API Key:"), self.api_key_input)
         
         self.model_input = QComboBox()
-        self.model_input.addItems(["gemini-flash-latest", "gemini-pro", "Other"])
+        self.model_input.addItems(["gemini-flash-latest", "gemini-pro", assistant.STUB_MODEL, "Other"])
         self.model_input.setStyleSheet("background-color: #1a1a1a; color: white; border: 1px solid #3d3dff; padding: 5px; border-radius: 5px;")
         form_layout.addRow(QLabel("Gemini Model:"), self.model_input)
+
+        self.web_engine_input = QCheckBox("Render answers with QtWebEngine and MathJax (online, restart to apply)")
+        form_layout.addRow(self.web_engine_input)
         
         self.font_size_input = QSpinBox()
         self.font_size_input.setRange(8, 20)
@@ -772,6 +1289,26 @@ class SettingsView(QWidget):
         backup_button.clicked.connect(self.on_backup_clicked)
         layout.addWidget(backup_button, alignment=Qt.AlignCenter)
 
+        layout.addSpacing(30)
+
+        # Import Section
+        import_title = QLabel("Import Bank History")
+        import_title.setStyleSheet("font-size: 18px; font-weight: bold; color: #3d3dff;")
+        layout.addWidget(import_title)
+
+        import_info = QLabel("Load expenses from a CSV (date, category, amount, description) or OFX/QFX bank export.")
+        import_info.setStyleSheet("color: #888; font-size: 11px;")
+        layout.addWidget(import_info)
+
+        import_button = QPushButton(" Import CSV / OFX")
+        import_button.setIcon(qta.icon("fa5s.file-import", color='white'))
+        import_button.setStyleSheet("""
+            QPushButton { background-color: #1a1052; color: white; padding: 10px; border-radius: 5px; font-weight: bold; border: 1px solid #3d3dff; }
+            QPushButton:hover { background-color: #3d3dff; }
+        """)
+        import_button.clicked.connect(self.on_import_clicked)
+        layout.addWidget(import_button, alignment=Qt.AlignCenter)
+
         layout.addSpacing(30)
         
         # Danger Zone
@@ -797,6 +1334,11 @@ class SettingsView(QWidget):
             return
         self.backup_requested.emit(email, password)
 
+    def on_import_clicked(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Import Expenses", "", "Bank Exports (*.csv *.ofx *.qfx)")
+        if file_path:
+            self.import_requested.emit(file_path)
+
     def on_clear_all(self):
         reply = QMessageBox.critical(self, 'Confirm Reset', 
                                      "DANGER: This will delete ALL expenses permanently. Continue?",
@@ -816,37 +1358,84 @@ class SettingsView(QWidget):
         logo_path = self.logo_path_label.text()
         backup_email = self.backup_email_input.text()
         
-        config = {
+        self.config.update({
             "GEMINI_API_KEY": api_key,
             "GEMINI_MODEL": model,
             "FONT_SIZE": font_size,
-            "LOGO_PATH": logo_path,
-            "BACKUP_EMAIL": backup_email
-            }
-        with open("config.json", "w") as f:
-            json.dump(config, f)
+            "LOGO_PATH": "" if logo_path == "No logo selected." else logo_path,
+            "BACKUP_EMAIL": backup_email,
+            "GEMINI_WEB_ENGINE": self.web_engine_input.isChecked()
+            })
         
         self.settings_changed.emit()
         QMessageBox.information(self, "Success", "Settings saved successfully!")
 
     def load_settings(self):
-        try:
-            with open("config.json", "r") as f:
-                config = json.load(f)
-                self.api_key_input.setText(config.get("GEMINI_API_KEY", ""))
-                self.model_input.setCurrentText(config.get("GEMINI_MODEL", "gemini-flash-latest"))
-                self.font_size_input.setValue(config.get("FONT_SIZE", 12))
-                self.logo_path_label.setText(config.get("LOGO_PATH", "No logo selected."))
-                self.backup_email_input.setText(config.get("BACKUP_EMAIL", ""))
-        except FileNotFoundError:
-            pass 
+        self.api_key_input.setText(self.config.get("GEMINI_API_KEY"))
+        self.model_input.setCurrentText(self.config.get("GEMINI_MODEL"))
+        self.font_size_input.setValue(self.config.get("FONT_SIZE"))
+        self.logo_path_label.setText(self.config.get("LOGO_PATH") or "No logo selected.")
+        self.backup_email_input.setText(self.config.get("BACKUP_EMAIL"))
+        self.web_engine_input.setChecked(self.config.get("GEMINI_WEB_ENGINE"))
 
 class GeminiAssistView(QWidget):
+    RENDER_INTERVAL_MS = 50 # Streamed chunks are rendered at most this often
+    CONTEXT_REBUILD_DELAY_MS = 500 # Lets a burst of writes settle before the context is rebuilt
+    # Only used with GEMINI_WEB_ENGINE; the default QTextBrowser draws math itself (see mathtext.py)
+    PAGE_TEMPLATE = """
+            <html>
+            <head>
+                <script type="text/javascript" async
+                    src="https://cdnjs.cloudflare.com/ajax/libs/mathjax/3.2.0/es5/tex-mml-chtml.js">
+                </script>
+                <style>
+                    body {{
+                        color: white;
+                        background-color: #1a1a1a;
+                    }}
+                </style>
+            </head>
+            <body>
+                <div id="answer">{html}</div>
+            </body>
+            </html>
+            """
+    TEXT_STYLE = """
+            pre, code { font-family: monospace; background-color: #262626; }
+            th, td { border: 1px solid #3d3dff; padding: 4px; }
+            table { border-collapse: collapse; }
+            """
+
     def __init__(self, dashboard_instance, parent=None):
         super().__init__(parent)
         self.dashboard_instance = dashboard_instance
         self.setStyleSheet("color: white; background-color: #000;")
-        self.md = MarkdownIt()
+        self.md = None # IncrementalMarkdown, created with the first answer
+        self.cache = assistant.ResponseCache(assistant.cache_path(dashboard_instance.db_file))
+        self.pending_ask = None # Question waiting for the ledger version
+        # The prompt context is rebuilt in the background after the totals change, not per question
+        self.service = dashboard_instance.service
+        self.config = dashboard_instance.config
+        self.context_builder = assistant.ContextBuilder(self.config.get("GEMINI_CONTEXT_TOKENS"))
+        self.context = None
+        self.context_generation = 0
+        self.context_timer = QTimer(self)
+        self.context_timer.setSingleShot(True)
+        self.context_timer.setInterval(self.CONTEXT_REBUILD_DELAY_MS)
+        self.context_timer.timeout.connect(self.refresh_context)
+        self.service.data_changed.connect(self.apply_changes)
+        self.request = None
+        # QtWebEngine costs hundreds of MB and a MathJax download per answer; it is opt-in
+        self.web_engine = self.config.get("GEMINI_WEB_ENGINE")
+        self.page_ready = False
+        self.pending_html = None
+        self.typeset_pending = False
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(self.RENDER_INTERVAL_MS)
+        self.render_timer.timeout.connect(self.flush_answer)
+        self.timeout_timer = QTimer(self)
+        self.timeout_timer.setSingleShot(True)
         self.init_ui()
 
     def init_ui(self):
@@ -863,8 +1452,7 @@ class GeminiAssistView(QWidget):
         self.question_input.setStyleSheet("background-color: #1a1a1a; color: white; border: 1px solid #3d3dff; padding: 5px; border-radius: 5px;")
         layout.addWidget(self.question_input)
 
-        ask_button = QPushButton("Ask Gemini")
-        ask_button.setStyleSheet("""
+        button_style = """
             QPushButton {
                 background-color: #3d3dff; 
                 color: white; 
@@ -875,11 +1463,44 @@ class GeminiAssistView(QWidget):
             QPushButton:hover {
                 background-color: #5555ff;
             }
-        """)
-        ask_button.clicked.connect(self.ask_gemini)
-        layout.addWidget(ask_button, alignment=Qt.AlignCenter)
-
-        self.response_output = QWebEngineView()
+            QPushButton:disabled {
+                background-color: #333;
+                color: #777;
+            }
+        """
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+        self.ask_button = QPushButton("Ask Gemini")
+        self.ask_button.setStyleSheet(button_style)
+        self.ask_button.clicked.connect(self.ask_gemini)
+        buttons_layout.addWidget(self.ask_button)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setStyleSheet(button_style)
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_answer)
+        buttons_layout.addWidget(self.stop_button)
+        buttons_layout.addStretch()
+        layout.addLayout(buttons_layout)
+
+        self.cache_label = QLabel(self.cache.describe())
+        self.cache_label.setStyleSheet("color: #888; font-size: 11px;")
+        layout.addWidget(self.cache_label, alignment=Qt.AlignCenter)
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #8a8aff; font-size: 11px;")
+        layout.addWidget(self.status_label, alignment=Qt.AlignCenter)
+        self.context_label = QLabel("Prompt context: not built yet")
+        self.context_label.setStyleSheet("color: #888; font-size: 11px;")
+        layout.addWidget(self.context_label, alignment=Qt.AlignCenter)
+        self.refresh_context()
+
+        if self.web_engine:
+            from PyQt5.QtWebEngineWidgets import QWebEngineView # Heavy; only loaded when enabled
+            self.response_output = QWebEngineView()
+            self.response_output.loadFinished.connect(self.page_loaded)
+        else:
+            self.response_output = QTextBrowser()
+            self.response_output.setOpenExternalLinks(True)
+            self.response_output.document().setDefaultStyleSheet(self.TEXT_STYLE)
         self.response_output.setStyleSheet("background-color: #1a1a1a; color: white; border: 1px solid #3d3dff; padding: 5px; border-radius: 5px;")
         layout.addWidget(self.response_output)
 
@@ -889,76 +1510,178 @@ class GeminiAssistView(QWidget):
             QMessageBox.warning(self, "No Question", "Please enter a question to ask Gemini.")
             return
 
-        api_key = self.load_api_key()
-        if not api_key:
+        api_key = self.config.get("GEMINI_API_KEY")
+        model_name = self.config.get("GEMINI_MODEL")
+        if not api_key and model_name != assistant.STUB_MODEL:
             QMessageBox.warning(self, "API Key Not Found", "Please set your Gemini API key in the Settings.")
             return
 
-        genai.configure(api_key=api_key)
-        
-        try:
-            with open("config.json", "r") as f:
-                config = json.load(f)
-                model_name = config.get("GEMINI_MODEL", "gemini-flash-latest")
-        except FileNotFoundError:
-            model_name = "gemini-flash-latest"
-            
-        model = genai.GenerativeModel(model_name)
-
-        # Get summarized expense data
-        monthly_summary = self.dashboard_instance.get_monthly_expenses_summary()
-        category_summary = self.dashboard_instance.get_category_expenses_summary()
-        yearly_summary = self.dashboard_instance.get_yearly_expenses_summary()
-        
-        prompt = f"""You are an expense assistant. Analyze the provided expense summaries to answer the user's question.
-If the question is beyond the scope of these summaries, state that you can only answer questions based on the provided summaries.
-
-{monthly_summary}
-{category_summary}
-{yearly_summary}
+        self.stop_answer()
+        if self.md is None:
+            self.md = assistant.IncrementalMarkdown(local_math=not self.web_engine)
+        self.md.reset()
+        self.show_page("Thinking...")
+        self.set_running(True)
+
+        # Answers are cached per ledger version; look it up before paying for a request
+        self.context_builder.budget = self.config.get("GEMINI_CONTEXT_TOKENS")
+        ask = (question, model_name, api_key, self.config.get("GEMINI_TIMEOUT"))
+        self.pending_ask = ask
+        self.dashboard_instance.service.read(database.get_ledger_version,
+                                             callback=lambda version: self.start_answer(ask, version))
+
+    def start_answer(self, ask, ledger_version):
+        if ask is not self.pending_ask:
+            return # Stopped, or replaced by a newer question
+        self.pending_ask = None
+        question, model_name, api_key, timeout = ask
+        cached = self.cache.get(question, model_name, ledger_version)
+        self.cache_label.setText(self.cache.describe())
+        if cached is not None:
+            self.md.feed(cached)
+            self.set_running(False)
+            self.answer_complete()
+            return
 
-My question is: {question}"""
+        # The precomputed context is used when it is current; otherwise it is built on the request's thread
+        context = self.context
+        builder = self.context_builder
+        service = self.service
+        def build_prompt():
+            if context is None:
+                with service.reader() as conn:
+                    return assistant.build_prompt(question, builder.build(conn).text, tools=True)
+            return assistant.build_prompt(question, builder.fit(context).text, tools=True)
+        # Exact figures come from bounded lookups on a read-only connection, not from a bigger prompt
+        def run_tool(name, args):
+            with service.reader() as conn:
+                return assistant_tools.call_tool(conn, name, args)
+        request = assistant.AssistantRequest(lambda: assistant.create_model(api_key, model_name),
+                                             build_prompt, timeout, tool_runner=run_tool)
+        request.chunk_received.connect(lambda text: self.answer_chunk(request, text))
+        request.tool_called.connect(lambda call: self.answer_tool_called(request, call))
+        request.finished.connect(lambda text: self.answer_finished(request, (question, model_name, ledger_version), text))
+        request.failed.connect(lambda message: self.answer_failed(request, message))
+        self.request = request
+        self.timeout_timer.timeout.connect(request.expire)
+        self.timeout_timer.start(int(timeout * 1000))
+        request.start()
+
+    def apply_changes(self, changes):
+        if changes["totals_changed"]:
+            self.context = None
+            self.context_generation += 1
+            self.context_timer.start()
+
+    def refresh_context(self):
+        generation = self.context_generation
+        self.service.read(self.context_builder.build, callback=lambda context: self.context_ready(generation, context))
+
+    def context_ready(self, generation, context):
+        if generation != self.context_generation:
+            return # Built from data that has changed since; a newer build is on its way
+        self.context = context
+        self.context_label.setText(context.describe())
+
+    def stop_answer(self):
+        if self.pending_ask is not None:
+            self.pending_ask = None
+            self.set_running(False)
+        if self.request is None:
+            return
+        self.request.cancel()
+        self.end_request()
+        self.flush_answer()
 
+    def end_request(self):
+        self.timeout_timer.stop()
         try:
-            self.response_output.setHtml("Thinking...")
-            QApplication.processEvents()
-            response = model.generate_content(prompt)
-            html_response = self.md.render(response.text)
-            
-            html_with_mathjax = f"""
-            <html>
-            <head>
-                <script type="text/javascript" async
-                    src="https://cdnjs.cloudflare.com/ajax/libs/mathjax/3.2.0/es5/tex-mml-chtml.js">
-                </script>
-                <style>
-                    body {{
-                        color: white;
-                        background-color: #1a1a1a;
-                    }}
-                </style>
-            </head>
-            <body>
-                {html_response}
-            </body>
-            </html>
-            """
-            self.response_output.setHtml(html_with_mathjax)
-        except Exception as e:
-            self.response_output.setHtml(f"An error occurred: {e}")
+            self.timeout_timer.timeout.disconnect()
+        except TypeError:
+            pass # Nothing connected
+        self.request = None # Its thread keeps it alive until it notices the cancellation
+        self.set_running(False)
+
+    def set_running(self, running):
+        if not running:
+            self.status_label.setText("")
+        self.ask_button.setEnabled(not running)
+        self.stop_button.setEnabled(running)
+
+    def answer_chunk(self, request, text):
+        if request is not self.request:
+            return # A cancelled request delivering its last chunk
+        self.pending_html = self.md.feed(text)
+        if not self.render_timer.isActive():
+            self.render_timer.start()
+
+    def answer_tool_called(self, request, call):
+        if request is self.request:
+            self.status_label.setText(f"Looking up {call}")
+
+    def answer_finished(self, request, cache_key, text):
+        if request is not self.request:
+            return
+        self.end_request()
+        if text:
+            question, model_name, ledger_version = cache_key
+            self.cache.put(question, model_name, ledger_version, text)
+            self.cache_label.setText(self.cache.describe())
+        self.answer_complete()
+
+    def answer_complete(self):
+        self.render_timer.stop()
+        self.pending_html = self.md.finish()
+        self.typeset_pending = True
+        self.flush_answer()
+
+    def answer_failed(self, request, message):
+        if request is not self.request:
+            return
+        self.end_request()
+        self.render_timer.stop()
+        self.pending_html = self.md.feed("") + f"<p><b>An error occurred:</b> {escape(message)}</p>"
+        self.flush_answer()
+
+    def show_page(self, html):
+        """Load the answer page; chunks are then swapped into it without reloading."""
+        self.pending_html = None
+        self.typeset_pending = False
+        if not self.web_engine:
+            self.page_ready = True # QTextBrowser lays out synchronously
+            self.response_output.setHtml(html)
+            return
+        self.page_ready = False
+        self.response_output.setHtml(self.PAGE_TEMPLATE.format(html=html))
 
-    def load_api_key(self):
-        try:
-            with open("config.json", "r") as f:
-                config = json.load(f)
-                return config.get("GEMINI_API_KEY")
-        except FileNotFoundError:
-            return None
+    def page_loaded(self, ok):
+        self.page_ready = True
+        self.flush_answer()
+
+    def flush_answer(self):
+        if self.pending_html is None or not self.page_ready:
+            return
+        if not self.web_engine:
+            scroll_bar = self.response_output.verticalScrollBar()
+            position = scroll_bar.value()
+            self.response_output.setHtml(self.pending_html) # Math was already drawn by mathtext
+            scroll_bar.setValue(position) # setHtml scrolls back to the top
+            self.pending_html = None
+            self.typeset_pending = False
+            return
+        script = f"document.getElementById('answer').innerHTML = {json.dumps(self.pending_html)};"
+        if self.typeset_pending: # Math is typeset once, over the whole answer
+            script += "if (window.MathJax && MathJax.typesetPromise) MathJax.typesetPromise();"
+            self.typeset_pending = False
+        self.response_output.page().runJavaScript(script)
+        self.pending_html = None
 
 class DashboardView(QWidget):
-    def __init__(self, conn, parent=None):
+    def __init__(self, service, parent=None, snapshot_data=None):
         super().__init__(parent)
-        self.conn = conn
+        self.service = service
+        self.snapshot = snapshot_data if snapshot_data is not None else snapshot.empty_snapshot()
+        self.service.data_changed.connect(self.apply_changes)
         self.setStyleSheet("color: white; background-color: #000;")
         self.init_ui()
 
@@ -986,6 +1709,8 @@ class DashboardView(QWidget):
         self.layout.addLayout(self.cards_layout)
         self.layout.addStretch()
         
+        if self.snapshot["stats"]:
+            self.show_stats(self.snapshot["stats"]) # Paint last session's numbers before the query returns
         self.update_stats()
 
     def create_stat_card(self, title, value, icon, color):
@@ -1019,91 +1744,115 @@ class DashboardView(QWidget):
         return card
 
     def update_stats(self):
-        stats = database.get_dashboard_stats(self.conn)
+        self.service.read(database.get_dashboard_stats, callback=self.show_stats)
+
+    def apply_changes(self, changes):
+        if changes["totals_changed"]: # Star and description edits leave the totals alone
+            self.update_stats()
+
+    def show_stats(self, stats):
+        self.snapshot["stats"] = stats
         self.month_card.value_label.setText(f"${stats['total_month']:.2f}")
         self.today_card.value_label.setText(f"${stats['total_today']:.2f}")
         self.top_cat_card.value_label.setText(stats['top_category'])
 
+class StartupTimer(QObject):
+    """
+    Startup-timing hook: measures from launch to the end of the first paint of
+    `widget`, once, and reports it against STARTUP_TARGET_MS.
+    """
+    def __init__(self, widget, started, target_ms=STARTUP_TARGET_MS, parent=None):
+        super().__init__(parent)
+        self.widget = widget
+        self.started = started
+        self.target_ms = target_ms
+        self.elapsed_ms = None
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self.widget and event.type() == QEvent.Paint:
+            self.widget.removeEventFilter(self)
+            QTimer.singleShot(0, self.on_first_paint) # Runs once this paint has finished
+        return False
+
+    def on_first_paint(self):
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+        instrumentation.RECORDER.record("startup", self.elapsed_ms / 1000)
+        if self.elapsed_ms > self.target_ms or instrumentation.enabled():
+            print(f"Startup: first dashboard paint after {self.elapsed_ms:.0f} ms (target {self.target_ms} ms)")
+
 class Dashboard(QWidget):
-    def __init__(self):
+
+    def __init__(self, db_file=None, launched_at=None):
         super().__init__()
+        self.launched_at = LAUNCHED_AT if launched_at is None else launched_at
         self.setWindowTitle("Faïssal Dashboard")
         self.resize(1100, 750)
         
         # Use an absolute path based on the script location for the database
         import os
         base_dir = os.path.dirname(os.path.abspath(__file__))
-        self.db_file = os.path.join(base_dir, "expense_manager.db")
+        self.db_file = db_file or os.path.join(base_dir, "expense_manager.db")
         
-        self.conn = database.create_connection(self.db_file)
-        database.main(self.db_file) # Ensure table is created
+        # Last session's stats and graph data, shown until fresh values arrive
+        self.snapshot = snapshot.load_snapshot(self.db_file)
+
+        # All SQL runs on the service's worker thread, which also migrates the schema on start
+        self.service = DatabaseService(self.db_file, parent=self)
+        self.service.failed.connect(self.database_failed)
+        # Connected before any view's slot, so the views refill the snapshot after it is cleared
+        self.service.data_changed.connect(self.invalidate_snapshot)
+        self.service.start()
+
+        # Settings are read once and kept in memory; views ask the service, not config.json
+        self.config = config_service.ConfigService(parent=self)
+        self.config.changed.connect(self.apply_settings)
 
         self.init_ui()
-        self.load_expenses()
-        self.load_starred_expenses()
         self.apply_settings()
 
-    def apply_settings(self):
-        try:
-            with open("config.json", "r") as f:
-                config = json.load(f)
-                font_size = config.get("FONT_SIZE", 12)
-                self.setStyleSheet(f"background-color: #000000; font-size: {font_size}pt;")
-                
-                logo_path = config.get("LOGO_PATH")
-                if logo_path and logo_path != "No logo selected.":
-                    pixmap = QPixmap(logo_path)
-                    if not pixmap.isNull():
-                        circular_pixmap = self.get_circular_pixmap(pixmap, 64) # Use 64x64 for logo size
-                        self.logo.setPixmap(circular_pixmap)
-                        self.logo.setText("") # Clear "LOGO" text if image is set
-                    else:
-                        self.logo.setText("LOGO")
+    def apply_settings(self, changed=None):
+        """Apply the font size and logo; `changed` limits it to the settings that changed."""
+        if changed is None or "FONT_SIZE" in changed:
+            # Restyles every widget in the window, so only when the size really changed
+            font_size = self.config.get("FONT_SIZE")
+            self.setStyleSheet(f"background-color: #000000; font-size: {font_size}pt;")
+
+        if changed is None or "LOGO_PATH" in changed:
+            logo_path = self.config.get("LOGO_PATH")
+            if logo_path and logo_path != "No logo selected.":
+                pixmap = QPixmap(logo_path)
+                if not pixmap.isNull():
+                    circular_pixmap = self.get_circular_pixmap(pixmap, 64) # Use 64x64 for logo size
+                    self.logo.setPixmap(circular_pixmap)
+                    self.logo.setText("") # Clear "LOGO" text if image is set
                 else:
                     self.logo.setText("LOGO")
-        except FileNotFoundError:
-            self.setStyleSheet("background-color: #000000; font-size: 12pt;")
-            self.logo.setText("LOGO")
-
-    def get_all_expenses_for_gemini(self):
-        return database.get_all_expenses(self.conn)
-
-    def get_monthly_expenses_summary(self):
-        """Returns a summary of total expenses per month."""
-        summary = database.get_monthly_summary(self.conn)
-        summary_str = "Monthly Expense Summary:\n"
-        for month, total in summary:
-            summary_str += f"- {month}: ${total:.2f}\n"
-        return summary_str
-
-    def get_category_expenses_summary(self):
-        """Returns a summary of total expenses per category."""
-        summary = database.get_category_summary(self.conn)
-        summary_str = "Category Expense Summary:\n"
-        for category, total in summary:
-            summary_str += f"- {category}: ${total:.2f}\n"
-        return summary_str
-
-    def get_yearly_expenses_summary(self):
-        """Returns a summary of total expenses per year."""
-        summary = database.get_yearly_summary(self.conn)
-        summary_str = "Yearly Expense Summary:\n"
-        for year, total in summary:
-            summary_str += f"- {year}: ${total:.2f}\n"
-        return summary_str
-
-    def load_expenses(self):
-        """Load expenses from the database and update the view."""
-        expenses = database.get_all_expenses(self.conn)
-        self.view_expenses_widget.update_expense_list(expenses)
-        self.dashboard_view_widget.update_stats()
-
-    def load_starred_expenses(self):
-        """Load starred expenses from the database and update the view."""
-        expenses = database.get_starred_expenses(self.conn)
-        self.starred_view_widget.update_starred_list(expenses)
-        self.dashboard_view_widget.update_stats()
-    
+            else:
+                self.logo.setText("LOGO")
+
+    def invalidate_snapshot(self, changes):
+        """
+        Forget saved figures once the totals change. The snapshot is keyed by the
+        database file's state, so anything left in it would be shown at the next
+        launch as if it were current; views put fresh values back as they refresh.
+        """
+        if changes["totals_changed"]:
+            self.snapshot["stats"] = None
+            self.snapshot["graphs"].clear()
+
+    def database_failed(self, error):
+        """The database could not be opened or upgraded; every request now fails with `error`."""
+        self.snapshot = snapshot.empty_snapshot() # Don't keep showing or saving figures for it
+        QMessageBox.critical(self, "Database Error",
+                             f"{self.db_file} could not be opened or upgraded, so no expenses can be shown "
+                             f"or saved. The failed upgrade step was rolled back.\n\n{error}")
+
+    def closeEvent(self, event):
+        self.service.stop()
+        snapshot.save_snapshot(self.db_file, self.snapshot) # After the connections closed the WAL
+        super().closeEvent(event)
+
     def add_expense(self, expense_data):
         """Adds a new expense to the database and refreshes the view."""
         expense = (
@@ -1113,21 +1862,53 @@ class Dashboard(QWidget):
             expense_data['description'],
             0 # starred
         )
-        database.add_expense(self.conn, expense, commit=True)
-        self.load_expenses() # Reload and refresh the view
+        self.service.write(database.add_expense, expense)
     
     def delete_expense(self, expense_id):
         """Deletes a specific expense from the database."""
-        database.delete_expense(self.conn, expense_id)
-        self.load_expenses()
-        self.load_starred_expenses()
+        self.service.write(database.delete_expense, expense_id)
 
     def clear_database(self):
         """Clears all expenses from the database."""
-        database.clear_all_expenses(self.conn)
-        self.load_expenses()
-        self.load_starred_expenses()
-        QMessageBox.information(self, "Database Reset", "All data has been cleared successfully.")
+        def on_cleared(_):
+            QMessageBox.information(self, "Database Reset", "All data has been cleared successfully.")
+
+        self.service.write(database.clear_all_expenses, callback=on_cleared)
+
+    def import_expenses(self, file_path):
+        """
+        Streams a CSV/OFX file into the database behind a progress dialog. Each
+        batch is its own worker request, queued once the previous one is done, so
+        page loads, stars and new expenses run in between instead of after the import.
+        """
+        try:
+            job = importer.FileImport(file_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Import Failed", f"Could not import {os.path.basename(file_path)}: {e}")
+            return
+        progress_dialog = QProgressDialog("Importing expenses...", "Cancel", 0, 1000, self)
+        progress_dialog.setWindowTitle("Import")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoClose(False)
+        progress_dialog.setAutoReset(False)
+
+        def on_batch(imported):
+            # No batch is running now, so the job may be read or closed here
+            progress_dialog.setValue(int(1000 * job.progress()))
+            if not job.done and not progress_dialog.wasCanceled():
+                self.service.submit(job.import_batch, callback=on_batch, errback=on_failed)
+                return
+            job.close()
+            progress_dialog.close()
+            QMessageBox.information(self, "Import Complete", f"Imported {imported} expenses.")
+
+        def on_failed(e):
+            job.close()
+            progress_dialog.close()
+            QMessageBox.critical(self, "Import Failed", f"Could not import {os.path.basename(file_path)}: {e}")
+
+        self.service.submit(job.import_batch, callback=on_batch, errback=on_failed)
 
     def perform_cloud_backup(self, email, password):
         """Sends the .db file to the user's email in a background thread."""
@@ -1149,13 +1930,19 @@ class Dashboard(QWidget):
             body = "Attached is your latest Expense Manager database backup."
             msg.attach(MIMEText(body, 'plain'))
 
+            # Snapshot through a read-only connection: in WAL mode the .db file
+            # alone can miss recent commits, and the writer keeps running meanwhile
             filename = os.path.basename(self.db_file)
-            with open(self.db_file, "rb") as attachment:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(attachment.read())
-                encoders.encode_base64(part)
-                part.add_header('Content-Disposition', f"attachment; filename= {filename}")
-                msg.attach(part)
+            with tempfile.TemporaryDirectory() as backup_dir:
+                backup_file = os.path.join(backup_dir, filename)
+                with self.service.reader() as conn:
+                    database.backup_database(conn, backup_file)
+                with open(backup_file, "rb") as attachment:
+                    part = MIMEBase('application', 'octet-stream')
+                    part.set_payload(attachment.read())
+                    encoders.encode_base64(part)
+                    part.add_header('Content-Disposition', f"attachment; filename= {filename}")
+                    msg.attach(part)
 
             server = smtplib.SMTP('smtp.gmail.com', 587)
             server.starttls()
@@ -1171,9 +1958,7 @@ class Dashboard(QWidget):
 
     def toggle_star(self, expense_id, starred):
         """Toggles the starred status of an expense."""
-        database.update_expense_star(self.conn, expense_id, 1 - starred)
-        self.load_expenses()
-        self.load_starred_expenses()
+        self.service.write(database.update_expense_star, expense_id, 1 - starred)
 
 
     def init_ui(self):
@@ -1237,6 +2022,10 @@ class Dashboard(QWidget):
         bell_btn = self.create_header_btn("fa5s.bell")
         profile_btn = self.create_header_btn("fa5s.user") 
 
+        if instrumentation.enabled():
+            self.diagnostics_btn = self.create_header_btn("fa5s.stopwatch")
+            self.diagnostics_btn.setToolTip("Database diagnostics")
+            hr_layout.addWidget(self.diagnostics_btn)
         hr_layout.addWidget(search_btn)
         hr_layout.addWidget(bell_btn)
         hr_layout.addWidget(profile_btn)
@@ -1251,59 +2040,73 @@ class Dashboard(QWidget):
         self.stacked_widget = QStackedWidget()
         content_area.addWidget(self.stacked_widget)
         
-        # 1. Dashboard View
-        self.dashboard_view_widget = DashboardView(self.conn, self)
-        self.stacked_widget.addWidget(self.dashboard_view_widget)
-
-        # 2. Add Expense View
-        self.add_expense_widget = AddExpenseView(self)
-        self.add_expense_widget.expense_added.connect(self.add_expense)
-        self.stacked_widget.addWidget(self.add_expense_widget)
-
-        # 3. View Expenses View
-        self.view_expenses_widget = ViewExpensesView(self)
-        self.view_expenses_widget.star_toggled.connect(self.toggle_star)
-        self.view_expenses_widget.expense_deleted.connect(self.delete_expense)
-        self.stacked_widget.addWidget(self.view_expenses_widget)
-        
-        # 4. Cards View
-        self.cards_view_widget = CardsView(self)
-        self.stacked_widget.addWidget(self.cards_view_widget)
-        
-        # 5. Starred View
-        self.starred_view_widget = StarredView(self)
-        self.stacked_widget.addWidget(self.starred_view_widget)
-        
-        # 6. Graphs View
-        self.graphs_view_widget = GraphsView(self.conn, self) # Pass connection to GraphsView
-        self.stacked_widget.addWidget(self.graphs_view_widget)
-
-        # 7. Settings View
-        self.settings_view_widget = SettingsView(self)
-        self.settings_view_widget.settings_changed.connect(self.apply_settings)
-        self.settings_view_widget.clear_all_requested.connect(self.clear_database)
-        self.settings_view_widget.backup_requested.connect(self.perform_cloud_backup)
-        self.stacked_widget.addWidget(self.settings_view_widget)
-        
-        # 8. Gemini Assist View
-        self.gemini_assist_view_widget = GeminiAssistView(self)
-        self.stacked_widget.addWidget(self.gemini_assist_view_widget)
+        # Views are built the first time they are shown; see view()
+        self.views = {}
+        self.view_factories = {
+            "dashboard": lambda: DashboardView(self.service, self, self.snapshot),
+            "add": self.create_add_expense_view,
+            "expenses": self.create_view_expenses_view,
+            "cards": lambda: CardsView(self),
+            "starred": self.create_starred_view,
+            "graphs": lambda: GraphsView(self.service, self, self.snapshot), # Graph data is loaded on the database worker
+            "settings": self.create_settings_view,
+            "gemini": lambda: GeminiAssistView(self),
+        }
+        if instrumentation.enabled():
+            self.view_factories["diagnostics"] = lambda: DiagnosticsView(self)
+            self.diagnostics_btn.clicked.connect(lambda: self.show_view("diagnostics"))
 
         # Set initial view
-        self.stacked_widget.setCurrentWidget(self.dashboard_view_widget)
+        self.show_view("dashboard")
+        self.startup_timer = StartupTimer(self.view("dashboard"), self.launched_at, parent=self)
 
         # Connect navigation buttons to switch views
-        self.btn_dash.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.dashboard_view_widget))
-        self.btn_add.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.add_expense_widget))
-        self.btn_star.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.starred_view_widget))
-        self.btn_graphs.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.graphs_view_widget))
-        self.btn_cards.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.view_expenses_widget)) # Now shows expenses list
-        self.btn_settings.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.settings_view_widget))
-        self.btn_gemini.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.gemini_assist_view_widget))
+        self.btn_dash.clicked.connect(lambda: self.show_view("dashboard"))
+        self.btn_add.clicked.connect(lambda: self.show_view("add"))
+        self.btn_star.clicked.connect(lambda: self.show_view("starred"))
+        self.btn_graphs.clicked.connect(lambda: self.show_view("graphs"))
+        self.btn_cards.clicked.connect(lambda: self.show_view("expenses")) # Now shows expenses list
+        self.btn_settings.clicked.connect(lambda: self.show_view("settings"))
+        self.btn_gemini.clicked.connect(lambda: self.show_view("gemini"))
 
 
         main_layout.addLayout(content_area)
 
+    def view(self, name):
+        """Return the named view, building it and adding it to the stack on first use."""
+        widget = self.views.get(name)
+        if widget is None:
+            widget = self.views[name] = self.view_factories[name]()
+            self.stacked_widget.addWidget(widget)
+        return widget
+
+    def show_view(self, name):
+        self.stacked_widget.setCurrentWidget(self.view(name))
+
+    def create_add_expense_view(self):
+        view = AddExpenseView(self)
+        view.expense_added.connect(self.add_expense)
+        return view
+
+    def create_view_expenses_view(self):
+        view = ViewExpensesView(self.service, self)
+        view.star_toggled.connect(self.toggle_star)
+        view.expense_deleted.connect(self.delete_expense)
+        view.refresh()
+        return view
+
+    def create_starred_view(self):
+        view = StarredView(self.service, self)
+        view.refresh()
+        return view
+
+    def create_settings_view(self):
+        view = SettingsView(self.config, self) # Saving notifies apply_settings through the config service
+        view.clear_all_requested.connect(self.clear_database)
+        view.backup_requested.connect(self.perform_cloud_backup)
+        view.import_requested.connect(self.import_expenses)
+        return view
+
     def create_header_btn(self, icon_name):
         btn = QPushButton()
         btn.setIcon(qta.icon(icon_name, color='white'))
@@ -1341,7 +2144,9 @@ class Dashboard(QWidget):
         return target
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    if instrumentation.enabled():
+        instrumentation.instrument(database) # Before any connection is opened, so every one is traced
+    app = create_application(sys.argv)
     window = Dashboard()
     window.show()
     sys.exit(app.exec_())
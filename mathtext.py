@@ -0,0 +1,196 @@
+import re
+from html import escape
+
+# TeX commands drawn as a single character
+SYMBOLS = {
+    "alpha": "α", "beta": "β", "gamma": "γ", "delta": "δ", "epsilon": "ε", "varepsilon": "ε",
+    "zeta": "ζ", "eta": "η", "theta": "θ", "iota": "ι", "kappa": "κ", "lambda": "λ", "mu": "μ",
+    "nu": "ν", "xi": "ξ", "pi": "π", "rho": "ρ", "sigma": "σ", "tau": "τ", "upsilon": "υ",
+    "phi": "φ", "varphi": "φ", "chi": "χ", "psi": "ψ", "omega": "ω",
+    "Gamma": "Γ", "Delta": "Δ", "Theta": "Θ", "Lambda": "Λ", "Xi": "Ξ", "Pi": "Π",
+    "Sigma": "Σ", "Phi": "Φ", "Psi": "Ψ", "Omega": "Ω",
+    "times": "×", "cdot": "·", "div": "÷", "pm": "±", "mp": "∓", "ast": "∗",
+    "le": "≤", "leq": "≤", "ge": "≥", "geq": "≥", "ne": "≠", "neq": "≠", "approx": "≈",
+    "sim": "∼", "equiv": "≡", "propto": "∝", "ll": "≪", "gg": "≫",
+    "to": "→", "rightarrow": "→", "leftarrow": "←", "Rightarrow": "⇒", "Leftarrow": "⇐",
+    "leftrightarrow": "↔", "Leftrightarrow": "⇔", "mapsto": "↦",
+    "sum": "∑", "prod": "∏", "int": "∫", "infty": "∞", "partial": "∂", "nabla": "∇",
+    "in": "∈", "notin": "∉", "subset": "⊂", "subseteq": "⊆", "cup": "∪", "cap": "∩",
+    "forall": "∀", "exists": "∃", "emptyset": "∅", "neg": "¬", "land": "∧", "lor": "∨",
+    "ldots": "…", "cdots": "⋯", "dots": "…", "circ": "∘", "degree": "°", "prime": "′",
+    "%": "%", "$": "$", "&": "&", "#": "#", "_": "_", "{": "{", "}": "}",
+    "lbrace": "{", "rbrace": "}", "langle": "⟨", "rangle": "⟩", "|": "‖",
+}
+# TeX commands drawn as a space
+SPACES = {",": "&#8201;", ":": "&#8197;", ";": "&#8196;", "!": "", " ": " ", "quad": "&#8195;",
+          "qquad": "&#8195;&#8195;"}
+# Operator names set upright, as TeX does
+OPERATORS = {"log", "ln", "exp", "sin", "cos", "tan", "min", "max", "lim", "det", "mod", "gcd", "avg"}
+# Commands that only change TeX's sizing or spacing; their argument is drawn as is
+IGNORED = {"left", "right", "big", "Big", "bigg", "Bigg", "displaystyle", "textstyle", "limits"}
+# Commands whose single argument is drawn upright, or bold
+TEXT_COMMANDS = {"text", "mathrm", "textrm", "operatorname", "mbox", "textit", "mathit"}
+BOLD_COMMANDS = {"textbf", "mathbf", "boldsymbol"}
+# Accents drawn as a combining character after their argument
+ACCENTS = {"hat": "\u0302", "widehat": "\u0302", "tilde": "\u0303", "widetilde": "\u0303",
+           "vec": "\u20d7", "dot": "\u0307", "ddot": "\u0308"}
+
+_COMMAND = re.compile(r"\\([A-Za-z]+|.)")
+
+# Code first, so dollar signs inside code are left alone. Inline $...$ needs a
+# non-space after the opening and before the closing dollar, and no digit right
+# after the closing one: "$5 and $10" stays money.
+_MATH = re.compile(
+    r"(?P<fence>^(?:```|~~~).*?(?:^(?:```|~~~)[ \t]*$|\Z))"
+    r"|(?P<code>(`+).+?\3)"
+    r"|\$\$(?P<display>.+?)\$\$"
+    r"|\\\[(?P<bracket>.+?)\\\]"
+    r"|\\\((?P<paren>.+?)\\\)"
+    r"|(?<![\\$\w])\$(?P<inline>[^\s$](?:[^$\n]*?[^\s$\\])?)\$(?!\d)",
+    re.DOTALL | re.MULTILINE)
+
+# Placeholders are private-use characters, which markdown passes through untouched
+_PLACEHOLDER = "\ue000{}\ue001"
+_PLACEHOLDER_RE = re.compile("\ue000(\\d+)\ue001")
+_ALONE_RE = re.compile("<p>\ue000(\\d+)\ue001</p>")
+
+
+class _TexReader:
+    """Turns a small, common subset of TeX into HTML that QTextBrowser can show."""
+    def __init__(self, tex):
+        self.tex = tex
+        self.position = 0
+
+    def render(self, stop=None):
+        html = []
+        while self.position < len(self.tex):
+            char = self.tex[self.position]
+            if char == stop:
+                self.position += 1
+                break
+            html.append(self.atom())
+        return "".join(html)
+
+    def argument(self):
+        """One braced group or single character (or command), as HTML."""
+        while self.position < len(self.tex) and self.tex[self.position] == " ":
+            self.position += 1
+        if self.position >= len(self.tex):
+            return ""
+        if self.tex[self.position] == "{":
+            self.position += 1
+            return self.render("}")
+        return self.atom()
+
+    def raw_argument(self):
+        """One braced group as plain text, for \\text{...}."""
+        if self.tex.startswith("{", self.position):
+            end = self.tex.find("}", self.position)
+            end = len(self.tex) if end < 0 else end
+            text = self.tex[self.position + 1:end]
+            self.position = end + 1
+            return escape(text)
+        return self.argument()
+
+    def atom(self):
+        char = self.tex[self.position]
+        if char == "{":
+            self.position += 1
+            return self.render("}")
+        if char == "^":
+            self.position += 1
+            return f"<sup>{self.argument()}</sup>"
+        if char == "_":
+            self.position += 1
+            return f"<sub>{self.argument()}</sub>"
+        if char == "\\":
+            return self.command()
+        if char == "~":
+            self.position += 1
+            return "&nbsp;"
+        self.position += 1
+        return escape(char)
+
+    def command(self):
+        match = _COMMAND.match(self.tex, self.position)
+        if match is None: # A trailing backslash
+            self.position += 1
+            return "\\"
+        self.position = match.end()
+        name = match.group(1)
+        if name in SYMBOLS:
+            return escape(SYMBOLS[name])
+        if name in SPACES:
+            return SPACES[name]
+        if name in OPERATORS:
+            return f'<span style="font-style: normal">{name}</span>&#8201;'
+        if name in IGNORED:
+            return ""
+        if name == "\\":
+            return "<br>"
+        if name in ("frac", "dfrac", "tfrac"):
+            numerator = self.argument()
+            denominator = self.argument()
+            return f"<sup>{numerator}</sup>&#8260;<sub>{denominator}</sub>"
+        if name == "sqrt":
+            return f'√<span style="text-decoration: overline">{self.argument()}</span>'
+        if name in ("bar", "overline"):
+            return f'<span style="text-decoration: overline">{self.argument()}</span>'
+        if name in ACCENTS:
+            return self.argument() + ACCENTS[name]
+        if name in TEXT_COMMANDS:
+            return f'<span style="font-style: normal">{self.raw_argument()}</span>'
+        if name in BOLD_COMMANDS:
+            return f"<b>{self.argument()}</b>"
+        return escape("\\" + name) # Unknown commands are shown as written
+
+
+def tex_to_html(tex, display=False):
+    """
+    Render a TeX formula as HTML with Unicode symbols, superscripts and
+    subscripts. Only a common subset is understood; anything else is shown as
+    written, so an answer never fails to render.
+    """
+    html = f"<i>{_TexReader(tex.strip()).render()}</i>"
+    if display:
+        return f'<p align="center">{html}</p>'
+    return html
+
+
+def protect_math(text):
+    """
+    Replace the formulas in markdown text with placeholders, so markdown does
+    not eat their backslashes, underscores and asterisks.
+    :return: (text with placeholders, list of rendered formulas)
+    """
+    formulas = []
+    def replace(match):
+        if match.group("fence") is not None or match.group("code") is not None:
+            return match.group(0)
+        display = match.group("display") is not None or match.group("bracket") is not None
+        tex = match.group("display") or match.group("bracket") or match.group("paren") or match.group("inline")
+        formulas.append(tex_to_html(tex, display))
+        return _PLACEHOLDER.format(len(formulas) - 1)
+    return _MATH.sub(replace, text), formulas
+
+
+def restore_math(html, formulas):
+    """Put the rendered formulas back in place of their placeholders."""
+    def alone(match):
+        formula = formulas[int(match.group(1))]
+        # A displayed formula is its own paragraph, not nested in another one
+        return formula if formula.startswith("<p") else f"<p>{formula}</p>"
+    html = _ALONE_RE.sub(alone, html)
+    return _PLACEHOLDER_RE.sub(lambda m: formulas[int(m.group(1))], html)
+
+
+def markdown_renderer(render):
+    """
+    Wrap a markdown-to-HTML function so formulas are drawn locally with
+    tex_to_html instead of by MathJax.
+    :param render: markdown text -> HTML, e.g. MarkdownIt().render
+    """
+    def render_with_math(text):
+        text, formulas = protect_math(text)
+        return restore_math(render(text), formulas)
+    return render_with_math
@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import date
+
+# Bump when the layout of the snapshot changes; older files are ignored
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_path(db_file):
+    """The snapshot lives next to the database it describes."""
+    return db_file + ".snapshot.json"
+
+
+def database_key(db_file):
+    """
+    Identify the database's on-disk state by modification time and size of the
+    file and of its WAL. Any commit from any process changes one of them.
+    (PRAGMA data_version would only detect changes while a connection stays open.)
+    :return: list of [mtime_ns, size] pairs, None for a missing file
+    """
+    key = []
+    for path in (db_file, db_file + "-wal"):
+        try:
+            stat = os.stat(path)
+            key.append([stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            key.append(None)
+    return key
+
+
+def empty_snapshot():
+    return {"stats": None, "graphs": {}}
+
+
+def load_snapshot(db_file, today=None):
+    """
+    Read the values saved by save_snapshot, if they still describe the database.
+    A snapshot is discarded when the database changed since it was written, or
+    when it was taken on another day (the today/this-month totals depend on it).
+    :return: dict with 'stats' (get_dashboard_stats result or None) and 'graphs'
+        (graph type -> summary rows)
+    """
+    try:
+        with open(snapshot_path(db_file), "r") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return empty_snapshot()
+    today = today or date.today()
+    if (not isinstance(saved, dict) or saved.get("version") != SNAPSHOT_VERSION
+            or saved.get("key") != database_key(db_file) or saved.get("day") != today.isoformat()):
+        return empty_snapshot()
+    snapshot = empty_snapshot()
+    snapshot["stats"] = saved.get("stats")
+    snapshot["graphs"] = saved.get("graphs") or {}
+    return snapshot
+
+
+def save_snapshot(db_file, snapshot, today=None):
+    """
+    Write the snapshot atomically, keyed by the database's current state.
+    Call it once every connection is closed: closing the last connection
+    checkpoints the WAL, which would otherwise change the key after the fact.
+    """
+    today = today or date.today()
+    saved = {
+        "version": SNAPSHOT_VERSION,
+        "key": database_key(db_file),
+        "day": today.isoformat(),
+        "stats": snapshot.get("stats"),
+        "graphs": snapshot.get("graphs") or {},
+    }
+    path = snapshot_path(db_file)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(saved, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(e)
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+
+# Must be set before Qt is imported anywhere
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# The app is a set of top-level modules next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import database
+from benchmarks.ledger import build_ledger, remove_database
+
+LEDGER_ROWS = 2000
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    """Path of a migrated database holding a small synthetic ledger."""
+    path, _ = build_ledger(LEDGER_ROWS, path=str(tmp_path / "ledger.db"))
+    yield path
+    remove_database(path)
+
+
+@pytest.fixture
+def conn(ledger):
+    """Writable connection to the `ledger` database."""
+    conn = database.create_connection(ledger)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def empty_conn(tmp_path):
+    """Writable connection to a migrated, empty database."""
+    path = str(tmp_path / "empty.db")
+    database.main(path)
+    conn = database.create_connection(path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """The QApplication, created the way main.py does; skipped without the GUI dependencies."""
+    main = pytest.importorskip("main")
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or main.create_application(["tests"])
+
+
+@pytest.fixture
+def wait_for(qapp):
+    """Spin the Qt event loop until predicate() holds, failing after `timeout` seconds."""
+    from PyQt5.QtCore import QEventLoop
+
+    def wait_for(predicate, timeout=10):
+        started = time.perf_counter()
+        while not predicate():
+            assert time.perf_counter() - started < timeout, "timed out waiting for the event loop"
+            qapp.processEvents(QEventLoop.AllEvents, 5)
+    return wait_for
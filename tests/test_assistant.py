@@ -0,0 +1,119 @@
+import random
+import time
+
+import pytest
+
+import assistant
+
+MARKDOWN_SAMPLES = [
+    "".join(assistant.STUB_CHUNKS),
+    "- a\n\n- b\n\nafter\n",
+    "1. one\n\n2. two\n\n3. three\n",
+    "```\ncode\n\nmore\n```\n\ntext\n",
+    "para\n\n    indented code\n\n    more code\n",
+    "- item\n\n  continued paragraph\n\n> quote\n\n> more\n",
+    "# Title\nline\n---\n| a | b |\n|---|---|\n| 1 | 2 |\n\nend",
+]
+
+
+def run_request(model, timeout=10, on_chunk=None):
+    """Run an AssistantRequest on this thread; signals are delivered directly."""
+    request = assistant.AssistantRequest(lambda: model, lambda: "prompt", timeout)
+    events = []
+    request.chunk_received.connect(lambda text: events.append(("chunk", text)))
+    request.finished.connect(lambda text: events.append(("finished", text)))
+    request.failed.connect(lambda message: events.append(("failed", message)))
+    if on_chunk is not None:
+        request.chunk_received.connect(lambda text: on_chunk(request, events))
+    request.deadline = time.monotonic() + timeout # What start() sets before starting the thread
+    request.run()
+    return request, events
+
+
+def test_chunks_stream_in_order():
+    chunks = [f"part {i} " for i in range(10)]
+    _, events = run_request(assistant.StubModel(chunks, delay=0))
+    assert events == [("chunk", text) for text in chunks] + [("finished", "".join(chunks))]
+
+
+def test_cancel_stops_the_stream():
+    def cancel_after_three(request, events):
+        if len(events) == 3:
+            request.cancel()
+    _, events = run_request(assistant.StubModel([str(i) for i in range(10)], delay=0), on_chunk=cancel_after_three)
+    assert events == [("chunk", "0"), ("chunk", "1"), ("chunk", "2")] # Neither finished nor failed
+
+
+def test_timeout_fails_the_request():
+    request, events = run_request(assistant.StubModel(["slow "] * 50, delay=0.02), timeout=0.1)
+    assert events[-1][0] == "failed" and "0.1 seconds" in events[-1][1]
+    assert 0 < len([event for event in events if event[0] == "chunk"]) < 50
+    assert request.cancelled.is_set()
+
+
+def test_expire_fails_once_and_silences_the_request():
+    request = assistant.AssistantRequest(lambda: assistant.StubModel(delay=0), lambda: "prompt", 5)
+    events = []
+    request.finished.connect(lambda text: events.append("finished"))
+    request.failed.connect(lambda message: events.append("failed"))
+    request.expire()
+    request.expire()
+    request.deadline = time.monotonic() + 5
+    request.run()
+    assert events == ["failed"]
+
+
+@pytest.mark.parametrize("text", MARKDOWN_SAMPLES)
+def test_incremental_markdown_matches_one_shot_render(text):
+    md = assistant.IncrementalMarkdown()
+    expected = md.render(text)
+    rng = random.Random(text)
+    for _ in range(20):
+        md.reset()
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, 12)
+            html = md.feed(text[position:position + size])
+            position += size
+        assert html == expected
+        assert md.finish() == expected
+
+
+def context_source():
+    monthly = [(f"{year}-{month:02d}", 100.0 + month) for year in range(2015, 2025) for month in range(1, 13)]
+    categories = [(f"Category {i}", 1000.0 - 10 * i) for i in range(20)]
+    yearly = [(str(year), 1278.0) for year in range(2015, 2025)]
+    return monthly, categories, yearly
+
+
+def period_total(context):
+    section = context.text.split("Expense summary by category:")[0]
+    return round(sum(float(line.rsplit("$", 1)[1]) for line in section.splitlines() if line.startswith("- ")), 2)
+
+
+@pytest.mark.parametrize("budget", [2000, 700, 400, 150, 60])
+def test_context_fits_the_budget_and_keeps_the_total(budget):
+    context = assistant.ContextBuilder(budget).compose(context_source())
+    assert context.tokens == assistant.estimate_tokens(context.text) <= budget
+    assert period_total(context) == 12780.0
+    assert "over budget" not in context.describe()
+
+
+def test_yearly_list_goes_before_any_period_detail():
+    full = assistant.ContextBuilder(10000).compose(context_source())
+    assert "by year:" in full.text
+    context = assistant.ContextBuilder(full.tokens - 1).compose(context_source())
+    assert "by year:" not in context.text
+    assert context.detail == full.detail == "monthly from 2015-01"
+
+
+def test_oldest_periods_are_summed_last():
+    context = assistant.ContextBuilder(60).compose(context_source())
+    assert "periods summed" in context.detail
+    assert "- before " in context.text
+
+
+def test_overflow_is_reported():
+    context = assistant.ContextBuilder(10).compose(context_source())
+    assert context.tokens > 10
+    assert f"over budget by {context.tokens - 10} tokens" in context.describe()
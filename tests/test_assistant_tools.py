@@ -0,0 +1,90 @@
+import sqlite3
+import time
+
+import pytest
+
+import assistant
+import assistant_tools
+import database
+
+
+@pytest.fixture
+def reader(ledger):
+    """Read-only connection to the `ledger` database, as the answer view's tools use."""
+    conn = database.create_connection(ledger, read_only=True)
+    yield conn
+    conn.close()
+
+
+def run_calls(reader, calls):
+    """Have the stub model make `calls` through call_tool; returns the (name, result) pairs it got back."""
+    model = assistant.StubModel(delay=0, calls=calls)
+    request = assistant.AssistantRequest(lambda: model, lambda: "prompt", 10,
+                                         tool_runner=lambda name, args: assistant_tools.call_tool(reader, name, args))
+    events = []
+    request.finished.connect(lambda text: events.append("finished"))
+    request.failed.connect(lambda message: events.append(message))
+    request.deadline = time.monotonic() + 10
+    request.run()
+    assert events == ["finished"]
+    assert len(model.tool_results) == 1
+    return model.tool_results[0]
+
+
+def test_results_match_the_ledger(reader):
+    results = run_calls(reader, [
+        ("sum_expenses", {"category": "Food"}),
+        ("largest_expenses", {"limit": 3.0}),
+        ("list_categories", {}),
+    ])
+    total, count = reader.execute("SELECT SUM(amount_cents) / 100.0, COUNT(*) FROM expenses "
+                                  "JOIN categories ON categories.id = category_id WHERE name = 'Food'").fetchone()
+    assert results[0] == ("sum_expenses", {"total": round(total, 2), "count": count})
+    largest = reader.execute("SELECT amount_cents / 100.0 FROM expenses ORDER BY amount_cents DESC, id DESC LIMIT 3")
+    assert [expense["amount"] for expense in results[1][1]["expenses"]] == [row[0] for row in largest]
+    assert results[2] == ("list_categories", {"categories": database.get_categories(reader), "truncated": False})
+
+
+def test_unknown_tools_are_refused(reader):
+    (name, result), = run_calls(reader, [("execute_sql", {"sql": "DELETE FROM expenses"})])
+    assert name == "execute_sql" and result["error"].startswith("Unknown tool 'execute_sql'")
+    assert reader.execute("SELECT COUNT(*) FROM expenses").fetchone()[0] > 0
+
+
+def test_rows_are_capped(reader):
+    results = dict(run_calls(reader, [
+        ("largest_expenses", {"limit": 1000}),
+        ("period_totals", {"period": "month"}),
+    ]))
+    assert len(results["largest_expenses"]["expenses"]) == assistant_tools.MAX_TOOL_ROWS
+    periods = results["period_totals"]
+    assert len(periods["periods"]) == assistant_tools.MAX_TOOL_ROWS and periods["truncated"]
+    assert periods["periods"][-1]["month"] == database.get_monthly_summary(reader)[-1][0]
+
+
+def test_slow_queries_are_interrupted(reader):
+    result = assistant_tools.call_tool(reader, "largest_expenses", {}, time_limit=0)
+    assert result == {"error": "The query took longer than 0 seconds; narrow the date range."}
+    # The progress handler is gone afterwards
+    assert "expenses" in assistant_tools.call_tool(reader, "largest_expenses", {"limit": 1})
+
+
+@pytest.mark.parametrize("name, args", [
+    ("sum_expenses", {"category": ["Food"]}),
+    ("sum_expenses", {"start": 20240101}),
+    ("period_totals", {"period": ["month"]}),
+    ("largest_expenses", {"limit": "5"}),
+    ("largest_expenses", {"limit": 2.5}),
+    ("category_totals", {"limit": True}),
+])
+def test_wrong_types_are_refused(reader, name, args):
+    (_, result), = run_calls(reader, [(name, args)])
+    assert set(result) == {"error"} and "must be" in result["error"]
+
+
+def test_database_errors_are_returned_to_the_model(reader, monkeypatch):
+    def broken(conn):
+        raise sqlite3.DatabaseError("database disk image is malformed")
+    monkeypatch.setattr(database, "get_categories", broken)
+    assert run_calls(reader, [("list_categories", {})]) == [
+        ("list_categories", {"error": "database disk image is malformed"})]
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+import database
+from benchmarks.ledger import generate_expenses
+
+
+def rollups(conn):
+    return conn.execute("SELECT month, category_id, total_cents, count FROM expense_rollups "
+                        "ORDER BY month, category_id").fetchall()
+
+
+def trigger_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+
+def schema_changes(conn):
+    return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+
+def test_bulk_insert_keeps_rollups_and_search_in_sync(empty_conn):
+    expenses = list(generate_expenses(1200, seed=3))
+    assert database.add_expenses_bulk(empty_conn, expenses, batch_size=500) == 1200
+    bulk = rollups(empty_conn)
+    database.rebuild_rollups(empty_conn)
+    assert rollups(empty_conn) == bulk
+    assert database.search_expenses(empty_conn, "coffee")
+    assert set(database.BULK_DEFERRED_TRIGGERS) <= trigger_names(empty_conn)
+
+
+def test_triggers_are_swapped_once_per_call(empty_conn):
+    before = schema_changes(empty_conn)
+    database.add_expenses_bulk(empty_conn, generate_expenses(100, seed=1), batch_size=100)
+    one_batch = schema_changes(empty_conn) - before
+
+    before = schema_changes(empty_conn)
+    database.add_expenses_bulk(empty_conn, generate_expenses(1000, seed=2), batch_size=100)
+    assert schema_changes(empty_conn) - before == one_batch
+
+
+def test_open_transaction_is_refused(empty_conn):
+    database.add_expense(empty_conn, ("2024-01-01", "Food", 5.0, "caller's work", 0))
+    assert empty_conn.in_transaction
+    with pytest.raises(sqlite3.Error, match="open transaction"):
+        database.add_expenses_bulk(empty_conn, generate_expenses(10))
+    empty_conn.rollback()
+    assert empty_conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0] == 0
+
+
+def test_failed_batch_rolls_back_alone_and_restores_triggers(empty_conn):
+    good = list(generate_expenses(10, seed=4))
+    bad = [("2024-01-01", "Food", None, "no amount", 0)] # amount_cents is NOT NULL
+    with pytest.raises(sqlite3.IntegrityError):
+        database.add_expenses_bulk(empty_conn, good + bad, batch_size=10)
+    assert empty_conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0] == 10
+    assert set(database.BULK_DEFERRED_TRIGGERS) <= trigger_names(empty_conn)
+    database.add_expense(empty_conn, ("2024-01-02", "Food", 5.0, "after", 0), commit=True)
+    bulk = rollups(empty_conn)
+    database.rebuild_rollups(empty_conn)
+    assert rollups(empty_conn) == bulk
+
+
+def test_migrate_restores_triggers_left_by_a_crash(empty_conn):
+    for name in database.BULK_DEFERRED_TRIGGERS:
+        empty_conn.execute(f"DROP TRIGGER {name}")
+    empty_conn.commit()
+    database.migrate(empty_conn)
+    assert set(database.BULK_DEFERRED_TRIGGERS) <= trigger_names(empty_conn)
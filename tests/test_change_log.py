@@ -0,0 +1,136 @@
+import pytest
+
+import database
+from benchmarks.ledger import generate_expenses
+
+
+@pytest.fixture
+def logged(conn):
+    """The `conn` ledger with the change log on and nothing logged yet."""
+    database.enable_change_log(conn)
+    assert database.take_changes(conn) is None
+    return conn
+
+
+def expense(conn, expense_id):
+    return database.get_expenses_by_ids(conn, [expense_id])[0]
+
+
+def test_edits_are_reported_with_current_rows(logged):
+    starred, moved, deleted = [row[0] for row in database.get_all_expenses(logged)[:3]]
+    new_id = database.add_expense(logged, ("2024-01-01", "Food", 5.0, "new", 0))
+    database.update_expense_star(logged, starred, 1, commit=False)
+    logged.execute("UPDATE expenses SET amount_cents = amount_cents + 100 WHERE id = ?", (moved,))
+    database.delete_expense(logged, deleted, commit=True)
+    changes = database.take_changes(logged)
+    assert changes["inserted"] == [expense(logged, new_id)]
+    assert sorted(changes["updated"]) == sorted([expense(logged, starred), expense(logged, moved)])
+    assert changes["deleted"] == [deleted]
+    assert changes["totals_changed"] and not changes["reset"]
+    assert database.take_changes(logged) is None
+
+
+def test_star_edits_leave_the_totals_alone(logged):
+    expense_id = database.get_all_expenses(logged)[0][0]
+    database.update_expense_star(logged, expense_id, 1)
+    changes = database.take_changes(logged)
+    assert changes["updated"] == [expense(logged, expense_id)] and not changes["totals_changed"]
+
+
+def test_insert_then_delete_cancels_out(logged):
+    expense_id = database.add_expense(logged, ("2024-01-01", "Food", 5.0, "gone", 0))
+    logged.execute("UPDATE expenses SET description = 'still gone' WHERE id = ?", (expense_id,))
+    database.delete_expense(logged, expense_id)
+    changes = database.take_changes(logged)
+    assert (changes["inserted"], changes["updated"], changes["deleted"]) == ([], [], [])
+
+
+def test_insert_then_update_is_an_insert_of_the_final_row(logged):
+    expense_id = database.add_expense(logged, ("2024-01-01", "Food", 5.0, "draft", 0))
+    logged.execute("UPDATE expenses SET description = 'final' WHERE id = ?", (expense_id,))
+    logged.commit()
+    changes = database.take_changes(logged)
+    assert changes["inserted"] == [expense(logged, expense_id)] and changes["inserted"][0][4] == "final"
+    assert changes["updated"] == []
+
+
+def test_delete_then_insert_of_the_same_id_is_an_update(logged):
+    row = database.get_all_expenses(logged)[0]
+    database.delete_expense(logged, row[0], commit=False)
+    logged.execute("INSERT INTO expenses(id, day, category_id, amount_cents, description, starred) "
+                   "SELECT ?, 0, id, 100, 'replaced', 0 FROM categories LIMIT 1", (row[0],))
+    logged.commit()
+    changes = database.take_changes(logged)
+    assert changes["updated"] == [expense(logged, row[0])]
+    assert (changes["inserted"], changes["deleted"]) == ([], [])
+
+
+def test_more_changes_than_the_limit_are_a_reset(logged, monkeypatch):
+    monkeypatch.setattr(database, "CHANGE_LOG_LIMIT", 5)
+    for amount in range(5):
+        database.add_expense(logged, ("2024-01-01", "Food", amount + 1.0, "", 0))
+    logged.commit()
+    changes = database.take_changes(logged)
+    assert len(changes["inserted"]) == 5 and not changes["reset"]
+
+    for amount in range(6):
+        database.add_expense(logged, ("2024-01-01", "Food", amount + 1.0, "", 0))
+    logged.commit()
+    changes = database.take_changes(logged)
+    assert changes["reset"] and changes["totals_changed"] and changes["inserted"] == []
+    assert database.take_changes(logged) is None
+
+
+def test_bulk_insert_is_a_reset(logged):
+    database.add_expenses_bulk(logged, generate_expenses(3, seed=9))
+    changes = database.take_changes(logged)
+    assert changes["reset"]
+
+
+def loaded_window(ledger, loaded_until):
+    """A fresh keyset load of everything from the newest expense down to `loaded_until`."""
+    conn = database.create_connection(ledger, read_only=True)
+    try:
+        rows = [row for page in database.iter_expenses(conn) for row in page]
+    finally:
+        conn.close()
+    return [row for row in rows if (row[1], row[0]) >= loaded_until]
+
+
+def test_model_applies_changes_like_a_fresh_load(ledger, wait_for):
+    from db_service import DatabaseService
+    from main import ExpenseTableModel
+
+    service = DatabaseService(ledger)
+    service.start()
+    try:
+        model = ExpenseTableModel(service)
+        model.refresh()
+        for pages in (1, 2):
+            model.fetchMore()
+            wait_for(lambda: len(model.rows) == pages * model.PAGE_SIZE)
+        rows = list(model.rows)
+        unloaded = service.call(database.get_all_expenses, timeout=10)
+        unloaded = [row for row in unloaded if (row[1], row[0]) < model.loaded_until]
+        middle_date = rows[300][1]
+
+        def edit(conn):
+            database.add_expense(conn, ("2099-01-01", "Food", 5.0, "newest", 0)) # Placed at the top
+            database.add_expense(conn, ("1990-01-01", "Food", 5.0, "oldest", 0)) # Left to the cursor
+            database.update_expense_star(conn, rows[10][0], 1, commit=False) # Updated in place
+            conn.execute("UPDATE expenses SET day = ? WHERE id = ?", (database.to_day(middle_date), rows[5][0]))
+            conn.execute("UPDATE expenses SET day = ? WHERE id = ?", (database.to_day("2099-06-01"), unloaded[0][0]))
+            conn.execute("UPDATE expenses SET day = ? WHERE id = ?", (database.to_day("1990-01-02"), rows[20][0]))
+            database.delete_expense(conn, rows[50][0], commit=False)
+            conn.commit()
+
+        applied = []
+        service.data_changed.connect(applied.append) # Connected after the model, so it runs second
+        service.submit(edit)
+        wait_for(lambda: applied)
+        assert not applied[0]["reset"]
+        assert model.rows == loaded_window(ledger, model.loaded_until)
+        assert [row[1] for row in model.rows[:2]] == ["2099-06-01", "2099-01-01"]
+        assert len(model.rows) == len(rows) # +2 at the top, -1 moved past the pages, -1 deleted
+    finally:
+        service.stop()
@@ -0,0 +1,167 @@
+import random
+
+import pytest
+
+import database
+
+charts = pytest.importorskip("charts")
+
+
+def day(text):
+    return database.to_day(text)
+
+
+def random_series(count, seed=0, first=0):
+    rng = random.Random(seed)
+    return [(first + i, rng.uniform(1, 100)) for i in range(count)]
+
+
+@pytest.mark.parametrize("columns", [10, 100, 400])
+def test_downsample_stays_within_twice_the_columns(columns):
+    series = charts.TimeSeries(random_series(20000))
+    points = series.downsample(0, 19999, columns)
+    assert len(points) <= 2 * columns + 4 # A point past each edge keeps the line running out of the plot
+    assert [point[0] for point in points] == sorted(point[0] for point in points)
+
+
+def test_downsample_keeps_single_day_spikes():
+    points = [(d, 10.0) for d in range(10000)]
+    points[1234] = (1234, 5000.0)
+    points[8765] = (8765, -300.0)
+    sampled = charts.TimeSeries(points).downsample(0, 9999, 50)
+    assert (1234, 5000.0) in sampled and (8765, -300.0) in sampled
+
+
+def test_downsample_returns_a_visible_range_that_fits_as_is():
+    series = charts.TimeSeries(random_series(1000))
+    assert series.downsample(100, 150, 200) == list(zip(series.days[99:152], series.amounts[99:152]))
+
+
+@pytest.mark.parametrize("text", ["2024-05-15", "2024-05-13", "2024-05-19", "1969-12-31", "1965-03-04", "1970-01-01"])
+def test_weeks_start_on_monday(text):
+    start = charts.bucket_start(day(text), "Weekly")
+    assert charts._to_date(start).weekday() == 0
+    assert 0 <= day(text) - start < 7
+
+
+def test_monthly_buckets_start_on_the_first():
+    assert database.from_day(charts.bucket_start(day("1969-02-17"), "Monthly")) == "1969-02-01"
+    assert database.from_day(charts.next_bucket(day("2023-12-01"), "Monthly")) == "2024-01-01"
+
+
+def test_empty_buckets_are_filled_with_zero():
+    series = [(day("2024-01-03"), 5.0), (day("2024-01-04"), 1.0), (day("2024-04-20"), 2.0)]
+    monthly = charts.bucket_series(series, "Monthly")
+    assert [(database.from_day(start), amount) for start, amount in monthly] == [
+        ("2024-01-01", 6.0), ("2024-02-01", 0.0), ("2024-03-01", 0.0), ("2024-04-01", 2.0)]
+    weekly = charts.bucket_series([(day("1969-12-29"), 1.0), (day("1970-01-20"), 2.0)], "Weekly")
+    assert [(database.from_day(start), amount) for start, amount in weekly] == [
+        ("1969-12-29", 1.0), ("1970-01-05", 0.0), ("1970-01-12", 0.0), ("1970-01-19", 2.0)]
+    assert charts.bucket_series([], "Weekly") == []
+
+
+def test_daily_buckets_fill_gaps_in_order():
+    buckets = charts.bucket_series([(10, 1.0), (13, 2.0)], "Daily")
+    assert buckets == [(10, 1.0), (11, 0.0), (12, 0.0), (13, 2.0)]
+
+
+def test_window_zoom_stops_at_the_minimum_and_the_extent():
+    window = charts.TimeWindow()
+    window.set_extent((0, 1000))
+    window.zoom(0.001, anchor=0.5)
+    assert window.end - window.start == charts.MIN_WINDOW_DAYS
+    assert window.start == pytest.approx(500 - charts.MIN_WINDOW_DAYS / 2)
+    window.zoom(1000)
+    assert (window.start, window.end) == (0, 1000) and not window.is_zoomed()
+
+
+def test_window_zoom_at_an_edge_stays_inside_the_extent():
+    window = charts.TimeWindow()
+    window.set_extent((0, 1000))
+    window.zoom(0.5, anchor=0.0)
+    assert (window.start, window.end) == (0, 500)
+    window.zoom(0.5, anchor=1.0)
+    assert (window.start, window.end) == (250, 500)
+
+
+def test_window_pan_is_clamped():
+    window = charts.TimeWindow()
+    window.set_extent((0, 1000))
+    window.zoom(0.1)
+    window.pan(100)
+    assert (window.start, window.end) == (900, 1000)
+    window.pan(-100)
+    assert (window.start, window.end) == (0, 100)
+
+
+def test_window_follows_growing_data_unless_zoomed():
+    window = charts.TimeWindow()
+    window.set_extent((0, 1000))
+    window.set_extent((0, 1200))
+    assert (window.start, window.end) == (0, 1200)
+    window.zoom(0.5, anchor=1.0)
+    window.set_extent((0, 500)) # Shrunk below the zoomed window
+    assert (window.start, window.end) == (0, 500)
+
+
+def category_rows(count):
+    return [(f"Category {i}", 100.0 - i) for i in range(count)]
+
+
+@pytest.mark.parametrize("count", [1, len(charts.PALETTE), len(charts.PALETTE) + 1, 30])
+def test_pie_slices_cover_the_circle(count):
+    slices = charts.pie_slices(category_rows(count))
+    assert len(slices) == min(count, len(charts.PALETTE))
+    assert sum(span for _, _, _, span in slices) == pytest.approx(-360.0)
+    assert slices[0][2] == 90.0 # Clockwise from 12 o'clock
+    for previous, following in zip(slices, slices[1:]):
+        assert following[2] == pytest.approx(previous[2] + previous[3])
+
+
+def test_pie_merges_the_smallest_categories_into_other():
+    rows = category_rows(12)
+    slices = charts.pie_slices(list(reversed(rows)) + [("Refunds", 0.0)])
+    limit = len(charts.PALETTE)
+    assert [name for name, *_ in slices] == [name for name, _ in rows[:limit - 1]] + ["Other"]
+    assert slices[-1][1] == pytest.approx(sum(amount for _, amount in rows[limit - 1:]))
+    assert charts.pie_slices([]) == []
+
+
+def test_stack_layers_are_cumulative_and_merge_other():
+    rows = []
+    for month in ("2024-01", "2024-02", "2024-03"):
+        rows.extend((month, f"Category {i}", float(i + 1) * (1 if month != "2024-02" else 0.5)) for i in range(12))
+    months, categories, layers = charts.stack_layers(rows)
+    assert months == ["2024-01", "2024-02", "2024-03"]
+    assert len(categories) == len(charts.PALETTE) and categories[-1] == "Other"
+    assert categories[0] == "Category 11" # Biggest at the bottom
+    for lower, upper in zip(layers, layers[1:]):
+        assert all(top >= below for below, top in zip(lower, upper))
+    assert layers[-1] == [pytest.approx(sum(amount for row_month, _, amount in rows if row_month == month)) for month in months]
+
+
+def test_stack_layers_fill_missing_months_with_zero():
+    months, categories, layers = charts.stack_layers([("2024-01", "Food", 5.0), ("2024-02", "Rent", 900.0)])
+    assert categories == ["Rent", "Food"]
+    assert layers == [[0.0, 900.0], [5.0, 900.0]]
+
+
+@pytest.mark.parametrize("today", ["2024-05-15", "2024-05-13", "2024-05-19", "1970-01-02"])
+def test_calendar_grid_is_53_weeks_from_a_monday(today):
+    today = day(today)
+    first = charts.calendar_start(today)
+    assert charts._to_date(first).weekday() == 0
+    cells = charts.calendar_cells([(today, 12.0), (first, 3.0), (first - 1, 99.0)], today)
+    assert cells[0] == (0, 0, first, 3.0)
+    assert cells[-1] == (charts.CALENDAR_WEEKS - 1, charts._to_date(today).weekday(), today, 12.0)
+    assert len(cells) == today - first + 1
+    assert all(charts._to_date(cell_day).weekday() == row for _, row, cell_day, _ in cells)
+    assert {column for column, *_ in cells} == set(range(charts.CALENDAR_WEEKS))
+
+
+def test_intensity_bands():
+    thresholds = charts.intensity_thresholds([0, 1, 2, 3, 4, 5, 6, 7, 8])
+    assert len(thresholds) == len(charts.HEATMAP_COLORS) - 2
+    assert charts.intensity(0, thresholds) == 0
+    assert [charts.intensity(amount, thresholds) for amount in (1, 8)] == [1, len(charts.HEATMAP_COLORS) - 1]
+    assert charts.intensity_thresholds([0, 0]) == []
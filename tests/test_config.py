@@ -0,0 +1,86 @@
+import json
+import math
+import os
+
+import pytest
+
+config_service = pytest.importorskip("config_service")
+
+
+@pytest.mark.parametrize("key, value, expected", [
+    ("GEMINI_TIMEOUT", 0.5, 1.0), # Raised to the minimum rather than truncated to 0
+    ("GEMINI_TIMEOUT", 90.5, 90.5),
+    ("GEMINI_TIMEOUT", "30", 30.0),
+    ("GEMINI_TIMEOUT", 0, 1.0),
+    ("GEMINI_TIMEOUT", -5, 1.0),
+    ("GEMINI_TIMEOUT", math.nan, 1.0),
+    ("GEMINI_TIMEOUT", "soon", config_service.DEFAULT_TIMEOUT),
+    ("GEMINI_CONTEXT_TOKENS", 2000.7, 2000),
+    ("GEMINI_CONTEXT_TOKENS", 10, 100),
+    ("GEMINI_CONTEXT_TOKENS", math.inf, config_service.DEFAULT_CONTEXT_TOKENS),
+    ("FONT_SIZE", None, 12),
+    ("GEMINI_WEB_ENGINE", "Yes", True),
+    ("GEMINI_WEB_ENGINE", 0, False),
+    ("GEMINI_MODEL", 5, "5"),
+    ("SOMETHING_NEWER", [1, 2], [1, 2]), # Unknown keys pass through untouched
+])
+def test_coerce(key, value, expected):
+    assert config_service.coerce(key, value) == expected
+
+
+def write_config(path, values):
+    with open(path, "w") as f:
+        json.dump(values, f)
+
+
+def read_config(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_update_merges_and_keeps_unknown_keys(qapp, tmp_path):
+    path = str(tmp_path / "config.json")
+    write_config(path, {"FONT_SIZE": 14, "FROM_A_NEWER_VERSION": "kept"})
+    config = config_service.ConfigService(path)
+    changes = []
+    config.changed.connect(changes.append)
+    config.update({"GEMINI_TIMEOUT": "45", "FONT_SIZE": 14})
+    assert read_config(path) == {"FONT_SIZE": 14, "FROM_A_NEWER_VERSION": "kept", "GEMINI_TIMEOUT": 45.0}
+    assert config.get("GEMINI_TIMEOUT") == 45.0 and config.get("LOGO_PATH") == ""
+    assert changes == [{"GEMINI_TIMEOUT"}]
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_failed_save_leaves_file_and_values_alone(qapp, tmp_path, monkeypatch):
+    path = str(tmp_path / "config.json")
+    write_config(path, {"FONT_SIZE": 14})
+    config = config_service.ConfigService(path)
+
+    def fail(source, target):
+        raise OSError("disk full")
+    monkeypatch.setattr(config_service.os, "replace", fail)
+    config.update({"FONT_SIZE": 20})
+    assert read_config(path) == {"FONT_SIZE": 14}
+    assert config.get("FONT_SIZE") == 14
+
+
+def test_outside_edits_are_reloaded(qapp, tmp_path, wait_for):
+    path = str(tmp_path / "config.json")
+    write_config(path, {"FONT_SIZE": 14})
+    config = config_service.ConfigService(path)
+    changes = []
+    config.changed.connect(changes.append)
+
+    # Replaced the way editors save, then written in place
+    write_config(path + ".new", {"FONT_SIZE": 16, "GEMINI_TIMEOUT": 0.1})
+    os.replace(path + ".new", path)
+    wait_for(lambda: config.get("FONT_SIZE") == 16)
+    assert config.get("GEMINI_TIMEOUT") == 1.0
+    write_config(path, {"FONT_SIZE": 18})
+    wait_for(lambda: config.get("FONT_SIZE") == 18)
+    assert changes[-1] == {"FONT_SIZE", "GEMINI_TIMEOUT"}
+
+    with open(path, "w") as f: # Half-written or broken JSON keeps the last good values
+        f.write("{")
+    config.reload()
+    assert config.get("FONT_SIZE") == 18
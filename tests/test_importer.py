@@ -0,0 +1,107 @@
+import threading
+
+import database
+import importer
+from db_service import DatabaseService
+
+
+def write_csv(path, rows):
+    with open(path, "w") as f:
+        f.write("date,category,amount,description\n")
+        for i in range(rows):
+            f.write(f"2024-01-{i % 28 + 1:02d},Food,{i + 1}.50,Item {i}\n")
+
+
+def write_lines(path, lines):
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def count(conn):
+    return conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+
+
+def test_file_import_runs_one_batch_per_call(empty_conn, tmp_path):
+    path = str(tmp_path / "bank.csv")
+    write_csv(path, 12)
+    job = importer.FileImport(path, batch_size=5)
+    assert job.import_batch(empty_conn) == 5
+    assert count(empty_conn) == 5 and not job.done
+    assert 0.0 < job.progress() <= 1.0
+    assert job.import_batch(empty_conn) == 10
+    assert job.import_batch(empty_conn) == 12
+    assert job.done and job.progress() == 1.0
+    assert count(empty_conn) == 12
+
+
+def test_rows_with_an_invalid_iso_date_are_skipped(empty_conn, tmp_path):
+    path = str(tmp_path / "bank.csv")
+    write_lines(path, ["date,category,amount,description",
+                       "2025-01-05,Food,12.50,Lunch",
+                       "2025-13-45,Food,3.00,Typo",
+                       "2025-01-07,Rent,950.00,January"])
+    assert importer.parse_date("2025-02-30") is None
+    assert importer.import_file(empty_conn, path) == 2
+    assert sorted(row[1] for row in database.get_all_expenses(empty_conn)) == ["2025-01-05", "2025-01-07"]
+
+
+def import_rows(tmp_path, lines):
+    path = str(tmp_path / "bank.csv")
+    write_lines(path, lines)
+    with open(path, newline="") as f:
+        return [(expense[0], expense[2]) for expense in importer.iter_csv_expenses(f)]
+
+
+def test_signed_amounts_skip_credits(tmp_path):
+    assert importer.parse_amount("-1,200.50") == -1200.5
+    assert import_rows(tmp_path, ["date,category,amount,description",
+                                  "2025-01-05,Food,-12.50,Lunch",
+                                  "2025-01-06,Income,2500.00,SALARY",
+                                  "2025-01-07,Rent,-950.00,January"]) == [
+        ("2025-01-05", 12.5), ("2025-01-07", 950.0)]
+
+
+def test_unsigned_amounts_are_all_expenses(tmp_path):
+    assert import_rows(tmp_path, ["date,category,amount,description",
+                                  "2025-01-05,Food,12.50,Lunch",
+                                  "2025-01-07,Rent,950.00,January"]) == [
+        ("2025-01-05", 12.5), ("2025-01-07", 950.0)]
+
+
+def test_debit_column_is_spending_whatever_its_sign(tmp_path):
+    assert import_rows(tmp_path, ["date,debit,description",
+                                  "2025-01-05,-12.50,Lunch",
+                                  "2025-01-07,950.00,Rent"]) == [
+        ("2025-01-05", 12.5), ("2025-01-07", 950.0)]
+
+
+def test_other_requests_run_between_batches(tmp_path):
+    path = str(tmp_path / "bank.csv")
+    write_csv(path, 20)
+    service = DatabaseService(str(tmp_path / "ledger.db"))
+    service.start()
+    try:
+        job = importer.FileImport(path, batch_size=5)
+        order = []
+        finished = threading.Event()
+
+        def next_batch(future):
+            # As Dashboard.import_expenses does: queue the next batch once one is done
+            order.append("batch")
+            if job.done:
+                finished.set()
+            else:
+                service.submit(job.import_batch).add_done_callback(next_batch)
+
+        gate = threading.Event()
+        service.submit(lambda conn: gate.wait(10)) # Hold the worker until everything is queued
+        service.submit(job.import_batch).add_done_callback(next_batch)
+        service.write(database.add_expense, ("2024-02-01", "Rent", 900.0, "Rent", 0)).add_done_callback(
+            lambda future: order.append("write"))
+        gate.set()
+
+        assert finished.wait(10)
+        assert order[:2] == ["batch", "write"]
+        assert service.call(count, timeout=10) == 21
+    finally:
+        service.stop()
@@ -0,0 +1,26 @@
+import database
+from benchmarks.ledger import generate_expenses
+
+
+def test_every_kind_of_edit_changes_the_version(conn):
+    expense_id = database.get_all_expenses(conn)[0][0]
+    seen = [database.get_ledger_version(conn)]
+    database.update_expense_star(conn, expense_id, 1, commit=True)
+    seen.append(database.get_ledger_version(conn))
+    conn.execute("UPDATE expenses SET description = 'edited' WHERE id = ?", (expense_id,))
+    conn.commit()
+    seen.append(database.get_ledger_version(conn))
+    database.add_expense(conn, ("2024-01-01", "Food", 5.0, "new", 0), commit=True)
+    seen.append(database.get_ledger_version(conn))
+    database.delete_expense(conn, expense_id, commit=True)
+    seen.append(database.get_ledger_version(conn))
+    database.add_expenses_bulk(conn, generate_expenses(10, seed=5))
+    seen.append(database.get_ledger_version(conn))
+    assert len(set(seen)) == len(seen)
+
+
+def test_reads_leave_the_version_alone(conn):
+    version = database.get_ledger_version(conn)
+    database.get_all_expenses(conn)
+    database.search_expenses(conn, "coffee")
+    assert database.get_ledger_version(conn) == version
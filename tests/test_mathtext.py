@@ -0,0 +1,66 @@
+import pytest
+
+import mathtext
+
+markdown_it = pytest.importorskip("markdown_it")
+
+render = mathtext.markdown_renderer(markdown_it.MarkdownIt("commonmark").render)
+
+MONEY = [
+    "$5 and $10",
+    "$5-$10",
+    "$1,200 on Food and $300",
+    "Spent $5.50, then $3",
+    "Food: $20 (vs $15 last month)",
+    "from $5 to $10.",
+    "**$1,200** and $300",
+    "$10k and $5k",
+    "budget $50/$100",
+]
+
+FORMULAS = [
+    # (markdown, rendered formula, whether it is displayed)
+    ("$x_1 + x_2$", "<i>x<sub>1</sub> + x<sub>2</sub></i>", False),
+    ("$a_i * b_i$", "<i>a<sub>i</sub> * b<sub>i</sub></i>", False),
+    (r"\(\frac{a}{b}\)", "<i><sup>a</sup>&#8260;<sub>b</sub></i>", False),
+    (r"$$\frac{x_1}{n}$$", '<p align="center"><i><sup>x<sub>1</sub></sup>&#8260;<sub>n</sub></i></p>', True),
+    (r"\[\sum_{i} x_i\]", '<p align="center"><i>∑<sub>i</sub> x<sub>i</sub></i></p>', True),
+]
+
+CODE = [
+    "Run `echo $HOME and $PATH` here",
+    "Use ``a $x$ b`` inline",
+    "```\ncost = $5 + $x_1$\n```\n",
+    "~~~\n$$\\frac{a}{b}$$\n~~~\n",
+]
+
+
+@pytest.mark.parametrize("text", MONEY)
+def test_money_is_not_math(text):
+    assert mathtext.protect_math(text) == (text, [])
+    html = render(text)
+    assert html.count("$") == text.count("$") and "<i>" not in html
+
+
+@pytest.mark.parametrize("text, formula, display", FORMULAS)
+def test_formulas_survive_markdown(text, formula, display):
+    protected, formulas = mathtext.protect_math(text)
+    assert formulas == [formula]
+    html = render(text)
+    if display: # A displayed formula is its own paragraph
+        assert html.strip() == formula
+    else:
+        assert html.strip() == f"<p>{formula}</p>"
+
+
+def test_formula_next_to_money():
+    html = render("It cost $12.50, about $\\frac{1}{4}$ of the budget")
+    assert "$12.50" in html and "<sup>1</sup>&#8260;<sub>4</sub>" in html
+
+
+@pytest.mark.parametrize("text", CODE)
+def test_dollars_in_code_are_left_alone(text):
+    assert mathtext.protect_math(text) == (text, [])
+    html = render(text)
+    assert "<code>" in html and "<i>" not in html
+    assert html.count("$") == text.count("$")
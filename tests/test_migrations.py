@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+import database
+from db_service import DatabaseService
+
+
+def create_v1_database(path, rows):
+    conn = database.create_connection(path)
+    conn.execute("BEGIN")
+    database._migrate_v1(conn)
+    conn.execute("PRAGMA user_version = 1")
+    conn.executemany("INSERT INTO expenses(id, date, category, amount, description, starred) VALUES (?, ?, ?, ?, ?, ?)",
+                     rows)
+    conn.commit()
+    conn.close()
+
+
+def test_unreadable_dates_are_set_aside(tmp_path):
+    path = str(tmp_path / "v1.db")
+    create_v1_database(path, [
+        (1, "2024-03-01", "Food", 12.5, "Lunch", 0),
+        (2, "bad", "Food", 3.0, "Typo", 1),
+        (3, "2024-03-02", "Rent", 950.0, "March", 0),
+    ])
+    conn = database.create_connection(path)
+    assert database.migrate(conn) == database.SCHEMA_VERSION
+    assert [row[:4] for row in database.get_all_expenses(conn)] == [
+        (1, "2024-03-01", "Food", 12.5), (3, "2024-03-02", "Rent", 950.0)]
+    assert conn.execute("SELECT id, date, reason FROM expenses_rejected").fetchall() == [(2, "bad", "unreadable date")]
+    conn.close()
+
+
+def failing_step(conn):
+    conn.execute("CREATE TABLE half_done (x)")
+    raise sqlite3.OperationalError("boom")
+
+
+def test_failed_step_raises_and_rolls_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [(database.SCHEMA_VERSION + 1, failing_step)])
+    conn = database.create_connection(str(tmp_path / "new.db"))
+    with pytest.raises(database.MigrationError) as raised:
+        database.migrate(conn)
+    assert raised.value.version == database.SCHEMA_VERSION
+    assert database.get_schema_version(conn) == database.SCHEMA_VERSION
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    conn.close()
+
+
+def test_service_refuses_requests_after_failed_migration(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [(database.SCHEMA_VERSION + 1, failing_step)])
+    service = DatabaseService(str(tmp_path / "new.db"))
+    service.start()
+    try:
+        with pytest.raises(database.MigrationError):
+            service.call(database.get_all_expenses, timeout=10)
+        with pytest.raises(database.MigrationError):
+            service.read(database.get_all_expenses).result(10)
+        assert isinstance(service.worker.error, database.MigrationError)
+    finally:
+        service.stop()
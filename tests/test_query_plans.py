@@ -0,0 +1,41 @@
+import shutil
+
+import pytest
+
+import database
+
+
+def test_hot_queries_use_indexes(conn):
+    plans = database.check_query_plans(conn)
+    assert set(plans) == set(database._planned_queries())
+
+
+def test_full_scan_is_reported(conn):
+    names = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'expenses' "
+                         "AND sql IS NOT NULL").fetchall()
+    for (name,) in names:
+        conn.execute(f"DROP INDEX {name}")
+    with pytest.raises(RuntimeError, match="full table scan"):
+        database.check_query_plans(conn)
+
+
+def test_check_on_copy_leaves_database_untouched(tmp_path):
+    # A version 0 database, like an old expense_manager.db, must not be migrated by the check
+    path = str(tmp_path / "old.db")
+    conn = database.create_connection(path)
+    database._migrate_v1(conn)
+    conn.commit()
+    conn.close()
+    shutil.copy(path, str(tmp_path / "before.db"))
+
+    database.check_query_plans_on_copy(path)
+
+    with open(path, "rb") as after, open(str(tmp_path / "before.db"), "rb") as before:
+        assert after.read() == before.read()
+    conn = database.create_connection(path, read_only=True)
+    assert database.get_schema_version(conn) == 0
+    conn.close()
+
+
+def test_check_on_copy_of_missing_file(tmp_path):
+    assert database.check_query_plans_on_copy(str(tmp_path / "missing.db"))
@@ -0,0 +1,35 @@
+import os
+
+import snapshot
+
+
+def test_snapshot_round_trip_and_invalidation(ledger):
+    saved = {"stats": {"total_month": 1.0, "total_today": 0.0, "top_category": "Food"},
+             "graphs": {"Bar Chart (Category)": [["Food", 1.0]]}}
+    snapshot.save_snapshot(ledger, saved)
+    assert snapshot.load_snapshot(ledger) == saved
+
+    with open(ledger, "ab") as f: # Any change to the file changes its key
+        f.write(b"\0" * 4096)
+    assert snapshot.load_snapshot(ledger) == snapshot.empty_snapshot()
+
+
+def test_changed_totals_clear_unrefreshed_graphs(ledger, wait_for):
+    import database
+    from main import Dashboard
+
+    stale = [["Food", 1.0]]
+    snapshot.save_snapshot(ledger, {"stats": None, "graphs": {"Bar Chart (Category)": stale}})
+    window = Dashboard(db_file=ledger)
+    try:
+        assert window.snapshot["graphs"] == {"Bar Chart (Category)": stale}
+        wait_for(lambda: window.snapshot["stats"] is not None)
+
+        # The graphs view was never opened, so nothing would refresh its saved data
+        window.service.write(database.add_expense, ("2024-05-01", "Food", 12.0, "Lunch", 0))
+        wait_for(lambda: not window.snapshot["graphs"])
+        wait_for(lambda: window.snapshot["stats"] is not None) # Refilled by the dashboard's refresh
+    finally:
+        window.close()
+    assert snapshot.load_snapshot(ledger)["graphs"] == {}
+    assert os.path.exists(snapshot.snapshot_path(ledger))
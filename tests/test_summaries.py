@@ -0,0 +1,27 @@
+from datetime import date
+
+import pytest
+
+import database
+
+SUMMARIES = [database.get_monthly_summary, database.get_category_summary,
+             database.get_category_monthly_summary, database.get_yearly_summary]
+
+
+@pytest.mark.parametrize("summary", SUMMARIES)
+@pytest.mark.parametrize("start, end", [
+    ("2024-01-01", "2024-03-01"), # Whole months: served from the rollups
+    ("2024-01-10", "2024-02-20"), # Partial months: served from expenses
+    ("2024-01-01", None),
+])
+def test_date_bounds_match_string_bounds(conn, summary, start, end):
+    as_dates = [None if bound is None else date.fromisoformat(bound) for bound in (start, end)]
+    assert summary(conn, *as_dates) == summary(conn, start, end)
+
+
+def test_rollups_match_a_raw_scan(conn):
+    start, end = date(2023, 1, 1), date(2024, 1, 1)
+    assert database._month_range_clause(start, end) == (" WHERE month >= ? AND month < ?", ["2023-01", "2024-01"])
+    where, params = database._date_range_clause(start, end)
+    raw = conn.execute(database.SQL_MONTHLY_SUMMARY.format(where=where), params).fetchall()
+    assert database.get_monthly_summary(conn, start, end) == raw